@@ -0,0 +1,174 @@
+"""
+agent_policy.py
+Deterministic local policy engine for the AI agent personas.
+
+Each persona in AGENTS is a small parametric policy over the round history:
+
+  logit(GREEN) = (w · features + bias) / temperature
+  P(GREEN)     = sigmoid(logit)
+
+with features computed once per round from the last T round summaries
+({"round", "green", "red", "winner"}):
+
+  last    +1 / -1 if the last round went GREEN / RED (0 for none or TIE)
+  streak  signed length of the current winner streak, / T
+  share   mean GREEN share over the history, centred (-1 … +1)
+  trend   last GREEN share minus the mean of the earlier ones
+  parity  +1 on even rounds, -1 on odd rounds
+  alt     +1 if the recent winners alternate, -1 if they repeat, times -last
+          (i.e. "the pattern continues")
+
+All agents are evaluated in one NumPy pass (an (A, K) weight matrix against
+a (K,) feature vector), so the agent phase costs microseconds. Sampling uses
+a seeded numpy Generator: the same seed and history reproduce the same
+votes. Emotion moves up or down one level from the persona's emotion_bias
+with the agent's confidence; influenceHistory is the persona's history_bias.
+
+Larger populations come from make_agents(): procedural agents that each
+clone one of the base personas (`persona` field) with their own jitter on
+its parameters, so a round can hold hundreds or thousands of distinct
+agents. Agents with neither an entry in PERSONA_PARAMS nor a persona get
+parameters derived from their `contrarian` flag.
+"""
+
+import zlib
+
+import numpy as np
+
+from llm import EMOTION_OPTIONS
+
+T = 5   # rounds of history the features look at (matches rl_model.T)
+
+FEATURES = ("last", "streak", "share", "trend", "parity", "alt")
+
+# id → (weights per FEATURES, bias toward GREEN, temperature)
+PERSONA_PARAMS = {
+    "agent_001": ((1.5,  1.0,  1.0,  0.0, 0.0, 0.0),  0.3, 1.0),   # Aria:   momentum + consensus, optimistic
+    "agent_002": ((-4.0, 0.0,  0.0,  0.0, 0.0, 0.0),  0.0, 0.5),   # Brutus: against the last winner
+    "agent_003": ((0.5,  0.0,  1.0,  0.5, 0.0, 0.0),  0.0, 1.5),   # Cleo:   weighs the whole history
+    "agent_004": ((1.0,  3.0,  0.0,  0.0, 0.0, 0.0),  0.0, 0.8),   # Drake:  rides streaks
+    "agent_005": ((0.0,  0.0,  0.0,  0.0, 0.0, 0.0),  0.0, 1.0),   # Elsa:   coin flip
+    "agent_006": ((0.0, -3.0, -1.0,  0.0, 0.0, 0.0),  0.0, 0.8),   # Felix:  streaks end
+    "agent_007": ((-1.0, 0.0,  0.0, -2.0, 0.0, 0.0),  0.0, 0.7),   # Gina:   swings against the last move
+    "agent_008": ((0.0,  0.0,  0.0,  0.0, 4.0, 0.0),  0.0, 0.3),   # Hiro:   round-number pattern
+    "agent_009": ((1.0,  0.0,  3.0,  0.0, 0.0, 0.0),  0.0, 0.8),   # Iris:   follows the crowd
+    "agent_010": ((0.0,  0.0,  0.0,  0.0, 0.0, 0.0), -1.5, 1.0),   # Jules:  RED bias
+    "agent_011": ((0.0, -0.5,  0.5,  0.0, 0.0, 0.0),  0.0, 2.0),   # Kai:    balanced
+    "agent_012": ((0.0,  1.0,  0.0,  0.0, 0.0, 3.0),  0.0, 0.8),   # Luna:   sees patterns
+}
+_DEFAULT         = ((0.5, 0.0, 0.0, 0.0, 0.0, 0.0), 0.0, 1.0)
+_DEFAULT_CONTRA  = ((-2.0, 0.0, 0.0, 0.0, 0.0, 0.0), 0.0, 0.7)
+JITTER           = 0.25   # relative spread of a procedural agent around its persona
+
+
+def make_agents(personas: list[dict], n: int) -> list[dict]:
+    """
+    n agents: the personas themselves, then procedural clones cycling
+    through them (agent_013 "Aria-2", agent_014 "Brutus-2", ...).
+    """
+    agents = [dict(p) for p in personas[:n]]
+    width  = max(3, len(str(n)))
+    for i in range(len(agents), n):
+        base = personas[i % len(personas)]
+        agents.append({
+            **base,
+            "id":      f"agent_{i + 1:0{width}d}",
+            "name":    f"{base['name']}-{i // len(personas) + 1}",
+            "persona": base["id"],
+        })
+    return agents
+
+
+def features(history: list[dict], round_num: int = None) -> np.ndarray:
+    """(K,) feature vector for the next round; round_num defaults to last + 1."""
+    f    = np.zeros(len(FEATURES))
+    hist = history[-T:]
+    if round_num is None:
+        round_num = hist[-1].get("round", len(hist)) + 1 if hist else 1
+    f[4] = 1.0 if round_num % 2 == 0 else -1.0
+    if not hist:
+        return f
+
+    wins  = np.array([1.0 if h["winner"] == "GREEN" else -1.0 if h["winner"] == "RED" else 0.0
+                      for h in hist])
+    share = np.array([h["green"] / max(h["green"] + h["red"], 1) for h in hist])
+
+    f[0] = wins[-1]
+    run  = 1
+    while run < len(wins) and wins[-run - 1] == wins[-1]:
+        run += 1
+    f[1] = wins[-1] * run / T
+    f[2] = 2.0 * share.mean() - 1.0
+    f[3] = share[-1] - share[:-1].mean() if len(share) > 1 else 0.0
+    if len(wins) >= 3 and wins[-1] != 0:
+        alternating = wins[-1] == -wins[-2] and wins[-2] == -wins[-3]
+        f[5] = -wins[-1] if alternating else wins[-1]
+    return f
+
+
+def _p_green(W: np.ndarray, b: np.ndarray, tau: np.ndarray, f: np.ndarray) -> np.ndarray:
+    """P(GREEN) per agent from stacked parameters and one feature vector."""
+    return 1.0 / (1.0 + np.exp(-(W @ f + b) / tau))
+
+
+class AgentPolicy:
+
+    def __init__(self, seed: int = None, params: dict = None):
+        self.params = dict(PERSONA_PARAMS if params is None else params)
+        self.rng    = np.random.default_rng(seed)
+        self._rows: dict[str, tuple] = {}          # agent id → flattened parameters
+
+    def seed(self, seed: int):
+        self.rng = np.random.default_rng(seed)
+
+    def _params(self, agent: dict):
+        if agent["id"] in self.params:
+            return self.params[agent["id"]]
+        if agent.get("persona") in self.params:
+            # Same persona, individual temperament: jitter seeded by the id
+            w, b, tau = self.params[agent["persona"]]
+            rng = np.random.default_rng(zlib.crc32(agent["id"].encode()))
+            w   = np.asarray(w) * (1 + JITTER * rng.standard_normal(len(w)))
+            return w, b + JITTER * rng.standard_normal(), tau * np.exp(JITTER * rng.standard_normal())
+        return _DEFAULT_CONTRA if agent.get("contrarian") else _DEFAULT
+
+    def _row(self, agent: dict) -> tuple:
+        row = self._rows.get(agent["id"])
+        if row is None:
+            w, b, tau = self._params(agent)
+            emo = (EMOTION_OPTIONS.index(agent["emotion_bias"])
+                   if agent.get("emotion_bias") in EMOTION_OPTIONS else 2)
+            row = self._rows[agent["id"]] = (*w, b, tau, emo)
+        return row
+
+    def _arrays(self, agents: list[dict]):
+        """(W (A,K), bias (A,), temperature (A,), emotion level (A,)) for these agents."""
+        P, k = np.array([self._row(a) for a in agents]), len(FEATURES)
+        return P[:, :k], P[:, k], P[:, k + 1], P[:, k + 2].astype(int)
+
+    def probabilities(self, agents: list[dict], history: list[dict],
+                      round_num: int = None) -> np.ndarray:
+        """P(GREEN) per agent, shape (A,)."""
+        if not agents:
+            return np.zeros(0)
+        W, b, tau, _ = self._arrays(agents)
+        return _p_green(W, b, tau, features(history, round_num))
+
+    def decide(self, agents: list[dict], history: list[dict], round_num: int = None) -> list[dict]:
+        """One decision dict per agent, in the same shape the LLM returns."""
+        if not agents:
+            return []
+        W, b, tau, emo = self._arrays(agents)
+        p     = _p_green(W, b, tau, features(history, round_num))
+        green = self.rng.random(len(agents)) < p
+        conf  = np.abs(2.0 * p - 1.0)                                   # 0 … 1
+        level = np.clip(emo + (conf > 0.8).astype(int) - (conf < 0.2).astype(int),
+                        0, len(EMOTION_OPTIONS) - 1)
+        return [
+            {
+                "color":            "GREEN" if g else "RED",
+                "emotionFeel":      EMOTION_OPTIONS[lv],
+                "influenceHistory": agent["history_bias"],
+            }
+            for agent, g, lv in zip(agents, green, level)
+        ]
@@ -7,12 +7,11 @@ Timeline per round:
   20s → 25s : agents vote  ← THIS SCRIPT FIRES HERE
   25s → 30s : HMNN predicts + results shown
 
-The script watches gameState/currentRound and fires votes
-during the 20-25s window of each round.
+The script watches gameState/currentRound (via a snapshot listener,
+no polling) and fires votes during the 20-25s window of each round.
 """
 
 import asyncio
-import json
 import random
 import time
 import os
@@ -23,27 +22,28 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 
-try:
-    from openai import AsyncOpenAI
-    _HAS_OPENAI = True
-except ImportError:
-    _HAS_OPENAI = False
+import llm
+from agent_policy import AgentPolicy, make_agents
+from lease import Leadership, make_lease
+from storage import FirestoreStore, make_store
+from tally import VoteTally
 
 load_dotenv()
 
 # ─── CONFIG ──────────────────────────────────────────────────────────────────
-OPENAI_API_KEY          = os.getenv("OPENAI_API_KEY")
 FIREBASE_CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS_PATH")
+STORE_BACKEND             = os.getenv("STORE_BACKEND", "firestore")
 
 ROUND_DURATION  = 30   # must match useRoundTimer.js
 HUMAN_CUTOFF    = 10   # humans stop at 10s remaining
 AGENT_CUTOFF    = 5    # agents stop at 5s remaining
 # Agent window: fires when timeRemaining is between 10 and 5 (i.e. at t=20s into round)
 
-TOTAL_VOTES = 12
+TOTAL_VOTES = int(os.getenv("TOTAL_VOTES", "12"))             # humans + agents per round
+AGENT_COUNT = int(os.getenv("AGENT_COUNT", str(TOTAL_VOTES)))  # agent population
 
 # ─── AGENTS ──────────────────────────────────────────────────────────────────
-AGENTS = [
+PERSONAS = [
     {"id": "agent_001", "name": "Aria",   "personality": "Optimistic and trend-following. You love momentum and strong consensus.",          "emotion_bias": "very_strong", "history_bias": "yes",     "contrarian": False},
     {"id": "agent_002", "name": "Brutus", "personality": "Stubborn contrarian. You always bet against the recent winner.",                   "emotion_bias": "low",         "history_bias": "no",      "contrarian": True},
     {"id": "agent_003", "name": "Cleo",   "personality": "Analytical and cautious. You study history carefully before deciding.",            "emotion_bias": "neutral",     "history_bias": "yes",     "contrarian": False},
@@ -57,9 +57,7 @@ AGENTS = [
     {"id": "agent_011", "name": "Kai",    "personality": "Balanced philosopher. You weigh both sides carefully every round.",                "emotion_bias": "neutral",     "history_bias": "neutral", "contrarian": False},
     {"id": "agent_012", "name": "Luna",   "personality": "Superstitious. You see patterns in noise and act on lucky or unlucky streaks.",    "emotion_bias": "very_strong", "history_bias": "yes",     "contrarian": False},
 ]
-
-EMOTION_OPTIONS   = ["very_low", "low", "neutral", "strong", "very_strong"]
-INFLUENCE_OPTIONS = ["no", "neutral", "yes"]
+AGENTS = make_agents(PERSONAS, AGENT_COUNT)
 
 # ─── FIREBASE INIT ────────────────────────────────────────────────────────────
 def init_firebase():
@@ -70,83 +68,84 @@ def init_firebase():
         firebase_admin.initialize_app(cred)
     return firestore.client()
 
-# ─── OPENAI DECISION ──────────────────────────────────────────────────────────
-async def get_agent_decision_openai(agent: dict, history: list) -> dict:
-    if not _HAS_OPENAI or not OPENAI_API_KEY:
-        return get_agent_decision_fallback(agent, history)
-
-    client   = AsyncOpenAI(api_key=OPENAI_API_KEY)
-    hist_str = json.dumps(history[-5:]) if history else "[]"
-    prompt = (
-        f"You are {agent['name']}. {agent['personality']}\n"
-        f"Last 5 rounds: {hist_str}\n\n"
-        "Vote RED or GREEN. Also rate emotional intensity and history influence.\n"
-        "Respond ONLY with valid JSON, no extra text:\n"
-        '{"color":"RED","emotionFeel":"neutral","influenceHistory":"yes"}\n'
-        "emotionFeel options: very_low, low, neutral, strong, very_strong\n"
-        "influenceHistory options: no, neutral, yes"
-    )
-    try:
-        res = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=60,
-            temperature=0.85,
-        )
-        raw  = res.choices[0].message.content.strip()
-        raw  = raw.replace("```json", "").replace("```", "").strip()
-        data = json.loads(raw)
-        if data.get("color") not in ("RED", "GREEN"):
-            raise ValueError("bad color")
-        if data.get("emotionFeel") not in EMOTION_OPTIONS:
-            data["emotionFeel"] = agent["emotion_bias"]
-        if data.get("influenceHistory") not in INFLUENCE_OPTIONS:
-            data["influenceHistory"] = agent["history_bias"]
-        return data
-    except Exception as e:
-        print(f"  [OpenAI fallback] {agent['name']}: {e}")
-        return get_agent_decision_fallback(agent, history)
-
-def get_agent_decision_fallback(agent: dict, history: list) -> dict:
-    last_winner = history[-1]["winner"] if history else None
-    if agent["contrarian"] and last_winner:
-        color = "RED" if last_winner == "GREEN" else "GREEN"
-    else:
-        color = random.choice(["RED", "GREEN"])
+def init_store():
+    """Firestore by default; STORE_BACKEND=memory|sqlite runs without credentials."""
+    if STORE_BACKEND == "firestore":
+        return FirestoreStore(init_firebase())
+    return make_store(STORE_BACKEND, os.getenv("STORE_PATH"))
+
+# ─── AGENT DECISIONS ──────────────────────────────────────────────────────────
+# Local persona policies: the votes themselves in AGENT_MODE=local, per-agent
+# fallbacks (LLM error or deadline) otherwise; llm.decide_pool picks
+POLICY  = AgentPolicy()
+USE_LLM = llm.llm_mode()       # AGENT_MODE, parsed the same way as RoundManager
+
+# ─── VOTE DOC ─────────────────────────────────────────────────────────────────
+def agent_vote_doc(agent: dict, decision: dict) -> dict:
     return {
-        "color":            color,
-        "emotionFeel":      agent["emotion_bias"],
-        "influenceHistory": agent["history_bias"],
+        "userId":           agent["id"],
+        "agentName":        agent["name"],
+        "color":            decision["color"],
+        "emotionFeel":      decision["emotionFeel"],
+        "influenceHistory": decision["influenceHistory"],
+        "timestamp":        int(time.time() * 1000),
+        "isAgent":          True,
     }
 
-# ─── FIRESTORE WRITE ──────────────────────────────────────────────────────────
-def write_vote(db_client, round_num: int, agent: dict, decision: dict):
-    db_client.collection("rounds").document(str(round_num)) \
-             .collection("votes").document(agent["id"]) \
-             .set({
-                 "userId":           agent["id"],
-                 "agentName":        agent["name"],
-                 "color":            decision["color"],
-                 "emotionFeel":      decision["emotionFeel"],
-                 "influenceHistory": decision["influenceHistory"],
-                 "timestamp":        int(time.time() * 1000),
-                 "isAgent":          True,
-             })
-
-def get_human_vote_count(db_client, round_num: int) -> int:
-    """Count how many humans have already voted this round."""
-    ref  = db_client.collection("rounds").document(str(round_num)).collection("votes")
-    snap = ref.get()
-    return sum(1 for d in snap if not d.to_dict().get("isAgent", False))
-
-def load_round_history(db_client, current_round: int) -> list:
-    """Load last 5 round results for agent context."""
+# ─── LIVE STATE (snapshot listeners) ──────────────────────────────────────────
+class LiveRound:
+    """
+    Mirrors gameState/currentRound and the current round's votes through
+    snapshot listeners, so the main loop reads local memory instead of
+    polling Firestore; read cost scales with changes, not with wake-ups.
+    """
+
+    def __init__(self, store, loop: asyncio.AbstractEventLoop):
+        self.store   = store
+        self.loop    = loop
+        self.state   = None
+        self.tally   = None
+        self.changed = asyncio.Event()
+        self._unwatch_votes = None
+        self._unwatch_state = self.store.watch_game_state(self._on_state)
+
+    def _on_state(self, state):
+        # Listener thread → hand over to the event loop
+        self.state = state
+        self.loop.call_soon_threadsafe(self.changed.set)
+
+    def tally_for(self, round_num: int) -> VoteTally:
+        """Live tally of round_num; switches the votes listener on a new round."""
+        if self.tally is None or self.tally.round_num != round_num:
+            if self._unwatch_votes:
+                self._unwatch_votes()
+            self.tally = VoteTally(round_num)
+            self._unwatch_votes = self.store.watch_votes(round_num, self.tally.apply_changes)
+        return self.tally
+
+    async def wait_for_change(self, timeout: float):
+        """Sleep up to `timeout` seconds, waking early if gameState changes."""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.changed.clear()
+
+async def load_round_history(store, current_round: int) -> list:
+    """Load last 5 round results for agent context (one snapshot read)."""
+    try:
+        snap = await store.get_snapshot()
+    except Exception:
+        snap = None
+    if snap is not None:
+        return [h for h in snap.get("history", []) if h["round"] < current_round][-5:]
+
+    # No snapshot written yet: fall back to per-round reads
     history = []
     for rnum in range(max(1, current_round - 5), current_round):
         try:
-            snap = db_client.collection("roundResults").document(str(rnum)).get()
-            if snap.exists:
-                d = snap.to_dict()
+            d = await store.get_result(rnum)
+            if d is not None:
                 if d.get("winner"):
                     history.append({
                         "round":  rnum,
@@ -159,8 +158,7 @@ def load_round_history(db_client, current_round: int) -> list:
     return history
 
 # ─── MAIN LOOP ────────────────────────────────────────────────────────────────
-async def main():
-    db_client = init_firebase()
+async def vote_loop(store, live: LiveRound):
     print(f"[AgentVoter] Started at {datetime.now().strftime('%H:%M:%S')}")
     print(f"[AgentVoter] Will vote in the {HUMAN_CUTOFF}s–{AGENT_CUTOFF}s window of each round")
 
@@ -168,15 +166,15 @@ async def main():
 
     while True:
         try:
-            # Read current round state
-            snap = db_client.collection("gameState").document("currentRound").get()
-            if not snap.exists:
-                await asyncio.sleep(1)
+            # Current round state, as last pushed by the listener
+            state = live.state
+            if state is None:
+                await live.wait_for_change(1)
                 continue
 
-            state      = snap.to_dict()
             round_num  = state.get("round", 1)
             started_at = state.get("startedAt", int(time.time() * 1000))
+            tally      = live.tally_for(round_num)
 
             # Calculate time position in this round
             elapsed_ms  = time.time() * 1000 - started_at
@@ -191,24 +189,34 @@ async def main():
                 processed_rounds.add(round_num)
 
                 # Load history for context
-                history = load_round_history(db_client, round_num)
+                history = await load_round_history(store, round_num)
 
                 # How many agents do we need? (fill up to TOTAL_VOTES)
-                human_count = get_human_vote_count(db_client, round_num)
-                n_needed    = max(0, TOTAL_VOTES - human_count)
+                await asyncio.to_thread(tally.synced.wait, 2.0)
+                human_count = tally.human_count
+                n_needed    = min(max(0, TOTAL_VOTES - human_count), len(AGENTS))
                 agent_pool  = random.sample(AGENTS, n_needed) if n_needed else []
 
                 print(f"  Humans voted: {human_count}, Agents needed: {n_needed}")
 
                 if agent_pool:
-                    # Fire all agent decisions concurrently
-                    decisions = await asyncio.gather(*[
-                        get_agent_decision_openai(a, history) for a in agent_pool
-                    ])
+                    # Fire all agent decisions concurrently; agents still
+                    # thinking when the window closes get their fallback vote
+                    deadline = started_at / 1000 + ROUND_DURATION - AGENT_CUTOFF - 0.5
+                    local    = POLICY.decide(agent_pool, history, round_num)
+
+                    decisions = await llm.decide_pool(
+                        agent_pool, history, local,
+                        timeout=max(0.0, deadline - time.time()), use_llm=USE_LLM,
+                    )
+
+                    await store.write_votes(round_num, {
+                        agent["id"]: agent_vote_doc(agent, decision)
+                        for agent, decision in zip(agent_pool, decisions)
+                    })
 
                     red_count = green_count = 0
                     for agent, decision in zip(agent_pool, decisions):
-                        write_vote(db_client, round_num, agent, decision)
                         if decision["color"] == "RED":
                             red_count += 1
                         else:
@@ -224,22 +232,32 @@ async def main():
                     oldest = min(processed_rounds)
                     processed_rounds.discard(oldest)
 
-            # ── Sleep until next check ────────────────────────────────────
-            # If we're before the agent window, sleep until we reach it
+            # ── Sleep until something can happen ────────────────────────
+            # Before the agent window: sleep until it opens. Otherwise nothing
+            # happens until gameState advances, and the listener wakes us.
             if remaining_s > HUMAN_CUTOFF:
-                sleep_for = remaining_s - HUMAN_CUTOFF - 0.5  # wake up 0.5s early
-                sleep_for = max(0.5, min(sleep_for, 2.0))
+                sleep_for = remaining_s - HUMAN_CUTOFF
             else:
-                sleep_for = 0.3  # poll frequently during/after agent window
+                sleep_for = max(remaining_s, 0) + 2.0
 
-            await asyncio.sleep(sleep_for)
+            await live.wait_for_change(sleep_for)
 
         except Exception as e:
             print(f"[AgentVoter] Error: {e}")
             await asyncio.sleep(2)
 
+async def main():
+    # Any number of voters may run; only the lease holder votes, the others
+    # keep their listeners warm and take over if it dies
+    store = init_store()
+    live  = LiveRound(store, asyncio.get_running_loop())
+    try:
+        await Leadership(make_lease("agentVoter", store)).run(lambda: vote_loop(store, live))
+    finally:
+        await llm.close()      # saves the decision cache
+
 if __name__ == "__main__":
-    if not FIREBASE_CREDENTIALS_PATH:
+    if STORE_BACKEND == "firestore" and not FIREBASE_CREDENTIALS_PATH:
         print("ERROR: FIREBASE_CREDENTIALS_PATH not set in .env")
         sys.exit(1)
     asyncio.run(main())
\ No newline at end of file
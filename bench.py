@@ -0,0 +1,314 @@
+"""
+bench.py
+Benchmarks for the prediction and round-processing hot paths.
+
+Cases: encode_vote, RLModel.build_state, HMNNForward.forward (single window
+and batched), RLModel.predict + update, POST /vote (the endpoint up to the
+ingest queue), vote_ingest_<n> (a burst of n queued votes flushed to the
+in-memory store by the ingest writer) and a full RoundManager.run_round
+(in-memory store, virtual clock, no LLM).
+The *_n<voters> cases repeat the HMNN forward and run_round at growing
+voter counts (procedural agents) to show how per-round cost scales.
+
+Each case reports ops/sec, p50 / p99 latency and peak bytes allocated per
+op (tracemalloc, measured in a separate pass so it does not skew timings).
+Results are written as JSON, by default to bench_results/<commit>.json, and
+can be compared against an earlier run:
+
+  python bench.py                                  # run everything
+  python bench.py -k hmnn predict                  # only matching cases
+  python bench.py --compare bench_results/abc123.json [--fail-on-regression]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+os.environ.setdefault("STORE_BACKEND", "memory")   # before main.py is imported
+
+from rl_model import EMOTION_MAP, INFLUENCE_MAP, T, RLModel, encode_vote, encode_windows
+
+REGRESSION_THRESHOLD = 0.10   # flag cases whose p50 got >10% slower
+SCALE_VOTERS = (12, 100, 1000, 5000)   # voters per round for the scaling cases
+INGEST_BURSTS = (100, 1000)            # votes per flush for the vote_ingest cases
+
+
+# ─── Fixtures ────────────────────────────────────────────────────────────────
+def _random_round(rng: random.Random, n: int = 12) -> dict:
+    return {
+        "votes": [
+            encode_vote(rng.choice(["RED", "GREEN"]),
+                        rng.choice(list(EMOTION_MAP)),
+                        rng.choice(list(INFLUENCE_MAP)))
+            for _ in range(n)
+        ],
+        "result": rng.choice(["RED", "GREEN"]),
+    }
+
+
+def _summaries(rng: random.Random) -> list[dict]:
+    out = []
+    for r in range(T):
+        g = rng.randint(0, 12)
+        out.append({"round": r, "green": g, "red": 12 - g,
+                    "winner": "GREEN" if g > 6 else "RED"})
+    return out
+
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+# ─── Measurement ─────────────────────────────────────────────────────────────
+def measure(fn, iters: int, inner: int = 1, warmup: int = 10) -> dict:
+    """
+    Time `iters` samples of `inner` calls each; latency is per call.
+    fn may be a plain function or return an awaitable (run on one loop).
+    """
+    loop = asyncio.new_event_loop()
+
+    def call():
+        res = fn()
+        if asyncio.iscoroutine(res):
+            loop.run_until_complete(res)
+
+    try:
+        for _ in range(warmup):
+            call()
+
+        samples = np.empty(iters)
+        t_start = time.perf_counter()
+        for i in range(iters):
+            t0 = time.perf_counter_ns()
+            for _ in range(inner):
+                call()
+            samples[i] = (time.perf_counter_ns() - t0) / inner
+        total = time.perf_counter() - t_start
+
+        tracemalloc.start()
+        peaks = []
+        for _ in range(min(iters, 20)):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+    finally:
+        loop.close()
+
+    return {
+        "ops_per_sec":     round(iters * inner / total, 1),
+        "p50_us":          round(float(np.percentile(samples, 50)) / 1e3, 3),
+        "p99_us":          round(float(np.percentile(samples, 99)) / 1e3, 3),
+        "peak_alloc_bytes": int(np.median(peaks)),
+        "iters":           iters * inner,
+    }
+
+
+# ─── Cases ───────────────────────────────────────────────────────────────────
+def bench_encode_vote(rng):
+    args = [(rng.choice(["RED", "GREEN"]), rng.choice(list(EMOTION_MAP)),
+             rng.choice(list(INFLUENCE_MAP))) for _ in range(64)]
+    i = iter(range(10**12))
+    return lambda: encode_vote(*args[next(i) % 64]), dict(iters=2000, inner=50)
+
+
+def bench_build_state(rng):
+    summaries = _summaries(rng)
+    return lambda: RLModel.build_state(summaries), dict(iters=2000, inner=20)
+
+
+def bench_hmnn_forward(rng, model):
+    window = [_random_round(rng) for _ in range(T)]
+    return lambda: model.hmnn.forward(window), dict(iters=2000, inner=5)
+
+
+def bench_hmnn_forward_batch_1024(rng, model):
+    X, mask = encode_windows([[_random_round(rng) for _ in range(T)] for _ in range(1024)])
+    return lambda: model.hmnn.forward_batch(X, mask), dict(iters=200)
+
+
+def bench_predict_update(rng, model):
+    window    = [_random_round(rng) for _ in range(T)]
+    summaries = _summaries(rng)
+
+    def step():
+        model.predict(window, summaries)
+        model.update(rng.choice(["RED", "GREEN"]))
+    return step, dict(iters=2000, inner=5)
+
+
+def bench_vote_endpoint(rng):
+    from fastapi.testclient import TestClient
+    with _quiet():
+        import main
+    # No `with`: skip the lifespan, so neither the round loop nor the ingest
+    # writer runs — this times the endpoint up to the queue; the write side
+    # is vote_ingest_<n>
+    client = TestClient(main.app)
+    counter = iter(range(10**12))
+    main.results.set_state({"round": 1, "startedAt": 0})   # as the leader writes through
+
+    def post():
+        n = next(counter)
+        res = client.post("/vote", json={
+            "userId": f"bench_{n}", "roundNum": 1, "color": "GREEN",
+            "emotionFeel": "neutral", "influenceHistory": "yes",
+        })
+        assert res.status_code == 200, res.text
+    return post, dict(iters=1000)
+
+
+def bench_vote_ingest(rng, burst: int):
+    from ingest import VoteIngest
+    from storage import MemoryStore
+
+    store  = MemoryStore()
+    rounds = iter(range(1, 10**12))
+    doc    = {"color": "GREEN", "emotionFeel": "neutral", "influenceHistory": "yes",
+              "isAgent": False}
+
+    async def flush_burst():
+        ingest = VoteIngest(store, flush_ms=0)
+        ingest.start()
+        round_num = next(rounds)
+        for i in range(burst):
+            ingest.submit(round_num, f"bench_{i}", {**doc, "userId": f"bench_{i}"}, round_num)
+        await ingest.close()                  # writer drains the queue, then stops
+        assert ingest.written == burst, ingest.stats()
+    return flush_burst, dict(iters=max(20, 20_000 // burst))
+
+
+def bench_run_round(rng, voters: int = None):
+    from agent_policy import make_agents
+    from clock import VirtualClock
+    from round_manager import PERSONAS, RoundManager
+    from storage import MemoryStore
+
+    store = MemoryStore()
+    scale = {} if voters is None else {"total_votes": voters,
+                                       "agents": make_agents(PERSONAS, voters)}
+    with _quiet():
+        manager = RoundManager(store=store, clock=VirtualClock(), rl_path=None,
+                               use_llm=False, **scale)
+    rounds = iter(range(1, 10**12))
+
+    async def one_round():
+        with _quiet():
+            await manager.run_round(next(rounds))
+            await manager.drain()             # include the background close-out
+    return one_round, dict(iters=300 if voters is None else max(20, 30_000 // voters))
+
+
+def bench_hmnn_forward_n(rng, model, voters: int):
+    from rl_model import VoterWindow
+    window = VoterWindow()
+    for _ in range(T):
+        window.push(encode_windows([[_random_round(rng, voters)]])[0][0, 0], "RED")
+    X, mask = window.view()
+    return lambda: model.hmnn.forward_batch(X, mask), dict(iters=max(50, 20_000 // voters))
+
+
+CASES = {
+    "encode_vote":               lambda rng, m: bench_encode_vote(rng),
+    "build_state":               lambda rng, m: bench_build_state(rng),
+    "hmnn_forward":              bench_hmnn_forward,
+    "hmnn_forward_batch_1024":   bench_hmnn_forward_batch_1024,
+    "predict_update":            bench_predict_update,
+    "vote_endpoint":             lambda rng, m: bench_vote_endpoint(rng),
+    "run_round":                 lambda rng, m: bench_run_round(rng),
+}
+for _n in INGEST_BURSTS:
+    CASES[f"vote_ingest_{_n}"] = lambda rng, m, n=_n: bench_vote_ingest(rng, n)
+for _n in SCALE_VOTERS:
+    CASES[f"hmnn_forward_n{_n}"] = lambda rng, m, n=_n: bench_hmnn_forward_n(rng, m, n)
+    CASES[f"run_round_n{_n}"]    = lambda rng, m, n=_n: bench_run_round(rng, n)
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+def _commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str, threshold: float) -> list[str]:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    print(f"\n{'case':28s} {'base p50':>10s} {'now p50':>10s} {'change':>8s}")
+    for name, res in current.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["p50_us"], res["p50_us"]
+        change = (new - old) / old if old else 0.0
+        flag   = "  REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:28s} {old:10.3f} {new:10.3f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project NN hot-path benchmarks")
+    parser.add_argument("-k", nargs="*", default=None, help="substring filter on case names")
+    parser.add_argument("--out", default=None, help="result JSON path")
+    parser.add_argument("--compare", default=None, help="baseline result JSON")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with _quiet():
+        model = RLModel("HMNN.pkl")
+
+    results = {}
+    for name, make in CASES.items():
+        if args.k and not any(k in name for k in args.k):
+            continue
+        fn, opts = make(rng, model)
+        results[name] = measure(fn, **opts)
+        r = results[name]
+        print(f"[Bench] {name:28s} {r['ops_per_sec']:>12,.1f} ops/s  "
+              f"p50={r['p50_us']:.2f}us  p99={r['p99_us']:.2f}us  "
+              f"peak={r['peak_alloc_bytes']}B")
+
+    commit = _commit()
+    report = {
+        "commit":    commit,
+        "timestamp": int(time.time()),
+        "python":    platform.python_version(),
+        "numpy":     np.__version__,
+        "platform":  platform.platform(),
+        "results":   results,
+    }
+    out = args.out or os.path.join("bench_results", f"{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[Bench] Results written to {out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+broadcast.py
+In-process fan-out of live round events to GET /stream subscribers (SSE).
+
+RoundManager publishes from its in-memory state — phase changes, the live
+tally, the prediction, each closed round's result and metrics — and every
+connected viewer receives the same pre-encoded Server-Sent Events frame, so
+the backend reads nothing per viewer and encoding cost does not grow with
+the audience.
+
+Each subscriber has a bounded queue; a viewer that stops reading loses its
+oldest frames rather than slowing anyone else down. New subscribers first
+receive the latest frame of every event type, so a fresh tab renders the
+current round immediately.
+
+publish() is not thread-safe and must run on the event loop thread; the
+vote tally's listener thread hands over through RoundManager, which
+coalesces tally pushes on the loop (_on_tally_change).
+"""
+
+import asyncio
+import json
+from contextlib import contextmanager
+
+STREAM_QUEUE_SIZE = 64     # frames buffered per subscriber
+
+
+def sse_frame(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Broadcaster:
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subs: set[asyncio.Queue] = set()
+        self._last: dict[str, bytes] = {}     # event type → latest frame
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    # ── Publishing ────────────────────────────────────────────────────────
+    def publish(self, event: str, data):
+        frame = sse_frame(event, data)
+        self._last[event] = frame
+        for q in self._subs:
+            if q.full():
+                q.get_nowait()              # slow viewer: drop its oldest frame
+                self.dropped += 1
+            q.put_nowait(frame)
+
+    # ── Subscribing ───────────────────────────────────────────────────────
+    def close(self):
+        """End every subscriber's stream (we stopped leading); they reconnect."""
+        self._last.clear()
+        for q in self._subs:
+            while q.full():
+                q.get_nowait()
+            q.put_nowait(None)
+
+    @contextmanager
+    def subscribe(self):
+        """
+        A queue of SSE frames, primed with the latest frame of each event.
+        None means the stream has ended.
+        """
+        q = asyncio.Queue(maxsize=max(self.queue_size, len(self._last)))
+        for frame in self._last.values():
+            q.put_nowait(frame)
+        self._subs.add(q)
+        try:
+            yield q
+        finally:
+            self._subs.discard(q)
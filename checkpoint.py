@@ -0,0 +1,139 @@
+"""
+checkpoint.py
+Background, crash-safe checkpointing of the RL correction weights.
+
+RoundManager calls note_round() after every round. Saves are coalesced — one
+every RL_CHECKPOINT_EVERY rounds or RL_CHECKPOINT_SECONDS seconds, whichever
+comes first — and written on a single background thread, so the event loop
+only pays for copying two small arrays. Each save goes to a temp file and is
+renamed into place (rl_model.save_weights); the previous RL_CHECKPOINT_KEEP-1
+generations are kept as rl_weights.1.npz, rl_weights.2.npz, … and load()
+falls back to them if the newest file is unreadable.
+
+Weights are stored as .npz, together with the HMNN file they correct, and
+loaded with allow_pickle=False; a file written for another base model (a
+promoted candidate) is not applied to this one. A legacy
+rl_weights.pkl next to the checkpoint is read once if no .npz exists yet;
+the next save migrates it.
+
+The file is a per-host cache: the round snapshot in the store carries the
+primary's weights too, so whichever node leads next resumes from them.
+min_version (the snapshot's rlVersion) stops a process whose weights are
+older than the last committed round from overwriting a newer checkpoint.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from clock import RealClock
+from rl_model import save_weights
+
+RL_CHECKPOINT_PATH    = os.getenv("RL_CHECKPOINT_PATH", "rl_weights.npz")
+RL_CHECKPOINT_EVERY   = int(os.getenv("RL_CHECKPOINT_EVERY", "10"))      # rounds
+RL_CHECKPOINT_SECONDS = float(os.getenv("RL_CHECKPOINT_SECONDS", "60"))
+RL_CHECKPOINT_KEEP    = int(os.getenv("RL_CHECKPOINT_KEEP", "3"))        # generations
+
+
+class Checkpointer:
+
+    def __init__(self, model, path: str = RL_CHECKPOINT_PATH, clock=None,
+                 every_rounds: int = RL_CHECKPOINT_EVERY,
+                 every_seconds: float = RL_CHECKPOINT_SECONDS,
+                 keep: int = RL_CHECKPOINT_KEEP):
+        self.model         = model
+        self.path          = path
+        self.clock         = clock if clock is not None else RealClock()
+        self.every_rounds  = max(1, every_rounds)
+        self.every_seconds = every_seconds
+        self.keep          = max(1, keep)
+        self.saved_version = None              # rl.updates of the last save
+        self.min_version   = 0                 # never save weights older than this
+        self._pending      = 0                 # rounds since the last save
+        self._last_save    = self.clock.time()
+        self._inflight: asyncio.Future | None = None
+        # One worker: saves land on disk in the order they were taken
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rl-ckpt")
+
+    # ── Paths ─────────────────────────────────────────────────────────────
+    def generation(self, i: int) -> str:
+        """Path of generation i (0 = newest)."""
+        if i == 0:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.{i}{ext}"
+
+    @property
+    def legacy_path(self) -> str:
+        return os.path.splitext(self.path)[0] + ".pkl"
+
+    # ── Load ──────────────────────────────────────────────────────────────
+    def load(self) -> bool:
+        """Restore the newest readable generation (or the legacy pickle)."""
+        for i in range(self.keep):
+            path = self.generation(i)
+            try:
+                if self.model.load_rl(path, strict=True):
+                    self.saved_version = self.model.rl.updates
+                    return True
+            except Exception as e:
+                print(f"[Checkpoint] {path} unreadable ({e}), trying an older generation")
+        if self.model.load_rl(self.legacy_path):
+            print(f"[Checkpoint] Migrating legacy {self.legacy_path} → {self.path} on next save")
+            return True
+        return False
+
+    # ── Save ──────────────────────────────────────────────────────────────
+    def _write(self, arrays: dict):
+        """Executor thread: rotate generations, then atomically write the new one."""
+        for i in range(self.keep - 1, 0, -1):
+            older = self.generation(i - 1)
+            if os.path.exists(older):
+                os.replace(older, self.generation(i))
+        save_weights(self.path, arrays)
+
+    def _done(self, fut: asyncio.Future, version: int):
+        if fut.cancelled() or fut.exception() is not None:
+            print(f"[Checkpoint] Save failed: {'cancelled' if fut.cancelled() else fut.exception()}")
+            self._pending = self.every_rounds       # retry on the next round
+        else:
+            self.saved_version = version
+
+    def save(self) -> asyncio.Future | None:
+        """Start a background save of the current weights (None if unchanged)."""
+        version = self.model.rl.updates
+        if version == self.saved_version:
+            return None
+        if version < self.min_version:
+            print(f"[Checkpoint] Not saving RL weights at version {version}: "
+                  f"the store is at version {self.min_version}")
+            self.saved_version = version
+            return None
+        arrays = self.model.weight_arrays()         # copy on the loop thread
+        loop   = asyncio.get_running_loop()
+        fut    = loop.run_in_executor(self._executor, self._write, arrays)
+        fut.add_done_callback(lambda f: self._done(f, version))
+        self._inflight  = fut
+        self._pending   = 0
+        self._last_save = self.clock.time()
+        return fut
+
+    def note_round(self):
+        """Called once per round; saves when a round or time budget is spent."""
+        self._pending += 1
+        if self._inflight is not None and not self._inflight.done():
+            return                                   # coalesce into the next save
+        if (self._pending >= self.every_rounds
+                or self.clock.time() - self._last_save >= self.every_seconds):
+            self.save()
+
+    async def flush(self):
+        """Wait for any in-flight save, then write the latest weights (shutdown)."""
+        if self._inflight is not None:
+            await asyncio.gather(self._inflight, return_exceptions=True)
+        fut = self.save()
+        if fut is not None:
+            await asyncio.gather(fut, return_exceptions=True)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
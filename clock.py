@@ -0,0 +1,61 @@
+"""
+clock.py
+Pluggable time source for RoundManager.
+
+  RealClock    : wall-clock time and asyncio.sleep (production)
+  VirtualClock : simulated time; sleep() advances the clock instantly, so a
+                 30s round costs only the CPU time of its work
+  ScaledClock  : real sleeps shortened `speed`× (e.g. 60 → a round every 0.5s),
+                 for soak tests that still want real concurrency
+
+All clocks speak in round-time seconds. timeout_until() converts a round-time
+deadline into the real seconds an asyncio timeout should wait.
+"""
+
+import asyncio
+import time
+
+
+class RealClock:
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(max(0.0, seconds))
+
+    def timeout_until(self, deadline: float) -> float:
+        return max(0.0, deadline - self.time())
+
+
+class VirtualClock:
+
+    def __init__(self, start: float = None):
+        self._now = time.time() if start is None else start
+
+    def time(self) -> float:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        self._now += max(0.0, seconds)
+        await asyncio.sleep(0)      # still yield so other tasks make progress
+
+    def timeout_until(self, deadline: float) -> float:
+        return max(0.0, deadline - self._now)
+
+
+class ScaledClock:
+
+    def __init__(self, speed: float, start: float = None):
+        self.speed  = speed
+        self._real0 = time.time()
+        self._sim0  = self._real0 if start is None else start
+
+    def time(self) -> float:
+        return self._sim0 + (time.time() - self._real0) * self.speed
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(max(0.0, seconds) / self.speed)
+
+    def timeout_until(self, deadline: float) -> float:
+        return max(0.0, deadline - self.time()) / self.speed
@@ -0,0 +1,135 @@
+"""
+decision_cache.py
+Bounded LRU / TTL cache of LLM agent decisions (used by llm.agent_decision).
+
+The agent prompt is the persona plus the last five round summaries, and the
+same situations come round again and again. Entries are keyed by agent id
+and a normalised history signature — the (winner, green, red) of each of the
+last five rounds, without round numbers — and hold a distribution over the
+decisions the model returned for that key (counts per color, emotion and
+influence). Once a key has LLM_CACHE_MIN_SAMPLES observations, votes are
+sampled from it at LLM_TEMPERATURE instead of calling the model.
+
+Entries expire LLM_CACHE_TTL seconds after their first observation, and the
+least recently used ones are evicted beyond LLM_CACHE_SIZE. With
+LLM_CACHE_PATH set the cache is loaded at startup and written back
+(atomically) on llm.close().
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_SIZE        = int(os.getenv("LLM_CACHE_SIZE", "10000"))
+LLM_CACHE_TTL         = float(os.getenv("LLM_CACHE_TTL", "86400"))      # seconds
+LLM_CACHE_MIN_SAMPLES = int(os.getenv("LLM_CACHE_MIN_SAMPLES", "3"))
+LLM_CACHE_PATH        = os.getenv("LLM_CACHE_PATH")                     # None → memory only
+
+FIELDS = ("color", "emotionFeel", "influenceHistory")
+
+
+def history_signature(history: list[dict], n: int = 5) -> str:
+    """Normalised fingerprint of the history the prompt shows the model."""
+    return "|".join(
+        f"{h.get('winner', '?')[:1]}{h.get('green', 0)}-{h.get('red', 0)}"
+        for h in history[-n:]
+    )
+
+
+def _sample(counts: dict, temperature: float, rng: random.Random) -> str:
+    """Draw a key with probability ∝ count^(1/temperature)."""
+    keys    = list(counts)
+    weights = [counts[k] ** (1.0 / max(temperature, 1e-3)) for k in keys]
+    return rng.choices(keys, weights)[0]
+
+
+class DecisionCache:
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL,
+                 min_samples: int = LLM_CACHE_MIN_SAMPLES, path: str = LLM_CACHE_PATH,
+                 rng: random.Random = None):
+        self.max_entries = max_entries
+        self.ttl         = ttl
+        self.min_samples = min_samples
+        self.path        = path
+        self.rng         = rng or random.Random()
+        self.hits = self.misses = 0
+        # key → {"t": first seen, "n": observations, field: {value: count}}
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(agent_id: str, history: list[dict]) -> str:
+        return f"{agent_id}:{history_signature(history)}"
+
+    def _get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["t"] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    # ── Lookup / record ───────────────────────────────────────────────────
+    def sample(self, agent_id: str, history: list[dict], temperature: float) -> dict | None:
+        """A decision drawn from the cached distribution, or None on a miss."""
+        with self._lock:
+            entry = self._get(self.key(agent_id, history))
+            if entry is None or entry["n"] < self.min_samples:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {f: _sample(entry[f], temperature, self.rng) for f in FIELDS}
+
+    def record(self, agent_id: str, history: list[dict], decision: dict):
+        """Add one validated LLM decision to its key's distribution."""
+        key = self.key(agent_id, history)
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                entry = self._entries[key] = {"t": time.time(), "n": 0, **{f: {} for f in FIELDS}}
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            entry["n"] += 1
+            for f in FIELDS:
+                entry[f][decision[f]] = entry[f].get(decision[f], 0) + 1
+
+    # ── Persistence ───────────────────────────────────────────────────────
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[DecisionCache] Ignoring unreadable {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            self._entries = OrderedDict(
+                (k, v) for k, v in entries.items() if now - v.get("t", 0) <= self.ttl
+            )
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        print(f"[DecisionCache] Loaded {len(self._entries)} entries from {self.path}")
+
+    def save(self):
+        """Write the cache to `path` (temp file + rename)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._entries)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
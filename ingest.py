@@ -0,0 +1,130 @@
+"""
+ingest.py
+Write-coalescing ingestion pipeline behind POST /vote.
+
+submit() is synchronous and O(1): it rejects a user who already voted this
+round (in-process per-round set), appends the vote to a queue and returns,
+so the endpoint answers without waiting on the store. A background task
+drains the queue every INGEST_FLUSH_MS milliseconds and writes each round's
+votes with Store.create_votes — conditional creates, one transaction per
+500 docs on Firestore — which stays the source of truth: duplicates the set
+could not see (another API replica, a restart) are dropped there.
+
+The caller passes the current round (gameState): a vote for any round more
+than INGEST_ROUND_SLACK away raises WrongRound (/vote answers 409), and the
+per-round sets only keep the last few rounds before the current one — a
+client-supplied round never decides what is pruned. If the queue holds
+INGEST_MAX_PENDING votes, submit() raises QueueFull and /vote answers 503.
+"""
+
+import asyncio
+import os
+from collections import deque
+
+from storage import BATCH_LIMIT
+
+INGEST_FLUSH_MS    = float(os.getenv("INGEST_FLUSH_MS", "5"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "100000"))
+INGEST_KEEP_ROUNDS = 3    # rounds whose voter sets are kept for dedup
+INGEST_ROUND_SLACK = 1    # accepted distance from the current round (cache lag)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class WrongRound(Exception):
+    pass
+
+
+class VoteIngest:
+
+    def __init__(self, store, flush_ms: float = INGEST_FLUSH_MS,
+                 max_pending: int = INGEST_MAX_PENDING, max_batch: int = BATCH_LIMIT):
+        self.store       = store
+        self.flush_s     = flush_ms / 1000
+        self.max_pending = max_pending
+        self.max_batch   = max_batch
+        self._seen:  dict[int, set[str]] = {}
+        self._queue: deque[tuple[int, str, dict]] = deque()
+        self._wake   = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.accepted = self.duplicates = self.written = self.failed = 0
+
+    # ── Front door ────────────────────────────────────────────────────────
+    def submit(self, round_num: int, user_id: str, doc: dict, current_round: int) -> bool:
+        """Queue a vote. False if this user already voted this round."""
+        if abs(round_num - current_round) > INGEST_ROUND_SLACK:
+            raise WrongRound(round_num)
+        seen = self._seen.get(round_num)
+        if seen is None:
+            seen = self._seen[round_num] = set()
+            for old in [r for r in self._seen if r <= current_round - INGEST_KEEP_ROUNDS]:
+                del self._seen[old]
+        if user_id in seen:
+            self.duplicates += 1
+            return False
+        if len(self._queue) >= self.max_pending:
+            raise QueueFull()
+        seen.add(user_id)
+        self._queue.append((round_num, user_id, doc))
+        self.accepted += 1
+        self._wake.set()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    # ── Background writer ─────────────────────────────────────────────────
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            if not self._closing:
+                await asyncio.sleep(self.flush_s)    # let a burst accumulate
+            self._wake.clear()
+            while self._queue:
+                await self._flush_batch()
+            if self._closing:
+                return
+
+    async def _flush_batch(self):
+        by_round: dict[int, dict[str, dict]] = {}
+        for _ in range(min(len(self._queue), self.max_batch)):
+            round_num, user_id, doc = self._queue.popleft()
+            by_round.setdefault(round_num, {})[user_id] = doc
+        for round_num, votes in by_round.items():
+            try:
+                existing = await self.store.create_votes(round_num, votes)
+            except Exception as e:
+                # Not written: let these users try again
+                print(f"[Ingest] Write of {len(votes)} votes for round {round_num} failed: {e}")
+                self.failed += len(votes)
+                self._seen.get(round_num, set()).difference_update(votes)
+                continue
+            self.written    += len(votes) - len(existing)
+            self.duplicates += len(existing)
+
+    async def close(self):
+        """Stop the writer after flushing everything queued."""
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+        while self._queue:
+            await self._flush_batch()
+
+    def stats(self) -> dict:
+        return {
+            "pending":    self.pending,
+            "accepted":   self.accepted,
+            "written":    self.written,
+            "duplicates": self.duplicates,
+            "failed":     self.failed,
+        }
@@ -0,0 +1,191 @@
+"""
+lease.py
+Leader election: exactly one process runs a given loop (the round loop, the
+standalone agent voter) while any number of others stand by.
+
+  StoreLease : leases/{name} in the shared store. Acquired and renewed with a
+               transaction (free, expired or already ours → take it for
+               LEASE_TTL seconds); every change of holder bumps an epoch.
+               RoundManager passes `fence` to close_round, so a leader that
+               lost its lease without noticing cannot commit a round.
+  FileLease  : fcntl lock on LEASE_PATH, for several processes on one host
+               (uvicorn --workers, tests). The OS drops the lock when the
+               holder dies, so failover needs no expiry.
+
+Leadership.run(loop_fn) campaigns every LEASE_TTL/3 seconds; once elected it
+runs loop_fn() and renews at the same interval. If the lease cannot be
+renewed before it would expire, the loop is cancelled. A clean shutdown
+releases the lease so a standby takes over on its next attempt.
+
+make_lease() picks the backend from LEASE_BACKEND (store | file | none).
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:       # Windows: FileLease unavailable
+    fcntl = None
+
+LEASE_BACKEND = os.getenv("LEASE_BACKEND", "store")      # store | file | none
+LEASE_TTL     = float(os.getenv("LEASE_TTL", "10"))      # seconds
+LEASE_PATH    = os.getenv("LEASE_PATH", ".projectnn-{name}.lock")
+
+
+def holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+# ─── Backends ────────────────────────────────────────────────────────────────
+class StoreLease:
+
+    def __init__(self, store, name: str, ttl: float = LEASE_TTL):
+        self.store  = store
+        self.name   = name
+        self.ttl    = ttl
+        self.holder = holder_id()
+        self.epoch: int | None = None
+
+    @property
+    def fence(self) -> tuple[str, str]:
+        return (self.name, self.holder)
+
+    async def acquire(self) -> bool:
+        """Take or renew the lease; False if another holder's lease is live."""
+        self.epoch = await self.store.acquire_lease(self.name, self.holder, int(self.ttl * 1000))
+        return self.epoch is not None
+
+    async def release(self):
+        self.epoch = None
+        await self.store.release_lease(self.name, self.holder)
+
+
+class FileLease:
+
+    def __init__(self, name: str, path: str = LEASE_PATH, ttl: float = LEASE_TTL):
+        if fcntl is None:
+            raise RuntimeError("FileLease needs fcntl (POSIX); use LEASE_BACKEND=store")
+        self.name   = name
+        self.path   = path.format(name=name)
+        self.ttl    = ttl
+        self.holder = holder_id()
+        self._fd: int | None = None
+
+    @property
+    def fence(self) -> None:
+        return None        # only guards processes sharing this host
+
+    async def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, self.holder.encode())
+        self._fd = fd
+        return True
+
+    async def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class NoLease:
+    """Always the leader (single-process deployments, simulations)."""
+
+    name  = "none"
+    ttl   = LEASE_TTL
+    fence = None
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self):
+        pass
+
+
+def make_lease(name: str, store=None, backend: str = None):
+    """store (default) | file | none, from LEASE_BACKEND."""
+    backend = backend or LEASE_BACKEND
+    if backend == "store":
+        return StoreLease(store, name)
+    if backend == "file":
+        return FileLease(name)
+    if backend == "none":
+        return NoLease()
+    raise ValueError(f"Unknown LEASE_BACKEND: {backend!r}")
+
+
+# ─── Election loop ───────────────────────────────────────────────────────────
+class Leadership:
+
+    def __init__(self, lease):
+        self.lease     = lease
+        self.interval  = lease.ttl / 3
+        self.is_leader = False
+        self.terms     = 0                  # times this process was elected
+
+    async def run(self, loop_fn):
+        """
+        Campaign forever; run loop_fn() whenever this process leads. Cancel
+        the task running this to step down and release the lease.
+        """
+        while True:
+            try:
+                elected = await self.lease.acquire()
+            except Exception as e:
+                print(f"[Lease] {self.lease.name}: acquire failed: {e}")
+                elected = False
+            if elected:
+                self.is_leader = True
+                self.terms    += 1
+                print(f"[Lease] {self.lease.name}: elected (term {self.terms})")
+                try:
+                    await self._lead(loop_fn)
+                finally:
+                    self.is_leader = False
+                    try:
+                        await self.lease.release()
+                    except Exception as e:
+                        print(f"[Lease] {self.lease.name}: release failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _lead(self, loop_fn):
+        """Run loop_fn() while renewing; cancel it once the lease is gone."""
+        task    = asyncio.create_task(loop_fn())
+        expires = time.monotonic() + self.lease.ttl
+        try:
+            while True:
+                await asyncio.wait({task}, timeout=self.interval)
+                if task.done():
+                    break
+                asked = time.monotonic()
+                try:
+                    if not await self.lease.acquire():
+                        print(f"[Lease] {self.lease.name}: taken over, stopping loop")
+                        break
+                    expires = asked + self.lease.ttl
+                except Exception as e:
+                    # Keep leading while the last renewal is still valid
+                    print(f"[Lease] {self.lease.name}: renew failed: {e}")
+                    if time.monotonic() >= expires - self.interval:
+                        print(f"[Lease] {self.lease.name}: expiring, stopping loop")
+                        break
+        finally:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                print(f"[Lease] {self.lease.name}: loop stopped: {e}")
@@ -0,0 +1,274 @@
+"""
+llm.py
+Process-wide OpenAI access for agent voting (round_manager.py, agent_voter.py).
+Both voters go through decide_pool(), which owns the choice between the
+local policy, batched requests and per-agent requests, and the per-agent
+fallback when the LLM errs or misses the deadline.
+
+One AsyncOpenAI client is created lazily and reused for every agent call, so
+its HTTP connection pool and TLS sessions survive across rounds instead of
+being rebuilt per call. A semaphore caps how many completions are in flight
+at once; callers enforce their own deadline (asyncio.wait_for per agent, or
+agents_decision's timeout), which cancels late requests and frees the slot.
+
+With LLM_BATCH (default on) callers ask for the selected agents in
+structured requests of up to LLM_BATCH_SIZE agents (agents_decision)
+instead of one completion per agent; entries that are missing or invalid
+come back absent so the caller can fall back per agent. OPENAI_BASE_URL
+points the client elsewhere, e.g. at mock_llm.py for local testing.
+
+Decisions are memoised per agent and history signature (decision_cache.py):
+a situation the model has already answered often enough is served by
+sampling from its past answers, skipping the round trip.
+"""
+
+import asyncio
+import json
+import os
+
+from decision_cache import LLM_CACHE_SIZE, DecisionCache
+
+try:
+    from openai import AsyncOpenAI
+    _HAS_OPENAI = True
+except ImportError:
+    _HAS_OPENAI = False
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+OPENAI_MODEL     = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LLM_CONCURRENCY  = int(os.getenv("LLM_CONCURRENCY", "12"))     # in-flight calls
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "10"))  # hard ceiling (s)
+LLM_TEMPERATURE  = float(os.getenv("LLM_TEMPERATURE", "0.85"))
+LLM_BATCH        = os.getenv("LLM_BATCH", "1") not in ("0", "false", "no")
+LLM_BATCH_SIZE   = int(os.getenv("LLM_BATCH_SIZE", "25"))     # agents per batched request
+
+# "llm": agents ask the LLM, falling back to the local policy per agent;
+# "local": agent_policy.AgentPolicy only (no network, reproducible with a seed)
+AGENT_MODE       = os.getenv("AGENT_MODE", "llm")
+
+EMOTION_OPTIONS   = ["very_low", "low", "neutral", "strong", "very_strong"]
+INFLUENCE_OPTIONS = ["no", "neutral", "yes"]
+
+_client    = None
+_semaphore = None
+_cache     = None
+
+
+# ─── Client ───────────────────────────────────────────────────────────────────
+def available() -> bool:
+    """True when the SDK is installed and an API key is configured."""
+    return _HAS_OPENAI and bool(os.getenv("OPENAI_API_KEY"))
+
+
+def get_client():
+    global _client
+    if _client is None:
+        # No SDK retries: a retry can never land inside a 5s agent window.
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=LLM_HTTP_TIMEOUT,
+            max_retries=0,
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    return _semaphore
+
+
+def get_cache() -> DecisionCache | None:
+    """The shared decision cache (None when LLM_CACHE_SIZE=0)."""
+    global _cache
+    if _cache is None and LLM_CACHE_SIZE > 0:
+        _cache = DecisionCache()
+    return _cache
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+    if _cache is not None:
+        await asyncio.to_thread(_cache.save)
+
+
+def llm_mode(mode: str = None) -> bool:
+    """True for AGENT_MODE=llm, False for local; anything else is rejected."""
+    mode = mode or AGENT_MODE
+    if mode not in ("llm", "local"):
+        raise ValueError(f"Unknown AGENT_MODE: {mode!r} (llm | local)")
+    return mode == "llm"
+
+
+# ─── Agent decision ───────────────────────────────────────────────────────────
+def agent_prompt(agent: dict, history: list) -> str:
+    hist_str = json.dumps(history[-5:]) if history else "[]"
+    return (
+        f"You are {agent['name']}. {agent['personality']}\n"
+        f"Last 5 rounds: {hist_str}\n\n"
+        "Vote RED or GREEN. Also rate emotional intensity and history influence.\n"
+        "Respond ONLY with valid JSON, no extra text:\n"
+        '{"color":"RED","emotionFeel":"neutral","influenceHistory":"yes"}\n'
+        "emotionFeel options: very_low, low, neutral, strong, very_strong\n"
+        "influenceHistory options: no, neutral, yes"
+    )
+
+
+def validate_decision(agent: dict, data: dict) -> dict:
+    """Raise on a bad color; replace bad emotion/influence with persona defaults."""
+    if data.get("color") not in ("RED", "GREEN"):
+        raise ValueError("bad color")
+    if data.get("emotionFeel") not in EMOTION_OPTIONS:
+        data["emotionFeel"] = agent["emotion_bias"]
+    if data.get("influenceHistory") not in INFLUENCE_OPTIONS:
+        data["influenceHistory"] = agent["history_bias"]
+    return data
+
+
+async def agent_decision(agent: dict, history: list) -> dict:
+    """
+    Ask the model for one agent's vote, or sample it from the decision cache
+    when this agent has seen this history before. Raises on any API or parse
+    error so the caller can substitute its own fallback.
+    """
+    cache = get_cache()
+    if cache is not None:
+        cached = cache.sample(agent["id"], history, LLM_TEMPERATURE)
+        if cached is not None:
+            return cached
+
+    async with _get_semaphore():
+        res = await get_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": agent_prompt(agent, history)}],
+            max_tokens=60,
+            temperature=LLM_TEMPERATURE,
+        )
+    raw = res.choices[0].message.content.strip()
+    raw = raw.replace("```json", "").replace("```", "").strip()
+    decision = validate_decision(agent, json.loads(raw))
+    if cache is not None:
+        cache.record(agent["id"], history, decision)
+    return decision
+
+
+# ─── Batched decisions (one request for the whole agent pool) ────────────────
+def batch_prompt(agents: list[dict], history: list) -> str:
+    hist_str = json.dumps(history[-5:]) if history else "[]"
+    roster   = "\n".join(f"- {a['id']} ({a['name']}): {a['personality']}" for a in agents)
+    return (
+        "You play each of these voters independently, staying in character:\n"
+        f"{roster}\n\n"
+        f"Last 5 rounds: {hist_str}\n\n"
+        "Each voter votes RED or GREEN and rates emotional intensity and history influence.\n"
+        "Respond ONLY with valid JSON, one entry per voter id, no extra text:\n"
+        '{"votes":[{"id":"agent_001","color":"RED","emotionFeel":"neutral","influenceHistory":"yes"}]}\n'
+        f"emotionFeel options: {', '.join(EMOTION_OPTIONS)}\n"
+        f"influenceHistory options: {', '.join(INFLUENCE_OPTIONS)}"
+    )
+
+
+async def _batch_request(agents: list[dict], history: list) -> dict[str, dict]:
+    async with _get_semaphore():
+        res = await get_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": batch_prompt(agents, history)}],
+            max_tokens=40 * len(agents) + 20,
+            temperature=LLM_TEMPERATURE,
+            response_format={"type": "json_object"},
+        )
+    raw   = res.choices[0].message.content.strip()
+    raw   = raw.replace("```json", "").replace("```", "").strip()
+    votes = {v.get("id"): v for v in json.loads(raw).get("votes", []) if isinstance(v, dict)}
+
+    out = {}
+    for agent in agents:
+        try:
+            out[agent["id"]] = validate_decision(agent, {f: votes[agent["id"]].get(f) for f in
+                                                         ("color", "emotionFeel", "influenceHistory")})
+        except (KeyError, ValueError):
+            continue
+    return out
+
+
+async def agents_decision(agents: list[dict], history: list,
+                          timeout: float = None) -> dict[str, dict]:
+    """
+    Votes for several agents: {agent id: decision}. Cached agents are
+    answered locally; the rest are sent LLM_BATCH_SIZE per request, the
+    requests running concurrently. Requests still running after `timeout`
+    seconds are cancelled and only their agents go without; entries the
+    model omitted or got wrong (or whose request failed) are left out too,
+    so callers fall back per agent. Raises only if every request fails.
+    """
+    cache = get_cache()
+    out, ask = {}, []
+    for agent in agents:
+        cached = cache.sample(agent["id"], history, LLM_TEMPERATURE) if cache is not None else None
+        if cached is not None:
+            out[agent["id"]] = cached
+        else:
+            ask.append(agent)
+    if not ask:
+        return out
+
+    chunks = [ask[i:i + LLM_BATCH_SIZE] for i in range(0, len(ask), LLM_BATCH_SIZE)]
+    tasks  = [asyncio.create_task(_batch_request(c, history)) for c in chunks]
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+    finally:
+        for t in tasks:
+            t.cancel()                   # late chunks (or our own cancellation)
+    errors = [t.exception() for t in done if t.exception() is not None]
+    if errors and len(errors) == len(tasks):
+        raise errors[0]
+
+    for t in done:
+        if t.exception() is not None:
+            continue
+        got = t.result()
+        out.update(got)
+        if cache is not None:
+            for agent_id, decision in got.items():
+                cache.record(agent_id, history, decision)
+    return out
+
+
+# ─── Pool dispatch (both voters) ──────────────────────────────────────────────
+async def decide_pool(agents: list[dict], history: list, fallbacks: list[dict],
+                      timeout: float = None, use_llm: bool = True) -> list[dict]:
+    """
+    One decision per agent, in order. Without the LLM (use_llm False, no
+    SDK or key) the fallbacks are the votes; otherwise the pool is asked in
+    batches (LLM_BATCH) or one request per agent, and any agent without a
+    valid answer `timeout` seconds from now keeps its fallback.
+    """
+    if not (use_llm and available()):
+        return list(fallbacks)
+
+    if LLM_BATCH:
+        try:
+            got = await agents_decision(agents, history, timeout=timeout)
+        except Exception as e:
+            print(f"  [OpenAI fallback] batch of {len(agents)}: {e}")
+            got = {}
+        if len(got) < len(agents):
+            print(f"  [OpenAI fallback] {len(agents) - len(got)} of {len(agents)} "
+                  f"agents missing (deadline or bad answer)")
+        return [got.get(a["id"], f) for a, f in zip(agents, fallbacks)]
+
+    async def _decide(agent, fallback):
+        try:
+            return await asyncio.wait_for(agent_decision(agent, history), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"  [Deadline fallback] {agent['name']}")
+        except Exception as e:
+            print(f"  [OpenAI fallback] {agent['name']}: {e}")
+        return fallback
+
+    return list(await asyncio.gather(*[_decide(a, f) for a, f in zip(agents, fallbacks)]))
@@ -7,40 +7,65 @@ Two ways to run this project:
   B) standalone agents:  python agent_voter.py (separate process)
      Both can run simultaneously — agent_voter.py will only fire in the agent window
      and round_manager.py will skip agents that already voted.
+
+Any number of workers / replicas can serve the API: the round loop runs only
+in the one holding the "roundLoop" lease (lease.py, LEASE_BACKEND=store |
+file | none), and a standby takes over within LEASE_TTL if it dies.
 """
 
 import os
 import sys
+import time
 import asyncio
 from contextlib import asynccontextmanager
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import firebase_admin
-from firebase_admin import credentials, firestore as fs
 
-# ── Init Firebase ─────────────────────────────────────────────────────────────
-FIREBASE_CRED = os.getenv("FIREBASE_CREDENTIALS_PATH", "serviceAccount.json")
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_CRED)
-    firebase_admin.initialize_app(cred)
-db = fs.client()
+import llm
+from ingest import QueueFull, VoteIngest, WrongRound
+from lease import Leadership, make_lease
+from round_cache import RoundCache
+from storage import make_store
+
+# ── Init storage (STORE_BACKEND=firestore | memory | sqlite) ──────────────────
+# One async store (and one bounded I/O pool) shared by the API and the manager.
+store = make_store()
+
+# ── Vote ingestion: dedup + queue in-process, batched conditional writes ──────
+ingest = VoteIngest(store)
+
+# ── Recent results + gameState, written through by the round manager ─────────
+results = RoundCache(store)
 
 # ── Background round manager ──────────────────────────────────────────────────
+# Every worker / replica campaigns for the round-loop lease; only the holder
+# runs rounds, the rest serve the API and take over if it dies.
+leadership = Leadership(make_lease("roundLoop", store))
 _manager = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global _manager
     from round_manager import RoundManager
-    _manager = RoundManager()
-    asyncio.create_task(_manager.run())
+    _manager = RoundManager(store=store, results=results, lease=leadership.lease)
+    leader_task = asyncio.create_task(leadership.run(_manager.run))
+    ingest.start()
     yield
-    if _manager:
-        _manager.model.save_rl("rl_weights.pkl")
+    leader_task.cancel()                   # stops the loop, releases the lease
+    try:
+        await leader_task
+    except asyncio.CancelledError:
+        pass
+    await ingest.close()
+    if _manager and _manager.checkpoint:
+        _manager.checkpoint.close()        # the leader flushed it on step-down
+    await llm.close()
+    store.close()
 
 
 app = FastAPI(title="Project NN API", lifespan=lifespan)
@@ -61,66 +86,115 @@ class VoteRequest(BaseModel):
 
 
 @app.get("/health")
-def health():
-    return {"status": "ok", "round": db.collection("gameState").document("currentRound").get().to_dict()}
+async def health():
+    return {"status": "ok", "round": await results.get_state(), "ingest": ingest.stats(),
+            "cache": results.stats(), "leader": leadership.is_leader,
+            "lateness": _manager.lateness if _manager else None}
 
 
 @app.post("/vote")
-def cast_vote(req: VoteRequest):
+async def cast_vote(req: VoteRequest):
     if req.color not in ("RED", "GREEN"):
         raise HTTPException(400, "color must be RED or GREEN")
-    import time
-    doc_ref = (
-        db.collection("rounds")
-          .document(str(req.roundNum))
-          .collection("votes")
-          .document(req.userId)
-    )
-    if doc_ref.get().exists:
+    state = await results.get_state()
+    if state is None:
+        raise HTTPException(409, "No round in progress")
+    try:
+        accepted = ingest.submit(req.roundNum, req.userId, {
+            "userId":           req.userId,
+            "color":            req.color,
+            "emotionFeel":      req.emotionFeel,
+            "influenceHistory": req.influenceHistory,
+            "isAgent":          False,
+            "votedAt":          int(time.time() * 1000),
+        }, current_round=state["round"])
+    except WrongRound:
+        raise HTTPException(409, f"Round {req.roundNum} is not open "
+                                 f"(current round {state['round']})")
+    except QueueFull:
+        raise HTTPException(503, "Vote queue full, try again")
+    if not accepted:
         raise HTTPException(409, "Already voted this round")
-    doc_ref.set({
-        "userId":           req.userId,
-        "color":            req.color,
-        "emotionFeel":      req.emotionFeel,
-        "influenceHistory": req.influenceHistory,
-        "isAgent":          False,
-        "votedAt":          int(time.time() * 1000),
-    })
     return {"status": "ok"}
 
 
+STREAM_HEARTBEAT = 15   # seconds between keep-alive comments on /stream
+
+
+@app.get("/stream")
+async def stream(request: Request):
+    """
+    Server-Sent Events: phase, tally, prediction, result and metrics events
+    pushed from the round manager's in-memory state. One data source for any
+    number of viewers; nothing is read from the store per connection.
+    The leader publishes as it runs the rounds; any other worker relays them
+    from the store listeners while it has viewers (RoundManager.start_relay).
+    Open streams end if this worker stops leading; clients reconnect.
+    """
+    if _manager is None:
+        raise HTTPException(503, "Round manager not running", headers={"Retry-After": "1"})
+    _manager.start_relay()
+
+    async def frames():
+        try:
+            with _manager.events.subscribe() as queue:
+                while not await request.is_disconnected():
+                    try:
+                        frame = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT)
+                    except asyncio.TimeoutError:
+                        yield b": keep-alive\n\n"
+                        continue
+                    if frame is None:
+                        return
+                    yield frame
+        finally:
+            if len(_manager.events) == 0:
+                _manager.stop_relay()         # last viewer gone
+
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.get("/metrics")
-def get_metrics(limit: int = 100):
-    docs = (
-        db.collection("metrics")
-          .order_by("round", direction=fs.Query.DESCENDING)
-          .limit(limit)
-          .stream()
-    )
-    rows = sorted([d.to_dict() for d in docs], key=lambda x: x["round"])
-    return {"metrics": rows}
+async def get_metrics(request: Request, response: Response,
+                      limit: int | None = None, points: int | None = None,
+                      after: int | None = None, before: int | None = None):
+    """
+    Metrics series served from the manager's in-memory cache.
+      limit  : rows per page (default 100); newest rows unless `after` is set
+      after  : cursor, return rounds > after (follow `next_cursor` to page)
+      before : return rounds < before
+      points : downsample the selected range to this many points (LTTB)
+    Honors If-None-Match with 304 when the series has not changed. Workers
+    not running the round loop refresh the cache from the store first, and
+    rounds older than the cached window are paged in on demand.
+    """
+    if _manager is not None:
+        await _manager.follow()
+    series = _manager.metrics if _manager else None
+    if series is None or not series.ready:
+        return {"metrics": await store.list_metrics(limit or 100)}
+
+    await series.cover(after=after, before=before, limit=limit, points=points)
+    etag = series.etag(limit=limit, points=points, after=after, before=before)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return series.query(after=after, before=before, limit=limit, points=points)
 
 
 @app.get("/results")
-def get_results(limit: int = 20):
+async def get_results(limit: int = 20):
     """Returns last N rounds with prediction, winner, correct flag."""
-    docs = (
-        db.collection("roundResults")
-          .order_by("round", direction=fs.Query.DESCENDING)
-          .limit(limit)
-          .stream()
-    )
-    rows = sorted([d.to_dict() for d in docs if d.to_dict().get("status") == "done"],
-                  key=lambda x: x["round"])
-    return {"results": rows}
+    return {"results": await results.list_done(limit)}
 
 
 @app.get("/prediction/{round_num}")
-def get_prediction(round_num: int):
-    snap = db.collection("roundResults").document(str(round_num)).get()
-    if not snap.exists:
+async def get_prediction(round_num: int):
+    d = await results.get_result(round_num)
+    if d is None:
         raise HTTPException(404, "Round not found")
-    d = snap.to_dict()
     return {
         "round":      round_num,
         "prediction": d.get("prediction"),
@@ -129,4 +203,26 @@ def get_prediction(round_num: int):
         "accuracy":   d.get("accuracy"),
         "loss":       d.get("loss"),
         "status":     d.get("status"),
-    }
\ No newline at end of file
+    }
+
+@app.get("/models")
+async def get_models():
+    """Primary and shadow models with their running accuracy."""
+    if _manager is None:
+        raise HTTPException(503, "Round manager not running")
+    return await _manager.model_status()
+
+
+@app.post("/models/{name}/promote")
+async def promote_model(name: str):
+    """
+    Make a shadow model the primary once a round closes. Any worker accepts
+    the request; the round leader applies it (gameState/promotion).
+    """
+    if _manager is None:
+        raise HTTPException(503, "Round manager not running")
+    try:
+        await _manager.request_promotion(name)
+    except KeyError:
+        raise HTTPException(404, "Unknown model")
+    return {"status": "scheduled", "model": name}
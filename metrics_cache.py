@@ -0,0 +1,175 @@
+"""
+metrics_cache.py
+In-process cache of the metrics series, maintained by RoundManager.
+
+The manager seeds it at bootstrap with the newest METRICS_SEED rounds and
+appends each round's metrics doc as the round closes, so recent queries
+never touch Firestore and an election costs a bounded read. A query that
+reaches further back (an old `after` cursor, a deep page, downsampling the
+whole series) first pages older rounds in from the store, METRICS_PAGE at a
+time, up to METRICS_CACHE_SIZE rounds in memory. Queries support cursor
+ranges (after / before, both exclusive), a row limit, and server-side
+downsampling to a point budget with LTTB (largest-triangle-three-buckets),
+which keeps the visual shape of the cumulative accuracy curve.
+Every change bumps `version`; etag() turns a per-process id, version, the
+newest round and the query into an ETag, so unchanged responses can be
+answered with 304 and a restarted (or different) worker never matches a
+tag it did not issue.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import os
+import uuid
+
+import numpy as np
+
+METRICS_CACHE_SIZE = 100_000                                # rounds kept in memory (oldest dropped first)
+METRICS_SEED       = int(os.getenv("METRICS_SEED", "2000"))  # newest rounds read at bootstrap
+METRICS_PAGE       = int(os.getenv("METRICS_PAGE", "5000"))  # older rounds read per page
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of `points` samples chosen by largest-triangle-three-buckets."""
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.asarray([0, n - 1][:max(points, 0)])
+
+    edges = np.linspace(1, n - 1, points - 1).astype(int)   # buckets over x[1:-1]
+    keep  = [0]
+    a     = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # average of the next bucket (or the last point)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy   = x[nlo:max(nhi, nlo + 1)].mean(), y[nlo:max(nhi, nlo + 1)].mean()
+        area = np.abs(
+            (x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep.append(a)
+    keep.append(n - 1)
+    return np.asarray(keep)
+
+
+class MetricsSeries:
+
+    def __init__(self, store=None, max_rows: int = METRICS_CACHE_SIZE):
+        self.store    = store           # pages older rounds in; None = seeded rows only
+        self.max_rows = max_rows
+        self.rows:   list[dict] = []
+        self.rounds: list[int]  = []    # parallel to rows, for bisect
+        self.version  = 0
+        self.ready    = False           # True once seeded from the store
+        self.complete = False           # nothing older than rows[0] in the store
+        self.boot     = uuid.uuid4().hex[:8]
+        self._paging  = asyncio.Lock()
+
+    # ── Maintenance ───────────────────────────────────────────────────────
+    def seed(self, rows: list[dict], limit: int = METRICS_SEED):
+        """
+        From store.list_metrics(limit). Older rows already cached are kept
+        when they join up with the new ones (a re-election), so history
+        paged in once is not read again.
+        """
+        rows = sorted(rows, key=lambda r: r["round"])
+        complete = len(rows) < limit
+        if rows and self.rows and self.rounds[-1] >= rows[0]["round"] - 1:
+            keep     = bisect.bisect_left(self.rounds, rows[0]["round"])
+            rows     = self.rows[:keep] + rows
+            complete = complete or self.complete
+        self.rows     = rows[-self.max_rows:]
+        self.rounds   = [r["round"] for r in self.rows]
+        self.complete = complete and len(self.rows) == len(rows)
+        self.version += 1
+        self.ready    = True
+
+    def append(self, row: dict):
+        rnum = row["round"]
+        i    = bisect.bisect_left(self.rounds, rnum)
+        if i < len(self.rounds) and self.rounds[i] == rnum:
+            self.rows[i] = row
+        else:
+            self.rows.insert(i, row)
+            self.rounds.insert(i, rnum)
+            if len(self.rows) > self.max_rows:
+                del self.rows[0], self.rounds[0]
+                self.complete = False
+        self.version += 1
+
+    def last(self) -> dict | None:
+        return self.rows[-1] if self.rows else None
+
+    # ── Paging older rounds in (read-through) ─────────────────────────────
+    def _covers(self, after: int | None, before: int | None, limit: int | None,
+                points: int | None) -> bool:
+        if self.complete or len(self.rows) >= self.max_rows or not self.rows:
+            return True
+        if after is not None:
+            return self.rounds[0] <= after + 1
+        if points:
+            return False                # downsampling needs the whole range
+        hi = bisect.bisect_left(self.rounds, before) if before is not None else len(self.rounds)
+        return hi >= (limit or 100)
+
+    async def cover(self, after: int = None, before: int = None, limit: int = None,
+                    points: int = None):
+        """Page older rounds in from the store until query() can answer this."""
+        if self.store is None or self._covers(after, before, limit, points):
+            return
+        async with self._paging:
+            while not self._covers(after, before, limit, points):
+                first = self.rounds[0]
+                room  = min(METRICS_PAGE, self.max_rows - len(self.rows))
+                older = await self.store.list_metrics(room, before=first)
+                if not self.rows or self.rounds[0] != first:
+                    return              # reseeded meanwhile; next request retries
+                self.rows     = older + self.rows
+                self.rounds   = [r["round"] for r in older] + self.rounds
+                self.complete = len(older) < room
+                self.version += 1
+                if not older:
+                    return
+
+    # ── Queries ───────────────────────────────────────────────────────────
+    def etag(self, **query) -> str:
+        key    = repr(sorted(query.items())).encode()
+        newest = self.rounds[-1] if self.rounds else 0
+        return (f'W/"{self.boot}-{self.version}-{newest}-'
+                f'{hashlib.blake2b(key, digest_size=6).hexdigest()}"')
+
+    def query(self, after: int = None, before: int = None, limit: int = None,
+              points: int = None, field: str = "cumAcc") -> dict:
+        """
+        Rows with after < round < before. With `points`, the whole range is
+        downsampled on `field`; otherwise `limit` rows are returned: the first
+        ones after the cursor when `after` is given (next_cursor continues the
+        page), else the newest ones.
+        """
+        lo = bisect.bisect_right(self.rounds, after) if after is not None else 0
+        hi = bisect.bisect_left(self.rounds, before) if before is not None else len(self.rounds)
+        rows, total, next_cursor = self.rows[lo:hi], max(hi - lo, 0), None
+
+        if points:
+            x = np.asarray(self.rounds[lo:hi], dtype=float)
+            y = np.asarray([r.get(field, r.get("accuracy", 0)) or 0 for r in rows],
+                           dtype=float)
+            rows = [rows[i] for i in lttb(x, y, points)]
+        else:
+            limit = limit or 100
+            if after is not None:
+                if len(rows) > limit:
+                    rows        = rows[:limit]
+                    next_cursor = rows[-1]["round"]
+            else:
+                rows = rows[-limit:]
+
+        return {
+            "metrics":     rows,
+            "total":       total,
+            "next_cursor": next_cursor,
+            "version":     self.version,
+        }
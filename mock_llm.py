@@ -0,0 +1,110 @@
+"""
+mock_llm.py
+Local stand-in for the OpenAI chat completions API, for testing the agent
+phase without network access or spend.
+
+  python mock_llm.py --port 8001 [--latency 0.3] [--drop-rate 0.1] [--error-rate 0.05]
+  OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=mock python simulate.py --llm ...
+
+POST /v1/chat/completions answers both prompt shapes llm.py sends: the
+single-agent prompt gets one {"color", "emotionFeel", "influenceHistory"}
+object, the batched prompt (llm.batch_prompt) gets {"votes": [...]} with
+one entry per "- <id> (<name>)" roster line. Votes are random but seeded.
+
+Failure injection: --latency delays every response, --drop-rate leaves
+agents out of a batched answer or returns a bad color (exercises per-agent
+fallback), --error-rate answers HTTP 500.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+
+from llm import EMOTION_OPTIONS, INFLUENCE_OPTIONS
+
+ROSTER_LINE = re.compile(r"^- (\S+) \(", re.MULTILINE)
+
+config = {"latency": 0.0, "drop_rate": 0.0, "error_rate": 0.0}
+rng    = random.Random(0)
+_ids   = itertools.count(1)
+
+app = FastAPI(title="Mock LLM")
+
+
+def _vote() -> dict:
+    return {
+        "color":            rng.choice(["RED", "GREEN"]),
+        "emotionFeel":      rng.choice(EMOTION_OPTIONS),
+        "influenceHistory": rng.choice(INFLUENCE_OPTIONS),
+    }
+
+
+def answer(prompt: str) -> dict:
+    """The JSON the model would return for one of llm.py's prompts."""
+    ids = ROSTER_LINE.findall(prompt)
+    if not ids:
+        vote = _vote()
+        if rng.random() < config["drop_rate"]:
+            vote["color"] = "BLUE"
+        return vote
+    votes = []
+    for agent_id in ids:
+        if rng.random() < config["drop_rate"]:
+            continue
+        votes.append({"id": agent_id, **_vote()})
+    return {"votes": votes}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if config["latency"]:
+        await asyncio.sleep(config["latency"])
+    if rng.random() < config["error_rate"]:
+        raise HTTPException(500, "injected failure")
+
+    prompt  = body["messages"][-1]["content"]
+    content = json.dumps(answer(prompt))
+    return {
+        "id":      f"chatcmpl-mock-{next(_ids)}",
+        "object":  "chat.completion",
+        "created": int(time.time()),
+        "model":   body.get("model", "mock"),
+        "choices": [{
+            "index":         0,
+            "message":       {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens":     len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens":      (len(prompt) + len(content)) // 4,
+        },
+    }
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument("--host",       default="127.0.0.1")
+    parser.add_argument("--port",       type=int,   default=8001)
+    parser.add_argument("--latency",    type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--drop-rate",  type=float, default=0.0, help="per-agent bad/missing vote rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 rate")
+    parser.add_argument("--seed",       type=int,   default=0)
+    args = parser.parse_args()
+
+    config.update(latency=args.latency, drop_rate=args.drop_rate, error_rate=args.error_rate)
+    rng.seed(args.seed)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
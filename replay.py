@@ -0,0 +1,218 @@
+"""
+replay.py
+Offline replay / backtesting of HMNN + RL correction on exported rounds.
+
+Drives RLModel.predict / RLModel.update through recorded rounds as fast as
+the CPU allows, mirroring the live pipeline in round_manager.py:
+  prediction for round n = HMNN over rounds n-4 … n (round n's own votes as
+  the current matrix) + RL correction on the last 5 round summaries,
+  followed by the RL update on round n's recorded winner.
+HMNN does not learn online, so its logits for every round are computed
+up front in batched forward passes and shared by all ALPHA runs.
+
+Dump format (JSONL, one doc per line; .parquet with the same columns also
+works when pandas + pyarrow are installed):
+  votes   : rounds/*/votes docs plus a "round" field
+  results : roundResults docs  { round, redVotes, greenVotes, winner, ... }
+
+Usage:
+  python replay.py export --out dump/ [--limit 5000]        # needs Firebase
+  python replay.py run --votes dump/votes.jsonl --results dump/results.jsonl \\
+                       [--alpha 0.01 0.05 0.1] [--rl-weights rl_weights.npz]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from rl_model import ALPHA, EMOTION_MAP, INFLUENCE_MAP, T, RLModel
+
+CHUNK = 4096   # windows per forward_batch call
+
+
+# ─── Loading ─────────────────────────────────────────────────────────────────
+def _read_rows(path: str) -> list[dict]:
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise SystemExit("Reading .parquet dumps requires pandas and pyarrow")
+        return pd.read_parquet(path).to_dict("records")
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_dump(votes_path: str, results_path: str):
+    """
+    Returns (rounds, votes_by_round, results): the sorted round numbers that
+    have a final winner, their vote docs, and their roundResults docs.
+    """
+    results = {}
+    for r in _read_rows(results_path):
+        if r.get("winner"):
+            results[int(r["round"])] = r
+
+    votes_by_round: dict[int, list[dict]] = {}
+    for v in _read_rows(votes_path):
+        rnum = int(v.get("round", v.get("roundNum", -1)))
+        votes_by_round.setdefault(rnum, []).append(v)
+
+    return sorted(results), votes_by_round, results
+
+
+# ─── Encoding + batched HMNN ─────────────────────────────────────────────────
+def encode_rounds(rounds: list[int], votes_by_round: dict):
+    """Encode every round once: V (R, N, 3) float, M (R, N) bool."""
+    n_max = max((len(votes_by_round.get(r, [])) for r in rounds), default=0)
+    V = np.zeros((len(rounds), n_max, 3))
+    M = np.zeros((len(rounds), n_max), dtype=bool)
+    for i, rnum in enumerate(rounds):
+        for j, v in enumerate(votes_by_round.get(rnum, [])):
+            V[i, j] = (
+                1.0 if v.get("color") == "GREEN" else 0.0,
+                EMOTION_MAP.get(v.get("emotionFeel"), 0.5),
+                INFLUENCE_MAP.get(v.get("influenceHistory"), 0.5),
+            )
+            M[i, j] = True
+    return V, M
+
+
+def hmnn_logits(model: RLModel, V: np.ndarray, M: np.ndarray) -> np.ndarray:
+    """
+    HMNN logits for every round: the window ending at round i is rounds
+    i-T+1 … i. Rounds with fewer than T predecessors get zeros, as live.
+    """
+    R      = len(V)
+    logits = np.zeros((R, 2))
+    if R < T:
+        return logits
+    offsets = np.arange(-T + 1, 1)
+    for start in range(T - 1, R, CHUNK):
+        idx = np.arange(start, min(start + CHUNK, R))[:, None] + offsets   # (b, T)
+        logits[idx[:, -1]] = model.hmnn.forward_batch(V[idx], M[idx])
+    return logits
+
+
+# ─── Replay ──────────────────────────────────────────────────────────────────
+def replay(model: RLModel, rounds: list[int], results: dict,
+           logits: np.ndarray, every: int = 100) -> dict:
+    history: list[dict] = []
+    curve   = []
+    metrics = {}
+    t0 = time.perf_counter()
+    for i, rnum in enumerate(rounds):
+        res = results[rnum]
+        model.predict_from_logits(logits[i], history)
+        metrics = model.update(res["winner"])
+
+        history.append({
+            "round":  rnum,
+            "green":  res.get("greenVotes", 0),
+            "red":    res.get("redVotes", 0),
+            "winner": res["winner"],
+        })
+        if len(history) > T:
+            history.pop(0)
+
+        if (i + 1) % every == 0 or i + 1 == len(rounds):
+            curve.append({
+                "round":    rnum,
+                "accuracy": metrics["accuracy"],
+                **{k: v for k, v in metrics.items() if k.startswith("accuracy_")},
+            })
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "alpha":          model.alpha,
+        "rounds":         len(rounds),
+        "accuracy":       metrics.get("accuracy"),
+        "reward_total":   round(model.reward_sum, 4),
+        "reward_mean":    round(model.reward_sum / max(model.n_total, 1), 4),
+        "rounds_per_sec": round(len(rounds) / max(elapsed, 1e-9), 1),
+        "curve":          curve,
+    }
+
+
+def run(args):
+    t0 = time.perf_counter()
+    rounds, votes_by_round, results = load_dump(args.votes, args.results)
+    print(f"[Replay] Loaded {len(rounds)} rounds in {time.perf_counter() - t0:.2f}s")
+    if not rounds:
+        return []
+
+    base = RLModel(args.hmnn)
+    t0 = time.perf_counter()
+    V, M   = encode_rounds(rounds, votes_by_round)
+    logits = hmnn_logits(base, V, M)
+    print(f"[Replay] HMNN logits for {len(rounds)} rounds in {time.perf_counter() - t0:.2f}s")
+
+    reports = []
+    for alpha in args.alpha:
+        model = RLModel(args.hmnn, alpha=alpha)
+        if args.rl_weights:
+            model.load_rl(args.rl_weights)
+        report = replay(model, rounds, results, logits, every=args.every)
+        print(f"[Replay] alpha={alpha:<6} acc={report['accuracy']} "
+              f"reward={report['reward_total']} {report['rounds_per_sec']} rounds/s")
+        reports.append(report)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"[Replay] Report written to {args.report}")
+    return reports
+
+
+# ─── Export from Firestore ───────────────────────────────────────────────────
+async def export(args):
+    from storage import FirestoreStore
+
+    store   = FirestoreStore()
+    results = [r for r in await store.list_results(args.limit) if r.get("winner")]
+    os.makedirs(args.out, exist_ok=True)
+
+    with open(os.path.join(args.out, "results.jsonl"), "w") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+
+    votes = await asyncio.gather(*[store.read_votes(r["round"]) for r in results])
+    with open(os.path.join(args.out, "votes.jsonl"), "w") as f:
+        for r, round_votes in zip(results, votes):
+            for v in round_votes:
+                f.write(json.dumps({**v, "round": r["round"]}) + "\n")
+
+    store.close()
+    print(f"[Replay] Exported {len(results)} rounds to {args.out}")
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Offline HMNN + RL replay")
+    sub    = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("run", help="replay a dump through RLModel")
+    p.add_argument("--votes",      required=True)
+    p.add_argument("--results",    required=True)
+    p.add_argument("--hmnn",       default="HMNN.pkl")
+    p.add_argument("--rl-weights", default=None, help="initial RL weights (.npz, or legacy .pkl)")
+    p.add_argument("--alpha",      type=float, nargs="+", default=[ALPHA])
+    p.add_argument("--every",      type=int, default=100, help="curve resolution")
+    p.add_argument("--report",     default=None, help="write JSON report here")
+
+    e = sub.add_parser("export", help="dump Firestore rounds to JSONL")
+    e.add_argument("--out",   default="dump")
+    e.add_argument("--limit", type=int, default=10_000)
+
+    args = parser.parse_args()
+    if args.cmd == "run":
+        run(args)
+    else:
+        asyncio.run(export(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,16 +12,21 @@ Action : 0=RED, 1=GREEN  (argmax of corrected logits)
 Reward : +1 correct, -1 wrong
 """
 
+import base64
 import os
 import pickle
+from collections import deque
+
 import numpy as np
 
 # ─── Constants ───────────────────────────────────────────────────────────────
 T           = 5          # window length (must match HMNN training)
 STATE_DIM   = T * 3      # 3 features per round
 HIDDEN      = 32         # hive dimension (must match saved model)
+N_VOTERS    = 12         # initial voter capacity of the window / tally buffers
 ALPHA       = 0.05       # RL learning rate
 GAMMA_DECAY = 0.99       # reward discount (single-step bandit, kept light)
+ROLLING_WINDOWS = (100, 1000)   # rolling-accuracy windows reported by update()
 
 EMOTION_MAP = {
     "very_low": 0.00, "low": 0.25, "neutral": 0.50,
@@ -103,55 +108,75 @@ class HMNNForward:
                  result → 'RED'|'GREEN'
         Returns: raw logits shape (2,)
         """
+        X, mask = encode_windows([window])
+        return self.forward_batch(X, mask)[0]
+
+    def forward_batch(self, X: np.ndarray, mask: np.ndarray = None) -> np.ndarray:
+        """
+        Vectorised forward pass over B windows at once.
+        X    : (B, T, N, 3) encoded votes [decision, emotion_level, influence]
+        mask : (B, T, N) bool, True where a voter slot holds a real vote
+               (defaults to all-valid)
+        Returns: raw logits shape (B, 2)
+        """
+        X = np.asarray(X)
+        if not np.issubdtype(X.dtype, np.floating):
+            X = X.astype(float)
+        B, Tw, _, _ = X.shape
+        if mask is None:
+            mask = np.ones(X.shape[:3], dtype=bool)
+        m = mask.astype(float)
+
         gamma = _softplus(self.raw_gamma)
         rho   = _sigmoid(self.raw_rho)
-        N     = 12
         eps   = 1e-9
 
-        h  = np.zeros(self.H)
-        mu = None  # emotional momentum
-
-        for t, rd in enumerate(window):
-            votes = rd["votes"]          # list of N voter dicts
-            d = np.array([v["decision"]          for v in votes], dtype=float)
-            e = np.array([v["emotion_level"]     for v in votes], dtype=float)
-            s = np.array([v["influence"]         for v in votes], dtype=float)
-
-            # ── Influence Diffusion ──────────────────────────────────────────
-            w  = _softmax(s)             # (N,)
-            De = float(w @ e)            # weighted mean emotion
-            Dd = float(w @ d)            # weighted mean decision
-            D  = np.array([Dd, De])      # (2,)
-
-            # ── Emotional Momentum ───────────────────────────────────────────
-            e_bar = float(e.mean())
-            if mu is None:
-                mu = e_bar
-            else:
-                mu = rho * mu + (1 - rho) * e_bar
-
-            # ── Consensus Pressure ───────────────────────────────────────────
-            g = float(d.sum())
-            r = N - g
-            phi = (abs(r - g) / N + eps) ** gamma
-
-            # ── Vote Entropy Dampener ────────────────────────────────────────
-            pg = g / N + eps
-            pr = r / N + eps
-            eta = -pr * np.log2(pr) - pg * np.log2(pg)
-            eta = float(np.clip(eta, 0, 1))
-
-            # ── Scalar update ────────────────────────────────────────────────
-            scale = phi * mu * (1 - eta)
-
-            # ── Candidate state ──────────────────────────────────────────────
-            z = D @ self.Wc + self.bc    # (H,)
-            c = _relu(z)
-
-            # ── Hive update ──────────────────────────────────────────────────
-            h = h + scale * (c - h)
-
-        logits = h @ self.Wo + self.bo   # (2,)
+        d = X[..., 0] * m                # (B, T, N)
+        e = X[..., 1] * m
+        s = X[..., 2]
+        n = m.sum(axis=2)                # (B, T) votes actually cast
+        N = np.maximum(n, 1)             # consensus / entropy are shares of the cast votes
+
+        # ── Influence Diffusion (softmax over valid voters only) ─────────
+        s_max = np.where(mask, s, -np.inf).max(axis=2, initial=-np.inf)
+        s_max = np.where(np.isfinite(s_max), s_max, 0.0)
+        ex    = np.exp(s - s_max[..., None]) * m
+        w     = ex / np.maximum(ex.sum(axis=2, keepdims=True), eps)
+        Dd    = (w * d).sum(axis=2)      # (B, T) weighted mean decision
+        De    = (w * e).sum(axis=2)      # (B, T) weighted mean emotion
+        D     = np.stack([Dd, De], axis=-1)   # (B, T, 2)
+
+        # ── Emotional Momentum: mu_t = rho·mu_{t-1} + (1-rho)·ē_t ───────
+        e_bar = e.sum(axis=2) / N                            # (B, T)
+        t_idx = np.arange(Tw)
+        lag   = t_idx[:, None] - t_idx[None, :]              # (T, T)
+        M     = np.where(lag >= 0, (1 - rho) * rho ** np.maximum(lag, 0), 0.0)
+        M[:, 0] = rho ** t_idx                               # mu_0 = ē_0
+        mu    = e_bar @ M.T                                  # (B, T)
+
+        # ── Consensus Pressure ───────────────────────────────────────────
+        g   = d.sum(axis=2)
+        r   = N - g
+        phi = (np.abs(r - g) / N + eps) ** gamma
+
+        # ── Vote Entropy Dampener ────────────────────────────────────────
+        pg  = g / N + eps
+        pr  = r / N + eps
+        eta = np.clip(-pr * np.log2(pr) - pg * np.log2(pg), 0, 1)
+
+        # ── Scalar update ────────────────────────────────────────────────
+        scale = phi * mu * (1 - eta)                         # (B, T)
+
+        # ── Candidate state ──────────────────────────────────────────────
+        c = _relu(D @ self.Wc + self.bc)                     # (B, T, H)
+
+        # ── Hive update, unrolled: h_T = Σ_t scale_t·c_t·Π_{k>t}(1-scale_k)
+        keep   = 1 - scale
+        tail   = np.cumprod(keep[:, ::-1], axis=1)[:, ::-1]  # Π_{k>=t}
+        tail   = np.concatenate([tail[:, 1:], np.ones((B, 1))], axis=1)
+        h      = np.einsum("bt,bth->bh", scale * tail, c)    # (B, H)
+
+        logits = h @ self.Wo + self.bo   # (B, 2)
         return logits
 
 
@@ -163,10 +188,11 @@ class RLCorrection:
     Output : 2-dim correction added to HMNN logits
     """
 
-    def __init__(self):
+    def __init__(self, lr: float = ALPHA):
         self.W = np.zeros((STATE_DIM, 2))   # correction weights
         self.b = np.zeros(2)
-        self.lr = ALPHA
+        self.lr = lr
+        self.updates = 0                    # weights version: updates applied
 
     def forward(self, state: np.ndarray) -> np.ndarray:
         return state @ self.W + self.b      # (2,)
@@ -183,15 +209,34 @@ class RLCorrection:
 
         self.W += self.lr * np.outer(state, delta)
         self.b += self.lr * delta
+        self.updates += 1
 
     def to_dict(self) -> dict:
-        return {"W": self.W.tolist(), "b": self.b.tolist()}
+        return {"W": self.W.tolist(), "b": self.b.tolist(), "updates": self.updates}
+
+    def to_arrays(self) -> dict:
+        """Copy of the weights as plain arrays (safe to hand to another thread)."""
+        return {"W": self.W.copy(), "b": self.b.copy(), "updates": np.int64(self.updates)}
 
     @classmethod
-    def from_dict(cls, d: dict) -> "RLCorrection":
-        obj   = cls()
+    def from_arrays(cls, d, lr: float = ALPHA) -> "RLCorrection":
+        W, b = np.asarray(d["W"], dtype=float), np.asarray(d["b"], dtype=float)
+        if W.shape != (STATE_DIM, 2) or b.shape != (2,):
+            raise ValueError(f"RL weights have shape {W.shape}/{b.shape}, "
+                             f"expected {(STATE_DIM, 2)}/(2,)")
+        if not (np.isfinite(W).all() and np.isfinite(b).all()):
+            raise ValueError("RL weights contain non-finite values")
+        obj   = cls(lr)
+        obj.W, obj.b = W, b
+        obj.updates  = int(d["updates"]) if "updates" in d else 0
+        return obj
+
+    @classmethod
+    def from_dict(cls, d: dict, lr: float = ALPHA) -> "RLCorrection":
+        obj   = cls(lr)
         obj.W = np.array(d["W"])
         obj.b = np.array(d["b"])
+        obj.updates = int(d.get("updates", 0))
         return obj
 
 
@@ -201,9 +246,12 @@ class RLModel:
     The main object used by round_manager.py.
     """
 
-    def __init__(self, pkl_path: str = "HMNN.pkl"):
-        # Load base model
-        if os.path.exists(pkl_path):
+    def __init__(self, pkl_path: str = "HMNN.pkl", alpha: float = ALPHA,
+                 hmnn: HMNNForward = None):
+        # Load base model (or share an already-loaded one, see shadow.py)
+        if hmnn is not None:
+            weights = None
+        elif os.path.exists(pkl_path):
             with open(pkl_path, "rb") as f:
                 weights = pickle.load(f)
             print(f"[RLModel] Loaded HMNN weights from {pkl_path}")
@@ -211,12 +259,20 @@ class RLModel:
             print(f"[RLModel] {pkl_path} not found – using random weights")
             weights = {}
 
-        self.hmnn       = HMNNForward(weights)
-        self.rl         = RLCorrection()
-        self.history    = []          # list of round dicts for metrics
+        self.pkl_path   = pkl_path
+        self.alpha      = alpha
+        self.hmnn       = hmnn if hmnn is not None else HMNNForward(weights)
+        self.rl         = RLCorrection(alpha)
         self.last_state = None
         self.last_action = None
 
+        # Running metrics: O(1) time and memory per update
+        self.n_total    = 0
+        self.n_correct  = 0
+        self.reward_sum = 0.0
+        self._rolling   = {w: deque(maxlen=w) for w in ROLLING_WINDOWS}
+        self._rolling_correct = {w: 0 for w in ROLLING_WINDOWS}
+
     # ── Build state vector from last T round summaries ────────────────────
     @staticmethod
     def build_state(round_summaries: list[dict]) -> np.ndarray:
@@ -241,12 +297,18 @@ class RLModel:
         round_summaries: last T round aggregate dicts   (for RL state)
         Returns "RED" or "GREEN"
         """
-        # HMNN logits
+        # HMNN logits (B=1 case of the batched forward)
         if len(window) >= T:
             hmnn_logits = self.hmnn.forward(window[-T:])
         else:
             hmnn_logits = np.zeros(2)
+        return self.predict_from_logits(hmnn_logits, round_summaries)
 
+    def predict_from_logits(self, hmnn_logits: np.ndarray, round_summaries: list[dict]) -> str:
+        """
+        Same as predict() but with HMNN logits computed elsewhere, e.g. for
+        a whole replay in one forward_batch call. Records state for update().
+        """
         # RL correction
         state          = self.build_state(round_summaries)
         rl_correction  = self.rl.forward(state)
@@ -276,43 +338,139 @@ class RLModel:
         predicted = "GREEN" if self.last_action == 1 else "RED"
         correct   = predicted == actual_winner
 
-        self.history.append({
-            "predicted": predicted,
-            "actual":    actual_winner,
-            "reward":    reward,
-            "correct":   correct,
-        })
-
         # Running accuracy & loss
-        n_total   = len(self.history)
-        n_correct = sum(1 for h in self.history if h["correct"])
-        accuracy  = n_correct / n_total
+        self.n_total    += 1
+        self.n_correct  += int(correct)
+        self.reward_sum += reward
+        accuracy  = self.n_correct / self.n_total
         loss      = 1.0 - accuracy          # simple 0/1 loss
 
         self.last_state  = None
         self.last_action = None
 
-        return {
+        metrics = {
             "predicted":  predicted,
             "actual":     actual_winner,
             "reward":     reward,
             "correct":    correct,
             "accuracy":   round(accuracy, 4),
             "loss":       round(loss, 4),
-            "n_rounds":   n_total,
+            "n_rounds":   self.n_total,
+        }
+
+        # Rolling accuracy over the last w rounds (ring buffers)
+        for w, buf in self._rolling.items():
+            if len(buf) == w:
+                self._rolling_correct[w] -= buf[0]
+            buf.append(int(correct))
+            self._rolling_correct[w] += int(correct)
+            metrics[f"accuracy_{w}"] = round(self._rolling_correct[w] / len(buf), 4)
+
+        return metrics
+
+    def stats(self) -> dict:
+        """Running accuracy so far, in the same keys update() reports."""
+        out = {
+            "n_rounds":   self.n_total,
+            "accuracy":   round(self.n_correct / self.n_total, 4) if self.n_total else None,
+            "rl_version": self.rl.updates,
         }
+        for w, buf in self._rolling.items():
+            out[f"accuracy_{w}"] = round(self._rolling_correct[w] / len(buf), 4) if buf else None
+        return out
 
     # ── Serialize RL weights (for cold restart persistence) ──────────────
-    def save_rl(self, path: str = "rl_weights.pkl"):
-        with open(path, "wb") as f:
-            pickle.dump(self.rl.to_dict(), f)
+    def save_rl(self, path: str = "rl_weights.npz"):
+        """Synchronous, atomic save; RoundManager goes through checkpoint.py."""
+        save_weights(path, self.weight_arrays())
 
-    def load_rl(self, path: str = "rl_weights.pkl"):
-        if os.path.exists(path):
+    def load_rl(self, path: str = "rl_weights.npz", strict: bool = False) -> bool:
+        """
+        Load RL weights from .npz (never unpickled), or from a legacy .pkl
+        written by older versions. Returns False if the file does not exist;
+        raises on a corrupt or mis-shaped file, or (ValueError) on weights
+        that correct a different HMNN file. strict also requires the same
+        alpha: the live checkpoint (checkpoint.py) must not hand a promoted
+        candidate's weights to the configured primary, while replay sweeps
+        one weight file over several alphas.
+        """
+        if not os.path.exists(path):
+            return False
+        if path.endswith(".pkl"):
             with open(path, "rb") as f:
                 d = pickle.load(f)
-            self.rl = RLCorrection.from_dict(d)
-            print(f"[RLModel] Loaded RL weights from {path}")
+            self.rl = RLCorrection.from_dict(d, self.alpha)
+        else:
+            with np.load(path, allow_pickle=False) as d:
+                if "hmnn_path" in d:
+                    saved_path, saved_alpha = str(d["hmnn_path"]), float(d["alpha"])
+                    if not same_hmnn(saved_path, self.pkl_path) or \
+                            (strict and saved_alpha != self.alpha):
+                        raise ValueError(f"weights belong to {saved_path} alpha={saved_alpha}, "
+                                         f"not {self.pkl_path} alpha={self.alpha}")
+                self.rl = RLCorrection.from_arrays(d, self.alpha)
+        print(f"[RLModel] Loaded RL weights from {path} (version {self.rl.updates})")
+        return True
+
+    def weight_arrays(self) -> dict:
+        """RL weights plus the base model they correct, for checkpoints."""
+        return {**self.rl.to_arrays(), "hmnn_path": np.str_(self.pkl_path),
+                "alpha": np.float64(self.alpha)}
+
+    # ── Persisted state (round snapshot, see shadow.ModelPool.to_doc) ────
+    def to_doc(self) -> dict:
+        """Identity, RL weights and running accuracy as Firestore-safe values."""
+        recent = self._rolling[max(ROLLING_WINDOWS)]
+        return {
+            "hmnnPath":  self.pkl_path,
+            "alpha":     self.alpha,
+            "W":         self.rl.W.ravel().tolist(),
+            "b":         self.rl.b.tolist(),
+            "updates":   self.rl.updates,
+            "nTotal":    self.n_total,
+            "nCorrect":  self.n_correct,
+            "rewardSum": self.reward_sum,
+            "recent":    "".join(str(c) for c in recent),   # last correct flags
+        }
+
+    def load_doc(self, doc: dict):
+        """Restore to_doc() output; ValueError if it belongs to another base model."""
+        if not same_hmnn(doc.get("hmnnPath"), self.pkl_path):
+            raise ValueError(f"state is for {doc.get('hmnnPath')}, not {self.pkl_path}")
+        self.rl = RLCorrection.from_arrays({
+            "W":       np.reshape(doc["W"], (STATE_DIM, 2)),
+            "b":       doc["b"],
+            "updates": doc["updates"],
+        }, self.alpha)
+        self.n_total    = int(doc.get("nTotal", 0))
+        self.n_correct  = int(doc.get("nCorrect", 0))
+        self.reward_sum = float(doc.get("rewardSum", 0.0))
+        recent = [int(c) for c in doc.get("recent", "")]
+        for w in ROLLING_WINDOWS:
+            self._rolling[w]         = deque(recent[-w:], maxlen=w)
+            self._rolling_correct[w] = sum(self._rolling[w])
+
+
+def same_hmnn(a: str | None, b: str | None) -> bool:
+    """Whether two HMNN paths name the same file ("HMNN.pkl" == "./HMNN.pkl")."""
+    if a is None or b is None:
+        return a == b
+    return (os.path.normcase(os.path.normpath(a)) == os.path.normcase(os.path.normpath(b))
+            or os.path.realpath(a) == os.path.realpath(b))
+
+
+def save_weights(path: str, arrays: dict):
+    """
+    Write arrays to `path` as .npz atomically: temp file in the same
+    directory, fsync, then os.replace — a crash leaves either the old file
+    or the new one, never a torn write.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
 
 
 # ─── Encoding helpers (shared with round_manager) ────────────────────────────
@@ -322,4 +480,139 @@ def encode_vote(color: str, emotion: str, influence: str) -> dict:
         "decision":      1.0 if color == "GREEN" else 0.0,
         "emotion_level": EMOTION_MAP.get(emotion, 0.5),
         "influence":     INFLUENCE_MAP.get(influence, 0.5),
-    }
\ No newline at end of file
+    }
+
+
+def encode_vote_into(row: np.ndarray, color: str, emotion: str, influence: str):
+    """encode_vote() written straight into a (3,) row: decision, emotion, influence."""
+    row[0] = 1.0 if color == "GREEN" else 0.0
+    row[1] = EMOTION_MAP.get(emotion, 0.5)
+    row[2] = INFLUENCE_MAP.get(influence, 0.5)
+
+
+# Every encoded value is a multiple of 1/VOTE_SCALE (0, .1, .25, .5, .75,
+# .9, 1), so a vote packs into 3 bytes without loss
+VOTE_SCALE = 200
+
+
+def pack_votes(rows: np.ndarray) -> str:
+    """(n, 3) encoded votes → base64 of n×3 uint8, about 4 bytes per voter."""
+    q = np.clip(np.rint(np.asarray(rows, dtype=np.float32) * VOTE_SCALE), 0, 255)
+    return base64.b64encode(q.astype(np.uint8).tobytes()).decode("ascii")
+
+
+def unpack_votes(packed: str) -> np.ndarray:
+    """Inverse of pack_votes(): (n, 3) float32."""
+    q = np.frombuffer(base64.b64decode(packed), dtype=np.uint8)
+    return (q.astype(np.float32) / VOTE_SCALE).reshape(-1, 3)
+
+
+class VoterWindow:
+    """
+    The last T rounds of encoded votes for HMNN, as a preallocated
+    (T, N_max, 3) float32 ring buffer plus a (T, N_max) validity mask —
+    about 160 bytes per 12-voter round. N_max grows if a round has more
+    voters. view() hands forward_batch a chronological window without
+    building any per-vote dicts.
+    """
+
+    def __init__(self, t: int = T, n_max: int = N_VOTERS):
+        self.t       = t
+        self.buf     = np.zeros((t, n_max, 3), dtype=np.float32)
+        self.mask    = np.zeros((t, n_max), dtype=bool)
+        self.results = [None] * t
+        self.head    = 0          # next slot to overwrite
+        self.size    = 0
+        self._alloc_view(n_max)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def n_max(self) -> int:
+        return self.buf.shape[1]
+
+    def _alloc_view(self, n_max: int):
+        self._view      = np.zeros((1, self.t, n_max, 3), dtype=np.float32)
+        self._view_mask = np.zeros((1, self.t, n_max), dtype=bool)
+
+    def _grow(self, n: int):
+        n_max = max(n, 2 * self.n_max)
+        buf   = np.zeros((self.t, n_max, 3), dtype=np.float32)
+        mask  = np.zeros((self.t, n_max), dtype=bool)
+        buf[:, :self.n_max]  = self.buf
+        mask[:, :self.n_max] = self.mask
+        self.buf, self.mask = buf, mask
+        self._alloc_view(n_max)
+
+    def _order(self) -> list[int]:
+        """Ring slots, oldest → newest."""
+        return [(self.head - self.size + i) % self.t for i in range(self.size)]
+
+    def push(self, rows: np.ndarray, result: str | None):
+        """Append a finished round: rows is (n, 3) encoded votes."""
+        n = len(rows)
+        if n > self.n_max:
+            self._grow(n)
+        slot = self.head
+        self.buf[slot, :n]  = rows
+        self.buf[slot, n:]  = 0.0
+        self.mask[slot]     = False
+        self.mask[slot, :n] = True
+        self.results[slot]  = result
+        self.head = (self.head + 1) % self.t
+        self.size = min(self.size + 1, self.t)
+
+    def view(self, current: np.ndarray = None):
+        """
+        (X, mask) shaped (1, k, N, 3) / (1, k, N): the stored rounds in order,
+        plus `current` (n, 3) as the newest round if given, truncated to the
+        last T. Backed by a reused scratch buffer — valid until the next call.
+        """
+        if current is not None and len(current) > self.n_max:
+            self._grow(len(current))
+        order = self._order()
+        if current is not None:
+            order = order[-(self.t - 1):] if self.t > 1 else []
+        k = len(order)
+        X, m = self._view, self._view_mask
+        for i, slot in enumerate(order):
+            X[0, i] = self.buf[slot]
+            m[0, i] = self.mask[slot]
+        if current is not None:
+            n = len(current)
+            X[0, k]     = 0.0
+            X[0, k, :n] = current
+            m[0, k]     = False
+            m[0, k, :n] = True
+            k += 1
+        return X[:, :k], m[:, :k]
+
+    def rounds(self):
+        """(rows, result) per stored round, oldest → newest (for snapshots)."""
+        return [(self.buf[s][self.mask[s]], self.results[s]) for s in self._order()]
+
+
+def encode_windows(windows: list[list[dict]], n_max: int = None):
+    """
+    Pack equal-length windows of voter-matrix dicts into dense arrays for
+    HMNNForward.forward_batch.
+    Returns (X, mask): X is (B, T, N, 3) float, mask is (B, T, N) bool,
+    where N is the largest round in the batch (or n_max if given).
+    """
+    lengths = {len(w) for w in windows}
+    if len(lengths) > 1:
+        raise ValueError(f"windows must share one length, got {sorted(lengths)}")
+    Tw = lengths.pop() if lengths else 0
+    if n_max is None:
+        n_max = max((len(rd["votes"]) for w in windows for rd in w), default=0)
+
+    X    = np.zeros((len(windows), Tw, n_max, 3))
+    mask = np.zeros((len(windows), Tw, n_max), dtype=bool)
+    for b, w in enumerate(windows):
+        for t, rd in enumerate(w):
+            votes = rd["votes"][:n_max]
+            for i, v in enumerate(votes):
+                X[b, t, i] = (v["decision"], v["emotion_level"], v["influence"])
+            mask[b, t, :len(votes)] = True
+    return X, mask
@@ -0,0 +1,129 @@
+"""
+round_cache.py
+In-process cache of recent round results and the current game state, behind
+GET /results, /prediction/{n} and /health.
+
+RoundManager writes through it — the prediction when it is published, the
+final result and the gameState advance when a round closes — and seeds it at
+bootstrap, so on the replica running the round loop these endpoints are
+served from memory. Anything else (an older round, a replica without the
+loop) is read from the store once and then kept for ROUND_CACHE_TTL seconds;
+finished results never change and stay until evicted. Staleness is bounded
+by the TTL and store reads no longer grow with API traffic.
+
+When the manager stops leading it calls step_down(): what it wrote itself
+falls back to the TTL rules, since another process now writes the rounds.
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+ROUND_CACHE_SIZE = int(os.getenv("ROUND_CACHE_SIZE", "1000"))    # rounds kept
+ROUND_CACHE_TTL  = float(os.getenv("ROUND_CACHE_TTL", "2"))      # seconds
+
+_MISSING = (None, 0.0)     # an entry that is never fresh
+
+
+class RoundCache:
+
+    def __init__(self, store, max_rounds: int = ROUND_CACHE_SIZE, ttl: float = ROUND_CACHE_TTL):
+        self.store      = store
+        self.max_rounds = max_rounds
+        self.ttl        = ttl
+        # round → (result doc or None, expiry; None = kept until evicted)
+        self._results: OrderedDict[int, tuple] = OrderedDict()
+        self._state   = _MISSING
+        # Rounds >= _covered_from are cached exactly as stored (seeded and
+        # written through); _covered_all: nothing older exists in the store.
+        self._covered_from: int | None = None
+        self._covered_all = False
+        self._lists: dict[int, tuple] = {}   # limit → (rows, expiry), uncovered reads
+        self.hits = self.misses = 0
+
+    def _put(self, round_num: int, doc: dict | None, expires: float | None):
+        self._results[round_num] = (doc, expires)
+        self._results.move_to_end(round_num)
+        while len(self._results) > self.max_rounds:
+            evicted, _ = self._results.popitem(last=False)
+            if self._covered_from is not None and evicted >= self._covered_from:
+                self._covered_from = evicted + 1
+                self._covered_all  = False
+
+    def _fresh(self, entry: tuple) -> bool:
+        return entry[1] is None or entry[1] > time.monotonic()
+
+    # ── Write-through (RoundManager) ──────────────────────────────────────
+    def seed(self, results: list[dict], limit: int, state: dict | None = None):
+        """Bootstrap from store.list_results(limit) (oldest → newest)."""
+        for doc in results:
+            self._put(doc["round"], dict(doc), None)
+        if results:
+            self._covered_from = results[0]["round"]
+        self._covered_all = len(results) < limit
+        if state is not None:
+            self.set_state(state)
+
+    def put_result(self, round_num: int, doc: dict, merge: bool = False):
+        """Mirror a store.write_result / close_round by the round loop."""
+        if merge:
+            old = self._results.get(round_num, _MISSING)[0] or {}
+            doc = {**old, **doc}
+        self._put(round_num, dict(doc), None)
+
+    def set_state(self, state: dict):
+        self._state = (dict(state), None)
+
+    def step_down(self):
+        """No longer written through: expire everything that can still change."""
+        now = time.monotonic()
+        for round_num, (doc, _) in list(self._results.items()):
+            if doc is None or doc.get("status") != "done":
+                self._results[round_num] = (doc, now)
+        self._state        = (self._state[0], now)
+        self._covered_from = None
+        self._covered_all  = False
+
+    # ── Read-through (API) ────────────────────────────────────────────────
+    async def get_result(self, round_num: int) -> dict | None:
+        entry = self._results.get(round_num, _MISSING)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        doc = await self.store.get_result(round_num)
+        done = doc is not None and doc.get("status") == "done"
+        self._put(round_num, doc, None if done else time.monotonic() + self.ttl)
+        return doc
+
+    async def get_state(self) -> dict | None:
+        if self._fresh(self._state):
+            self.hits += 1
+            return self._state[0]
+        self.misses += 1
+        state = await self.store.get_game_state()
+        self._state = (state, time.monotonic() + self.ttl)
+        return state
+
+    async def list_done(self, limit: int) -> list[dict]:
+        """Finished rounds among the newest `limit` results, oldest → newest."""
+        if self._covered_from is not None:
+            rounds = sorted(r for r in self._results if r >= self._covered_from)
+            if len(rounds) >= limit or self._covered_all:
+                self.hits += 1
+                docs = [self._results[r][0] for r in rounds[-limit:]] if limit > 0 else []
+                return [d for d in docs if d is not None and d.get("status") == "done"]
+        entry = self._lists.get(limit, _MISSING)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        docs = await self.store.list_results(limit)
+        rows = [d for d in docs if d.get("status") == "done"]
+        if len(self._lists) >= 16:
+            self._lists.clear()                 # arbitrary `limit`s: stay bounded
+        self._lists[limit] = (rows, time.monotonic() + self.ttl)
+        return rows
+
+    def stats(self) -> dict:
+        return {"rounds": len(self._results), "hits": self.hits, "misses": self.misses}
@@ -7,24 +7,32 @@ Orchestrates each voting round with a 3-phase timing model:
   Phase 3 — Prediction     (25s → 30s): HMNN computes & publishes prediction,
                                          frontend displays it in the last 5s
   End of round             (30s)       : tally, RL update, metrics, advance round
+
+Phase boundaries are absolute deadlines from the round's startedAt, and the
+next round starts at exactly startedAt + 30s: the close-out writes (which
+also set the next startedAt) run in the background during its human phase.
+How late each phase starts is logged and recorded per round (metrics lateMs).
 """
 
 import asyncio
+import os
 import random
 import time
-import json
-import os
-
-import firebase_admin
-from firebase_admin import credentials, firestore
 
-from rl_model import RLModel, encode_vote
-
-try:
-    from openai import AsyncOpenAI
-    _HAS_OPENAI = True
-except ImportError:
-    _HAS_OPENAI = False
+import numpy as np
+
+import llm
+from agent_policy import AgentPolicy, make_agents
+from broadcast import Broadcaster
+from checkpoint import RL_CHECKPOINT_PATH, Checkpointer
+from clock import RealClock
+from lease import Leadership, make_lease
+from metrics_cache import METRICS_SEED, MetricsSeries
+from rl_model import RLModel, VoterWindow, pack_votes, unpack_votes
+from round_cache import ROUND_CACHE_SIZE, ROUND_CACHE_TTL, RoundCache
+from shadow import SHADOW_MODELS, ModelPool, parse_shadow_models
+from storage import make_store
+from tally import VoteTally
 
 # ─── Timing Config ────────────────────────────────────────────────────────────
 ROUND_DURATION   = 30   # total round length (seconds)
@@ -35,16 +43,22 @@ PREDICT_WINDOW   = 5    # prediction shown in last 5s         (t=25s → t=30s)
 HUMAN_VOTE_TIME  = ROUND_DURATION - HUMAN_CUTOFF   # 20s  — wait for humans
 AGENT_END_TIME   = ROUND_DURATION - (HUMAN_CUTOFF - AGENT_WINDOW)  # 25s
 # After AGENT_END_TIME we compute, write prediction, then sleep remaining
-
-TOTAL_VOTES      = 12
-OPENAI_API_KEY   = os.getenv("OPENAI_API_KEY", "")
-FIREBASE_CRED    = os.getenv("FIREBASE_CREDENTIALS_PATH", "serviceAccount.json")
-
-EMOTION_OPTIONS   = ["very_low", "low", "neutral", "strong", "very_strong"]
-INFLUENCE_OPTIONS = ["no", "neutral", "yes"]
+AGENT_WRITE_MARGIN = 0.5  # seconds reserved before AGENT_END_TIME to batch-write votes
+TALLY_PUSH_INTERVAL = 0.25  # min seconds between live tally pushes to /stream
+SCHEDULE_WARN_LATE  = 0.5   # log phases that start later than this (seconds)
+FOLLOW_BATCH        = 100   # newest metrics rows a non-leader pulls per refresh
+RELAY_POLL_INTERVAL = 0.5   # non-leader: seconds between reads for the prediction
+# Voters per window round kept in gameState/snapshot: 5 rounds × 40k × 4 B
+# of packed votes leaves room for the rest of the doc under 1 MiB
+SNAPSHOT_MAX_VOTERS = int(os.getenv("SNAPSHOT_MAX_VOTERS", "40000"))
+
+# Votes per round (humans + agents) and the size of the agent population;
+# beyond the 12 personas, agents are procedural clones (agent_policy.make_agents)
+TOTAL_VOTES      = int(os.getenv("TOTAL_VOTES", "12"))
+AGENT_COUNT      = int(os.getenv("AGENT_COUNT", str(TOTAL_VOTES)))
 
 # ─── Agents ───────────────────────────────────────────────────────────────────
-AGENTS = [
+PERSONAS = [
     {"id": "agent_001", "name": "Aria",   "personality": "Optimistic and trend-following. You love momentum and strong consensus.",          "emotion_bias": "very_strong", "history_bias": "yes",     "contrarian": False},
     {"id": "agent_002", "name": "Brutus", "personality": "Stubborn contrarian. You always bet against the recent winner.",                   "emotion_bias": "low",         "history_bias": "no",      "contrarian": True},
     {"id": "agent_003", "name": "Cleo",   "personality": "Analytical and cautious. You study history carefully before deciding.",            "emotion_bias": "neutral",     "history_bias": "yes",     "contrarian": False},
@@ -58,116 +72,115 @@ AGENTS = [
     {"id": "agent_011", "name": "Kai",    "personality": "Balanced philosopher. You weigh both sides carefully every round.",                "emotion_bias": "neutral",     "history_bias": "neutral", "contrarian": False},
     {"id": "agent_012", "name": "Luna",   "personality": "Superstitious. You see patterns in noise and act on lucky or unlucky streaks.",    "emotion_bias": "very_strong", "history_bias": "yes",     "contrarian": False},
 ]
-
-# ─── Firebase ─────────────────────────────────────────────────────────────────
-def init_firebase():
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(FIREBASE_CRED)
-        firebase_admin.initialize_app(cred)
-    return firestore.client()
-def _write_metrics(self, round_num: int, metrics: dict):
-    # Read previous cumulative totals from Firestore so restarts don't reset the graph
-    prev_snap = self.db.collection("metrics").document(str(round_num - 1)).get()
-    prev_correct = 0
-    prev_total   = 0
-    if prev_snap.exists:
-        p = prev_snap.to_dict()
-        prev_correct = p.get("cumCorrect", 0)
-        prev_total   = p.get("cumTotal",   0)
-
-    cum_correct = prev_correct + (1 if metrics.get("correct") else 0)
-    cum_total   = prev_total   + 1
-    cum_acc     = cum_correct / cum_total
-    cum_loss    = 1.0 - cum_acc
-
-    self.db.collection("metrics").document(str(round_num)).set({
-        "round":      round_num,
-        "correct":    metrics.get("correct", False),
-        "reward":     metrics.get("reward", 0),
-        # per-round fields kept for reference
-        "accuracy":   metrics.get("accuracy", 0),
-        "loss":       metrics.get("loss", 1),
-        # cumulative fields — these drive the training graph
-        "cumCorrect": cum_correct,
-        "cumTotal":   cum_total,
-        "cumAcc":     round(cum_acc, 4),
-        "cumLoss":    round(cum_loss, 4),
-        "ts":         int(time.time() * 1000),
-    })
-
-# ─── Agent decision via OpenAI ────────────────────────────────────────────────
-async def _agent_openai(agent: dict, history: list[dict]) -> dict:
-    client   = AsyncOpenAI(api_key=OPENAI_API_KEY)
-    hist_str = json.dumps(history[-5:]) if history else "[]"
-    prompt = (
-        f"You are {agent['name']}. {agent['personality']}\n"
-        f"Last 5 rounds: {hist_str}\n\n"
-        "Vote RED or GREEN. Also rate emotional intensity and history influence.\n"
-        "Respond ONLY with valid JSON, no extra text:\n"
-        '{"color":"RED","emotionFeel":"neutral","influenceHistory":"yes"}\n'
-        "emotionFeel options: very_low, low, neutral, strong, very_strong\n"
-        "influenceHistory options: no, neutral, yes"
-    )
-    try:
-        res = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=60,
-            temperature=0.85,
-        )
-        raw  = res.choices[0].message.content.strip()
-        raw  = raw.replace("```json", "").replace("```", "").strip()
-        data = json.loads(raw)
-        if data.get("color") not in ("RED", "GREEN"):
-            raise ValueError("bad color")
-        if data.get("emotionFeel") not in EMOTION_OPTIONS:
-            data["emotionFeel"] = agent["emotion_bias"]
-        if data.get("influenceHistory") not in INFLUENCE_OPTIONS:
-            data["influenceHistory"] = agent["history_bias"]
-        return data
-    except Exception as e:
-        print(f"  [OpenAI fallback] {agent['name']}: {e}")
-        return _agent_fallback(agent, history)
-
-def _agent_fallback(agent: dict, history: list[dict]) -> dict:
-    last_winner = history[-1]["winner"] if history else None
-    if agent["contrarian"] and last_winner:
-        color = "RED" if last_winner == "GREEN" else "GREEN"
-    else:
-        color = random.choice(["RED", "GREEN"])
-    return {
-        "color":            color,
-        "emotionFeel":      agent["emotion_bias"],
-        "influenceHistory": agent["history_bias"],
-    }
-
-async def get_agent_decision(agent: dict, history: list[dict]) -> dict:
-    if _HAS_OPENAI and OPENAI_API_KEY:
-        return await _agent_openai(agent, history)
-    return _agent_fallback(agent, history)
+AGENTS = make_agents(PERSONAS, AGENT_COUNT)
 
 # ─── Round Manager ────────────────────────────────────────────────────────────
 class RoundManager:
 
-    def __init__(self):
-        self.db           = init_firebase()
-        self.model        = RLModel("HMNN.pkl")
-        self.model.load_rl("rl_weights.pkl")
+    def __init__(self, store=None, clock=None, hmnn_path: str = "HMNN.pkl",
+                 rl_path: str | None = RL_CHECKPOINT_PATH, use_llm: bool = True,
+                 agent_mode: str = llm.AGENT_MODE, agent_seed: int = None,
+                 total_votes: int = TOTAL_VOTES, agents: list[dict] = None,
+                 results: RoundCache = None, lease=None):
+        # All Firestore I/O goes through the async store so the event loop
+        # (shared with FastAPI in main.py) never blocks on a round trip.
+        self.store        = store if store is not None else make_store()
+        # Every sleep and timestamp goes through the clock, so simulations can
+        # run the real round pipeline on virtual / accelerated time.
+        self.clock        = clock if clock is not None else RealClock()
+        self.rl_path      = rl_path           # None → never persist RL weights
+        self.use_llm      = use_llm and llm.llm_mode(agent_mode)
+        self.policy       = AgentPolicy(seed=agent_seed)   # local persona policies
+        self.total_votes  = total_votes
+        self.agents       = agents if agents is not None else AGENTS
+        self.model        = RLModel(hmnn_path)
+        # Primary + shadow candidates; only the primary's prediction is published
+        self.models       = ModelPool(self.model)
+        for name, path, alpha in parse_shadow_models(SHADOW_MODELS):
+            self.models.register(name, path, alpha)
+        self._promote_to: str | None = None   # applied between rounds
+        # Coalesced, atomic background saves of the RL weights (checkpoint.py)
+        self.checkpoint   = Checkpointer(self.model, rl_path, clock=self.clock) if rl_path else None
+        if self.checkpoint:
+            self.checkpoint.load()
         self.round_history: list[dict] = []   # aggregate round results
-        self.window:        list[dict] = []   # voter-matrix window for HMNN
-
-    # ── Bootstrap: load last 5 completed rounds from Firestore ───────────
+        self.window = VoterWindow()           # encoded voter-matrix window for HMNN
+        self._tally:  VoteTally | None = None # live tally of the current round
+        self.metrics = MetricsSeries(self.store)  # served by GET /metrics
+        self.events  = Broadcaster()          # live events for GET /stream
+        # Recent results + gameState for the API, kept current as we write
+        self.results = results if results is not None else RoundCache(self.store)
+        # Leader lease (lease.py): close-outs are fenced on it, so a process
+        # that lost leadership cannot commit a round
+        self.lease   = lease
+        self.leading = False                  # inside run(): our caches are authoritative
+        self._followed_at = float("-inf")     # last follow() refresh (monotonic)
+        self._models_at   = float("-inf")     # last follow_models() refresh (monotonic)
+        self._requested: dict | None = None   # gameState/promotion as last read
+        # Not leading: /stream is relayed from the leader's writes
+        self._relay_unwatch = None
+        self._relay_state: dict | None = None # gameState being relayed
+        self._relay_timers: list[asyncio.TimerHandle] = []
+        self._relay_tasks: set[asyncio.Task] = set()
+        # Absolute round schedule: each round starts where the last one ended
+        self._next_start: float | None = None  # round-time seconds
+        self._closing: asyncio.Task | None = None   # previous round's close-out
+        self._committed_rl: int | None = None  # rlVersion of the last committed snapshot
+        self.lateness: dict[str, float] = {}  # worst lateness per phase (s)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tally_push_pending = False
+        # Cumulative accuracy across restarts; seeded once at bootstrap from
+        # the newest metrics doc, then advanced in memory every round
+        self.cum_correct = 0
+        self.cum_total   = 0
+        self._unwatch = None                  # unsubscribes its votes listener
+
+    # ── Bootstrap: restore rolling state with one snapshot read ──────────
     async def bootstrap(self):
-        snap = self.db.collection("gameState").document("currentRound").get()
-        if not snap.exists:
+        state, snapshot, metrics_rows, result_rows = await asyncio.gather(
+            self.store.get_game_state(),
+            self.store.get_snapshot(),
+            self.store.list_metrics(METRICS_SEED),
+            self.store.list_results(ROUND_CACHE_SIZE),
+            return_exceptions=True,
+        )
+        if isinstance(metrics_rows, Exception):
+            print(f"  Bootstrap error metrics cache: {metrics_rows}")
+        else:
+            self.metrics.seed(metrics_rows)
+            print(f"[Bootstrap] Metrics cache: {len(self.metrics.rows)} rounds")
+        if isinstance(snapshot, Exception):
+            print(f"  Bootstrap error snapshot: {snapshot}")
+            snapshot = None
+        if isinstance(state, Exception):
+            print(f"  Bootstrap error gameState: {state}")
+            state = None
+        if isinstance(result_rows, Exception):
+            print(f"  Bootstrap error results cache: {result_rows}")
+        else:
+            self.results.seed(result_rows, ROUND_CACHE_SIZE, state)
+            print(f"[Bootstrap] Results cache: {len(result_rows)} rounds")
+
+        if snapshot is not None:
+            self._restore_snapshot(snapshot)
+            return
+
+        # No snapshot yet (first run after upgrade): legacy per-round reads
+        last = self.metrics.last()
+        if last is not None:
+            self.cum_correct = last.get("cumCorrect", 0)
+            self.cum_total   = last.get("cumTotal",   0)
+            print(f"[Bootstrap] Cumulative: {self.cum_correct}/{self.cum_total} "
+                  f"(through round {last['round']})")
+
+        if state is None:
             return
-        current = snap.to_dict().get("round", 1)
+        current = state.get("round", 1)
         print(f"[Bootstrap] Current round: {current}")
         for rnum in range(max(1, current - 5), current):
             try:
-                rs = self.db.collection("roundResults").document(str(rnum)).get()
-                if rs.exists:
-                    d = rs.to_dict()
+                d = await self.store.get_result(rnum)
+                if d is not None:
                     self.round_history.append({
                         "round":  rnum,
                         "green":  d.get("greenVotes", 0),
@@ -179,109 +192,105 @@ class RoundManager:
                 print(f"  Bootstrap error round {rnum}: {e}")
 
     # ── Main round orchestration ──────────────────────────────────────────
-    async def run_round(self, round_num: int):
-        round_start = time.time()
+    async def run_round(self, round_num: int, started_at: float = None):
+        """
+        One round on an absolute schedule: every phase boundary is a deadline
+        measured from `started_at` (round-time seconds; default: where the
+        previous round ended, else now), never from how long the previous
+        step took. The round ends at exactly started_at + ROUND_DURATION; its
+        close-out writes run in the background while the next round starts.
+        """
+        if started_at is None:
+            started_at = self._next_start if self._next_start is not None else self.clock.time()
+        round_start = started_at
+        self._loop  = asyncio.get_running_loop()
+        late: dict[str, float] = {}           # phase → seconds behind schedule
         print(f"\n{'='*50}")
         print(f"[Round {round_num}] START — {time.strftime('%H:%M:%S')}")
         print(f"{'='*50}")
 
+        # Live tally: fed by a snapshot listener instead of re-reading votes
+        tally = self._watch_round(round_num)
+        await self._take_promotion_request(round_num)
+        late["humans"] = max(0.0, self.clock.time() - round_start)
+
         # ── Phase 1: Wait for human votes (0s → 20s) ─────────────────────
         print(f"[Round {round_num}] Phase 1: Human voting open (0s → {HUMAN_VOTE_TIME}s)")
-        await asyncio.sleep(HUMAN_VOTE_TIME)
+        self._publish_phase(round_num, "humans", round_start, HUMAN_VOTE_TIME)
+        late["agents"] = await self._sleep_until(round_start + HUMAN_VOTE_TIME)
+
+        # The previous round's close-out has had the whole human phase
+        await self._finish_close()
 
         # ── Phase 2: Agent voting (20s → 25s) ────────────────────────────
         print(f"[Round {round_num}] Phase 2: Agent voting ({HUMAN_VOTE_TIME}s → {AGENT_END_TIME}s)")
+        self._publish_phase(round_num, "agents", round_start, AGENT_END_TIME)
 
-        # Read current human votes first
-        human_votes = self._read_human_votes(round_num)
-        print(f"  Human votes collected: {len(human_votes)}")
+        # Current human votes, straight from the live tally
+        await self._ensure_synced(tally)
+        n_humans = tally.human_count
+        print(f"  Human votes collected: {n_humans}")
 
         # Determine how many agents needed
-        n_needed   = max(0, TOTAL_VOTES - len(human_votes))
-        agent_pool = random.sample(AGENTS, n_needed) if n_needed else []
+        n_needed   = min(max(0, self.total_votes - n_humans), len(self.agents))
+        agent_pool = random.sample(self.agents, n_needed) if n_needed else []
         print(f"  Agents needed: {n_needed}")
 
-        # Fire all agent decisions concurrently (they have 5s)
+        # Fire all agent decisions concurrently (they have 5s); each agent
+        # that misses the deadline is cut off and replaced by its fallback
+        agent_deadline = round_start + AGENT_END_TIME - AGENT_WRITE_MARGIN
         agent_task = asyncio.create_task(
-            self._get_all_agent_decisions(agent_pool, round_num)
+            self._get_all_agent_decisions(agent_pool, round_num, agent_deadline)
         )
 
         # Wait for agent window to finish
-        elapsed   = time.time() - round_start
-        remaining = max(0, AGENT_END_TIME - elapsed)
-        await asyncio.sleep(remaining)
+        await self._sleep_until(round_start + AGENT_END_TIME)
 
-        # Collect agent results (should be done by now, but await with timeout)
+        # Collect agent results (bounded by agent_deadline + one batch write)
         try:
-            agent_votes = await asyncio.wait_for(agent_task, timeout=3.0)
-        except asyncio.TimeoutError:
-            agent_votes = []
-            print("  WARNING: Agent voting timed out, using fallback")
-            agent_votes = self._fallback_agent_votes(agent_pool, round_num)
+            agent_votes = await agent_task
+        except Exception as e:
+            print(f"  WARNING: Agent voting failed ({e}), using fallback")
+            agent_votes = await self._fallback_agent_votes(agent_pool, round_num)
 
         print(f"  Agent votes written: {len(agent_votes)}")
 
         # ── Phase 3: HMNN Prediction (25s → 30s) ─────────────────────────
+        late["predicting"] = max(0.0, self.clock.time() - (round_start + AGENT_END_TIME))
         print(f"[Round {round_num}] Phase 3: Computing HMNN prediction ({AGENT_END_TIME}s → {ROUND_DURATION}s)")
+        self._publish_phase(round_num, "predicting", round_start, ROUND_DURATION)
 
-        # Re-read all votes now that agents have voted
-        human_votes_final = self._read_human_votes(round_num)
-        all_votes_so_far  = human_votes_final + agent_votes
-
-        # Build current round's voter matrix for HMNN (use what we have)
-        if len(all_votes_so_far) > 0:
-            current_matrix = {
-                "votes": [
-                    encode_vote(v["color"], v["emotionFeel"], v["influenceHistory"])
-                    for v in all_votes_so_far
-                ],
-                "result": None,  # unknown yet
-            }
-            window_for_predict = self.window + [current_matrix]
-        else:
-            window_for_predict = self.window
+        # Build current round's voter matrix for HMNN (use what we have;
+        # agent votes were applied to the tally as they were written)
+        current_votes = tally.matrix()
+        X, mask = self.window.view(current_votes if len(current_votes) else None)
 
         # Compute prediction using last 5 rounds of history + current partial data
-        prediction = self.model.predict(window_for_predict, self.round_history)
+        prediction = self.models.predict(X, mask, self.round_history)
         print(f"  HMNN Prediction: {prediction}")
 
         # Write prediction to Firestore — frontend will display it
-        self._write_prediction(round_num, prediction)
+        await self._write_prediction(round_num, prediction)
+        self.events.publish("prediction", {"round": round_num, "prediction": prediction})
 
         # Wait out the remaining prediction window
-        elapsed   = time.time() - round_start
-        remaining = max(0, ROUND_DURATION - elapsed)
-        if remaining > 0:
-            await asyncio.sleep(remaining)
+        round_end    = round_start + ROUND_DURATION
+        late["close"] = await self._sleep_until(round_end)
 
         # ── Tally ─────────────────────────────────────────────────────────
-        all_votes = self._read_all_votes(round_num)
-        red   = sum(1 for v in all_votes if v["color"] == "RED")
-        green = sum(1 for v in all_votes if v["color"] == "GREEN")
+        red, green = tally.counts()
         winner = "RED" if red > green else "GREEN" if green > red else "TIE"
         print(f"  TALLY: RED={red} GREEN={green} → WINNER={winner}")
 
         # ── Build voter matrix for HMNN update ───────────────────────────
-        voter_matrix = {
-            "votes": [
-                encode_vote(v["color"], v["emotionFeel"], v["influenceHistory"])
-                for v in all_votes
-            ],
-            "result": winner,
-        }
-        self.window.append(voter_matrix)
-        if len(self.window) > 5:
-            self.window.pop(0)
+        self.window.push(tally.matrix(), winner)
+
+        self._unwatch_round()
 
         # ── RL update (now that we know the actual winner) ────────────────
-        metrics = self.model.update(winner)
+        metrics = self.models.update(winner)
         print(f"  Metrics: acc={metrics.get('accuracy')} loss={metrics.get('loss')} correct={metrics.get('correct')}")
 
-        # ── Write results to Firestore ────────────────────────────────────
-        self._write_result(round_num, red, green, winner, prediction, metrics)
-        self._write_metrics(round_num, metrics)
-        self.model.save_rl("rl_weights.pkl")
-
         # ── Update local history ──────────────────────────────────────────
         self.round_history.append({
             "round":  round_num,
@@ -293,21 +302,60 @@ class RoundManager:
         if len(self.round_history) > 5:
             self.round_history = self.round_history[-5:]
 
-        # ── Advance round ─────────────────────────────────────────────────
-        self._advance_round(round_num)
-        print(f"[Round {round_num}] COMPLETE → advanced to round {round_num + 1}")
-    
+        self._record_lateness(round_num, late)
+
+        # ── Write result + metrics + snapshot + advance in one transaction ─
+        # In the background: the next round starts at round_end regardless of
+        # write latency, and its startedAt is round_end, not "when we got here"
+        # A scheduled promotion takes effect first, so this round's snapshot
+        # already records the new primary
+        if self._promote_to is not None:
+            self._apply_promotion()
+        self._next_start = round_end
+        self._closing = self._close_round(
+            round_num, red, green, winner, prediction, metrics,
+            started_at=int(round_end * 1000), late=late,
+        )
 
-    # ── Get all agent decisions and write them concurrently ───────────────
-    async def _get_all_agent_decisions(self, agent_pool: list, round_num: int) -> list:
+    async def _finish_close(self):
+        """Wait for the previous round's close-out; its errors surface here."""
+        closing, self._closing = self._closing, None
+        if closing is not None:
+            await closing
+
+    async def drain(self):
+        """Let the last round's close-out commit (shutdown, simulations)."""
+        await self._finish_close()
+
+    # ── Schedule ──────────────────────────────────────────────────────────
+    async def _sleep_until(self, deadline: float) -> float:
+        """Sleep until round-time `deadline`; returns how late we woke (s)."""
+        delay = deadline - self.clock.time()
+        if delay > 0:
+            await self.clock.sleep(delay)
+        return max(0.0, self.clock.time() - deadline)
+
+    def _record_lateness(self, round_num: int, late: dict[str, float]):
+        for phase, secs in late.items():
+            self.lateness[phase] = max(self.lateness.get(phase, 0.0), secs)
+            if secs > SCHEDULE_WARN_LATE:
+                print(f"  WARNING: round {round_num} phase '{phase}' started {secs:.3f}s late")
+
+    # ── Get all agent decisions and write them in one batch ───────────────
+    async def _get_all_agent_decisions(self, agent_pool: list, round_num: int,
+                                       deadline: float) -> list:
         if not agent_pool:
             return []
 
-        decisions = await asyncio.gather(*[
-            get_agent_decision(a, self.round_history) for a in agent_pool
-        ])
+        history = list(self.round_history)
+        # Local policy decisions for the whole pool in one pass: the votes
+        # themselves in local mode, per-agent fallbacks in LLM mode (llm.py)
+        local = self.policy.decide(agent_pool, history, round_num)
+        decisions = await llm.decide_pool(agent_pool, history, local,
+                                          timeout=self.clock.timeout_until(deadline),
+                                          use_llm=self.use_llm)
 
-        agent_votes = []
+        agent_votes = {}
         for agent, decision in zip(agent_pool, decisions):
             vote = {
                 "userId":           agent["id"],
@@ -316,17 +364,17 @@ class RoundManager:
                 "emotionFeel":      decision["emotionFeel"],
                 "influenceHistory": decision["influenceHistory"],
                 "isAgent":          True,
-                "votedAt":          int(time.time() * 1000),
+                "votedAt":          self._now_ms(),
             }
-            self._write_vote(round_num, agent["id"], vote)
-            agent_votes.append(vote)
+            agent_votes[agent["id"]] = vote
 
-        return agent_votes
+        await self._write_votes(round_num, agent_votes)
+        return list(agent_votes.values())
 
-    def _fallback_agent_votes(self, agent_pool: list, round_num: int) -> list:
-        votes = []
-        for agent in agent_pool:
-            d = _agent_fallback(agent, self.round_history)
+    async def _fallback_agent_votes(self, agent_pool: list, round_num: int) -> list:
+        votes = {}
+        decisions = self.policy.decide(agent_pool, self.round_history, round_num)
+        for agent, d in zip(agent_pool, decisions):
             vote = {
                 "userId":           agent["id"],
                 "agentName":        agent["name"],
@@ -334,40 +382,235 @@ class RoundManager:
                 "emotionFeel":      d["emotionFeel"],
                 "influenceHistory": d["influenceHistory"],
                 "isAgent":          True,
-                "votedAt":          int(time.time() * 1000),
+                "votedAt":          self._now_ms(),
             }
-            self._write_vote(round_num, agent["id"], vote)
-            votes.append(vote)
-        return votes
-
-    # ── Firestore helpers ─────────────────────────────────────────────────
-    def _read_human_votes(self, round_num: int) -> list[dict]:
-        ref  = self.db.collection("rounds").document(str(round_num)).collection("votes")
-        snap = ref.get()
-        return [d.to_dict() for d in snap if not d.to_dict().get("isAgent", False)]
-
-    def _read_all_votes(self, round_num: int) -> list[dict]:
-        ref  = self.db.collection("rounds").document(str(round_num)).collection("votes")
-        snap = ref.get()
-        return [d.to_dict() for d in snap]
-
-    def _write_vote(self, round_num: int, user_id: str, data: dict):
-        self.db.collection("rounds").document(str(round_num)) \
-               .collection("votes").document(user_id).set(data)
-
-    def _write_prediction(self, round_num: int, prediction: str):
+            votes[agent["id"]] = vote
+        await self._write_votes(round_num, votes)
+        return list(votes.values())
+
+    # ── Shadow models ────────────────────────────────────────────────────
+    def promote(self, name: str):
+        """Schedule `name` to become the primary model once the current round closes."""
+        if name not in self.models:
+            raise KeyError(name)
+        self._promote_to = name
+
+    async def request_promotion(self, name: str):
+        """
+        Any worker: ask the leader to promote `name` through
+        gameState/promotion. The leader picks the request up when its next
+        round starts (at once if that is us) and promotes when it closes.
+        """
+        if name not in self.models:
+            raise KeyError(name)
+        if self.leading:
+            self.promote(name)
+        self._requested = {"model": name, "requestedAt": self._now_ms(),
+                           "status": "scheduled" if self.leading else "pending"}
+        await self.store.set_promotion(self._requested)
+
+    async def _take_promotion_request(self, round_num: int):
+        """Leader, once per round: schedule a promotion another worker asked for."""
+        try:
+            req = await self.store.get_promotion()
+            if req is None or req.get("status") != "pending":
+                return
+            name = req.get("model")
+            status = "scheduled" if name in self.models else "unknown model"
+            if name in self.models:
+                self.promote(name)
+            self._requested = {**req, "status": status, "round": round_num}
+            await self.store.set_promotion(self._requested)
+        except Exception as e:
+            print(f"  WARNING: promotion request not read: {e}")
+
+    @property
+    def pending_promotion(self) -> str | None:
+        """The model that becomes primary when a round next closes, if any."""
+        if self._promote_to is not None:
+            return self._promote_to
+        req = self._requested
+        return req.get("model") if req is not None and req.get("status") == "pending" else None
+
+    async def model_status(self) -> dict:
+        """GET /models: every model's running accuracy, current on any worker."""
+        await self.follow_models()
+        return {"models": self.models.stats(), "pending_promotion": self.pending_promotion}
+
+    def _apply_promotion(self):
+        self._use_primary(self.models.promote(self._promote_to))
+        self._promote_to = None
+
+    def _use_primary(self, model: RLModel):
+        self.model = model
+        if self.checkpoint:
+            self.checkpoint.model = model
+            self.checkpoint.saved_version = None     # next save writes the new weights
+            self.checkpoint.min_version   = 0
+
+    # ── Rolling state snapshot (gameState/snapshot) ──────────────────────
+    def _snapshot_doc(self, round_num: int) -> dict:
+        """
+        Everything bootstrap needs to resume warm. Each window round stores
+        its encoded votes packed (rl_model.pack_votes, ~4 bytes per voter),
+        at most SNAPSHOT_MAX_VOTERS of them, so the doc stays well inside
+        Firestore's 1 MiB limit however many people vote.
+        """
+        window = []
+        for rows, result in self.window.rounds():
+            if len(rows) > SNAPSHOT_MAX_VOTERS:
+                print(f"  WARNING: snapshot keeps {SNAPSHOT_MAX_VOTERS} of {len(rows)} voters")
+                rows = rows[:SNAPSHOT_MAX_VOTERS]
+            window.append({"packed": pack_votes(rows), "result": result})
+        return {
+            "round":      round_num,
+            "history":    list(self.round_history),
+            "window":     window,
+            "cumCorrect": self.cum_correct,
+            "cumTotal":   self.cum_total,
+            "rlVersion":  self.model.rl.updates,
+            # Identity, RL weights and accuracy of the primary and every
+            # candidate, so a leader on another node resumes all of them
+            "models":     self.models.to_doc(),
+            "ts":         self._now_ms(),
+        }
+
+    def _restore_snapshot(self, snap: dict):
+        self.round_history = list(snap.get("history", []))[-5:]
+        self.window = VoterWindow()
+        for rd in snap.get("window", [])[-5:]:
+            if "packed" in rd:
+                rows = unpack_votes(rd["packed"])
+            else:                               # snapshot written before packing
+                rows = np.asarray(rd.get("votes", []), dtype=np.float32).reshape(-1, 3)
+            self.window.push(rows, rd.get("result"))
+        self.cum_correct = snap.get("cumCorrect", 0)
+        self.cum_total   = snap.get("cumTotal", 0)
+        print(f"[Bootstrap] Snapshot through round {snap.get('round')}: "
+              f"{len(self.round_history)} summaries, {len(self.window)} window rounds, "
+              f"cumulative {self.cum_correct}/{self.cum_total}")
+        self._restore_models(snap)
+
+    def _restore_models(self, snap: dict):
+        """Adopt the snapshot's model state (newer weights, promoted primary)."""
+        if snap.get("models"):
+            self.models.restore(snap["models"])
+            if self.models.model is not self.model:
+                self._use_primary(self.models.model)
+        expected = snap.get("rlVersion") or 0
+        self._committed_rl = expected
+        if self.model.rl.updates != expected:
+            print(f"  WARNING: RL weights at version {self.model.rl.updates}, "
+                  f"snapshot expected {expected}")
+        if self.checkpoint:
+            self.checkpoint.min_version = expected
+
+    def _now_ms(self) -> int:
+        return int(self.clock.time() * 1000)
+
+    # ── Live tally ────────────────────────────────────────────────────────
+    def _watch_round(self, round_num: int) -> VoteTally:
+        self._unwatch_round()
+        self._tally   = VoteTally(round_num)
+        self._tally.on_change = self._on_tally_change
+        self._unwatch = self.store.watch_votes(round_num, self._tally.apply_changes)
+        return self._tally
+
+    def _unwatch_round(self):
+        if self._unwatch is not None:
+            self._unwatch()
+            self._unwatch = None
+
+    async def _ensure_synced(self, tally: VoteTally):
+        """One full read only if the listener never delivered its first snapshot."""
+        if tally.synced.is_set():
+            return
+        print("  WARNING: votes listener not synced, reading votes once")
+        votes = await self.store.read_votes(tally.round_num)
+        tally.apply_changes([(v.get("userId"), v) for v in votes])
+
+    # ── Live events (GET /stream) ─────────────────────────────────────────
+    def _publish_phase(self, round_num: int, phase: str, round_start: float, ends_at: float):
+        self.events.publish("phase", {
+            "round":     round_num,
+            "phase":     phase,
+            "startedAt": int(round_start * 1000),
+            "endsAt":    int((round_start + ends_at) * 1000),
+        })
+
+    def _publish_close(self, round_num: int, result_doc: dict, metrics_doc: dict | None):
+        self.events.publish("tally",   {"round": round_num, "red": result_doc.get("redVotes", 0),
+                                        "green": result_doc.get("greenVotes", 0), "final": True})
+        self.events.publish("result",  result_doc)
+        if metrics_doc is not None:
+            self.events.publish("metrics", metrics_doc)
+
+    def _on_tally_change(self):
+        """Any thread: schedule one coalesced tally push per TALLY_PUSH_INTERVAL."""
+        if self._tally_push_pending or self._loop is None:
+            return
+        self._tally_push_pending = True
+        self._loop.call_soon_threadsafe(self._loop.call_later, TALLY_PUSH_INTERVAL,
+                                        self._push_tally)
+
+    def _push_tally(self):
+        self._tally_push_pending = False
+        tally = self._tally
+        if tally is not None and self._unwatch is not None:     # round still live
+            self.events.publish("tally", {"round": tally.round_num, **tally.summary()})
+
+    # ── Firestore helpers (awaitable, run off the event loop) ─────────────
+    async def _write_votes(self, round_num: int, votes: dict):
+        await self.store.write_votes(round_num, votes)
+        tally = self._tally
+        if tally is not None and tally.round_num == round_num:
+            tally.apply_many(votes.items())
+
+    async def _write_prediction(self, round_num: int, prediction: str):
         """Write prediction so frontend can show it in last 5 seconds."""
-        self.db.collection("roundResults").document(str(round_num)).set(
-            {
-                "prediction": prediction,
-                "status":     "predicting",
-                "predictedAt": int(time.time() * 1000),
-            },
-            merge=True,
+        doc = {
+            "prediction": prediction,
+            "status":     "predicting",
+            "predictedAt": self._now_ms(),
+        }
+        await self.store.write_result(round_num, doc, merge=True)
+        self.results.put_result(round_num, doc, merge=True)
+
+    def _close_round(self, round_num, red, green, winner, prediction, metrics,
+                     started_at: int, late: dict[str, float]) -> asyncio.Task:
+        """Build the close-out docs now; commit them in a background task."""
+        cum_correct = self.cum_correct + (1 if metrics.get("correct") else 0)
+        cum_total   = self.cum_total + 1
+        metrics_doc = self._metrics_doc(round_num, metrics, cum_correct, cum_total, late)
+        self.cum_correct, self.cum_total = cum_correct, cum_total
+        result_doc  = self._result_doc(round_num, red, green, winner, prediction, metrics)
+        snapshot    = self._snapshot_doc(round_num)
+        return asyncio.create_task(
+            self._commit_close(round_num, result_doc, metrics_doc, snapshot, started_at)
+        )
+
+    async def _commit_close(self, round_num: int, result_doc: dict, metrics_doc: dict,
+                            snapshot: dict, started_at: int):
+        await self.store.close_round(
+            round_num,
+            result_doc,
+            metrics_doc,
+            started_at=started_at,
+            snapshot=snapshot,
+            fence=self.lease.fence if self.lease is not None else None,
         )
+        # Committed: the checkpoint may now catch up to this round's weights
+        self._committed_rl = snapshot["rlVersion"]
+        if self.checkpoint and self.model.rl.updates == self._committed_rl:
+            self.checkpoint.note_round()
+        self.metrics.append(metrics_doc)
+        self.results.put_result(round_num, result_doc)
+        self.results.set_state({"round": round_num + 1, "startedAt": started_at})
+        self._publish_close(round_num, result_doc, metrics_doc)
+        print(f"[Round {round_num}] COMPLETE → advanced to round {round_num + 1}")
 
-    def _write_result(self, round_num, red, green, winner, prediction, metrics):
-        self.db.collection("roundResults").document(str(round_num)).set({
+    def _result_doc(self, round_num, red, green, winner, prediction, metrics) -> dict:
+        return {
             "round":       round_num,
             "redVotes":    red,
             "greenVotes":  green,
@@ -377,36 +620,207 @@ class RoundManager:
             "reward":      metrics.get("reward", 0),
             "accuracy":    metrics.get("accuracy", 0),
             "loss":        metrics.get("loss", 1),
-            "timestamp":   int(time.time() * 1000),
+            "timestamp":   self._now_ms(),
             "status":      "done",
-        })
+        }
 
-    def _write_metrics(self, round_num: int, metrics: dict):
-        self.db.collection("metrics").document(str(round_num)).set({
-            "round":    round_num,
-            "accuracy": metrics.get("accuracy", 0),
-            "loss":     metrics.get("loss", 1),
-            "reward":   metrics.get("reward", 0),
-            "correct":  metrics.get("correct", False),
-            "ts":       int(time.time() * 1000),
-        })
+    def _metrics_doc(self, round_num: int, metrics: dict,
+                     cum_correct: int, cum_total: int, late: dict[str, float] = None) -> dict:
+        cum_acc = cum_correct / cum_total
+        return {
+            "round":      round_num,
+            "correct":    metrics.get("correct", False),
+            "reward":     metrics.get("reward", 0),
+            # per-round fields kept for reference (model accuracy since start)
+            "accuracy":   metrics.get("accuracy", 0),
+            "loss":       metrics.get("loss", 1),
+            # rolling-window accuracy, e.g. accuracy_100 / accuracy_1000
+            **{k: v for k, v in metrics.items() if k.startswith("accuracy_")},
+            # cumulative fields — these drive the training graph
+            "cumCorrect": cum_correct,
+            "cumTotal":   cum_total,
+            "cumAcc":     round(cum_acc, 4),
+            "cumLoss":    round(1.0 - cum_acc, 4),
+            # how far behind schedule each phase started (ms)
+            "lateMs":     {k: round(v * 1000) for k, v in (late or {}).items()},
+            "ts":         self._now_ms(),
+        }
 
-    def _advance_round(self, current: int):
-        ref  = self.db.collection("gameState").document("currentRound")
-        snap = ref.get()
-        if snap.exists and snap.to_dict().get("round") == current:
-            ref.set({"round": current + 1, "startedAt": int(time.time() * 1000)})
+    # ── Not leading: read what the leader writes ─────────────────────────
+    async def follow(self, force: bool = False):
+        """
+        Bring the metrics series up to date from the store, at most once per
+        ROUND_CACHE_TTL (unless forced), so a worker that does not run the
+        loop still answers /metrics from memory (cursors, downsampling,
+        ETags) with bounded staleness. A no-op while leading.
+        """
+        now = time.monotonic()
+        if self.leading or (not force and now - self._followed_at < ROUND_CACHE_TTL):
+            return
+        self._followed_at = now
+        last = self.metrics.last()
+        if last is not None and self.metrics.ready:
+            rows = await self.store.list_metrics(FOLLOW_BATCH)
+            if len(rows) < FOLLOW_BATCH or rows[0]["round"] <= last["round"] + 1:
+                for row in rows:
+                    if row["round"] > last["round"]:
+                        self.metrics.append(row)
+                return
+        # First request, or too far behind to catch up incrementally
+        self.metrics.seed(await self.store.list_metrics(METRICS_SEED))
+
+    async def follow_models(self):
+        """
+        Adopt the leader's model state (weights, accuracy, primary) from the
+        snapshot and re-read gameState/promotion, at most once per
+        ROUND_CACHE_TTL, so GET /models is current on any worker.
+        """
+        now = time.monotonic()
+        if self.leading or now - self._models_at < ROUND_CACHE_TTL:
+            return
+        self._models_at = now
+        snap, self._requested = await asyncio.gather(self.store.get_snapshot(),
+                                                     self.store.get_promotion())
+        if snap is not None and snap.get("models"):
+            self._restore_models(snap)
+
+    # ── Not leading: relay the leader's rounds to GET /stream ────────────
+    def start_relay(self):
+        """
+        Feed self.events from store listeners while another process leads:
+        each gameState change starts a round (phases on its schedule, live
+        tally from the votes listener, as when leading) and ends the previous
+        one (its result and metrics, read once). The prediction is read when
+        the leader publishes it. A no-op while leading or already relaying.
+        """
+        if self.leading or self._relay_unwatch is not None:
+            return
+        self._loop = loop = asyncio.get_running_loop()
+        self._relay_unwatch = self.store.watch_game_state(
+            lambda state: loop.call_soon_threadsafe(self._relay_round, state))
+
+    def stop_relay(self):
+        """Drop the relay's listeners (no viewers left, or we start leading)."""
+        if self._relay_unwatch is not None:
+            self._relay_unwatch()
+            self._relay_unwatch = None
+        for timer in self._relay_timers:
+            timer.cancel()
+        for task in self._relay_tasks:
+            task.cancel()
+        self._relay_timers = []
+        self._relay_state  = None
+        if not self.leading:
+            self._unwatch_round()
+
+    def _relay_spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._relay_tasks.add(task)
+        task.add_done_callback(self._relay_tasks.discard)
+
+    def _relay_round(self, state: dict | None):
+        if self.leading or self._relay_unwatch is None or state is None:
+            return
+        prev = self._relay_state
+        if prev is not None and (prev.get("round"), prev.get("startedAt")) == \
+                (state.get("round"), state.get("startedAt")):
+            return
+        self._relay_state = state
+        for timer in self._relay_timers:
+            timer.cancel()
+        self._relay_timers = []
+
+        round_num   = state.get("round", 1)
+        round_start = state.get("startedAt", 0) / 1000
+        if prev is not None and prev.get("round", 0) < round_num:
+            self._relay_spawn(self._relay_closed(round_num - 1))
+        self._watch_round(round_num)          # tally pushes, as when leading
+
+        elapsed = self.clock.time() - round_start
+        for phase, begins, ends in (("humans",     0,               HUMAN_VOTE_TIME),
+                                    ("agents",     HUMAN_VOTE_TIME, AGENT_END_TIME),
+                                    ("predicting", AGENT_END_TIME,  ROUND_DURATION)):
+            if elapsed >= ends:
+                continue
+            if elapsed >= begins:
+                self._publish_phase(round_num, phase, round_start, ends)
+            else:
+                self._relay_timers.append(self._loop.call_later(
+                    self.clock.timeout_until(round_start + begins),
+                    self._publish_phase, round_num, phase, round_start, ends))
+        if elapsed < ROUND_DURATION:
+            self._relay_timers.append(self._loop.call_later(
+                self.clock.timeout_until(round_start + AGENT_END_TIME),
+                lambda: self._relay_spawn(self._relay_prediction(round_num, round_start))))
+
+    async def _relay_prediction(self, round_num: int, round_start: float):
+        """Poll roundResults/{n} until the leader has written the prediction."""
+        while self.clock.time() < round_start + ROUND_DURATION:
+            doc = await self.store.get_result(round_num)
+            if doc is not None and doc.get("prediction"):
+                self.events.publish("prediction", {"round": round_num,
+                                                   "prediction": doc["prediction"]})
+                return
+            await self.clock.sleep(RELAY_POLL_INTERVAL)
+
+    async def _relay_closed(self, round_num: int):
+        """The leader closed round_num (gameState advanced): publish its result."""
+        result = await self.store.get_result(round_num)
+        if result is None or result.get("status") != "done":
+            return
+        await self.follow(force=True)
+        last = self.metrics.last()
+        self._publish_close(round_num, result,
+                            last if last is not None and last["round"] == round_num else None)
 
     async def run(self, start_round: int = 1, total_rounds: int = 10_000):
+        self.stop_relay()                     # we write the rounds from now on
+        self.leading = True
+        # Elected: the weights we hold may be older than the last leader's
+        # (checkpoint file on this host, then the snapshot in bootstrap)
+        if self.checkpoint:
+            self.checkpoint.load()
         await self.bootstrap()
-        snap = self.db.collection("gameState").document("currentRound").get()
-        if snap.exists:
-            start_round = snap.to_dict().get("round", 1)
+        state = await self.store.get_game_state()
+        now   = self.clock.time()
+        if state is not None:
+            start_round = state.get("round", 1)
+            started_at  = state.get("startedAt", 0) / 1000
+        if state is None or not 0 <= now - started_at < HUMAN_VOTE_TIME:
+            # No gameState yet (normally the web UI creates it), or the round
+            # is too far gone to join: (re)start it now so clients re-sync
+            started_at = now
+            state = {"round": start_round, "startedAt": int(now * 1000)}
+            await self.store.set_game_state(state)
+            self.results.set_state(state)
+        self._next_start = started_at
         print(f"\n[RoundManager] Starting from round {start_round}")
-        for rnum in range(start_round, start_round + total_rounds):
-            await self.run_round(rnum)
+        try:
+            for rnum in range(start_round, start_round + total_rounds):
+                await self.run_round(rnum)
+        finally:
+            self._unwatch_round()             # cancelled mid-round (leadership lost)
+            try:
+                await self.drain()
+            except Exception as e:
+                print(f"[RoundManager] Last close-out failed: {e}")
+            # Only while our weights match the last committed round: a failed
+            # close-out (here or one that surfaced in run_round) left them ahead
+            if self.checkpoint and self.model.rl.updates == self._committed_rl:
+                await self.checkpoint.flush()
+            # Another process writes the rounds from now on
+            self.leading = False
+            self.results.step_down()
+            self.events.close()
+            self._followed_at = float("-inf")
 
 
 if __name__ == "__main__":
-    manager = RoundManager()
-    asyncio.run(manager.run())
\ No newline at end of file
+    store      = make_store()
+    leadership = Leadership(make_lease("roundLoop", store))
+    manager    = RoundManager(store=store, lease=leadership.lease)
+    try:
+        asyncio.run(leadership.run(manager.run))
+    finally:
+        if manager.checkpoint:
+            manager.checkpoint.close()
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+shadow.py
+Shadow evaluation of candidate models inside the round loop.
+
+A ModelPool holds the primary RLModel plus any number of candidates (other
+HMNN.pkl files, learning rates, or correction layers). Every round they all
+see the same voter window and round summaries, predict, and update on the
+same outcome; only the primary's prediction is returned (and published by
+RoundManager). Per-model accuracy is tracked so a better candidate can be
+promoted between rounds without a restart.
+
+Prediction stays cheap with many candidates: models built from the same
+HMNN file share one HMNNForward, and the HMNN forward pass runs once per
+distinct base model — each candidate then only adds its (15×2) RL
+correction.
+
+Candidates can be declared with SHADOW_MODELS, a comma-separated list of
+name=hmnn_path[:alpha], e.g.
+
+  SHADOW_MODELS="lr01=HMNN.pkl:0.01,lr20=HMNN.pkl:0.2,v2=HMNN_v2.pkl"
+
+to_doc() / restore() carry every model's identity (HMNN file, alpha), RL
+weights and running accuracy through the round snapshot, so a restart keeps
+the comparison going and a promoted primary stays promoted — it is
+registered again from the snapshot if it is no longer in SHADOW_MODELS.
+State is only restored onto a model with the same identity; a model whose
+configuration changed starts fresh.
+"""
+
+import os
+
+import numpy as np
+
+from rl_model import ALPHA, RLModel, T, same_hmnn
+
+SHADOW_MODELS = os.getenv("SHADOW_MODELS", "")
+
+
+def parse_shadow_models(spec: str) -> list[tuple[str, str, float]]:
+    """'name=path[:alpha],...' → [(name, path, alpha), ...]"""
+    out = []
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, _, rest = item.partition("=")
+        if not name or not rest:
+            raise ValueError(f"SHADOW_MODELS entry {item!r} is not name=path[:alpha]")
+        path, _, alpha = rest.partition(":")
+        out.append((name.strip(), path.strip(), float(alpha) if alpha else ALPHA))
+    return out
+
+
+class ModelPool:
+
+    def __init__(self, primary: RLModel, name: str = "primary"):
+        self.models:  dict[str, RLModel] = {name: primary}
+        self.primary  = name
+        self.predictions: dict[str, str] = {}   # last round's prediction per model
+
+    @property
+    def model(self) -> RLModel:
+        return self.models[self.primary]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.models
+
+    # ── Registration ──────────────────────────────────────────────────────
+    def register(self, name: str, hmnn_path: str = "HMNN.pkl", alpha: float = ALPHA,
+                 model: RLModel = None) -> RLModel:
+        """Add a candidate; reuses the HMNN weights of any model on the same file."""
+        if name in self.models:
+            raise ValueError(f"model {name!r} is already registered")
+        if model is None:
+            shared = next((m.hmnn for m in self.models.values() if m.pkl_path == hmnn_path), None)
+            model  = RLModel(hmnn_path, alpha=alpha, hmnn=shared)
+        self.models[name] = model
+        print(f"[Shadow] Registered candidate {name!r} ({model.pkl_path}, alpha={model.alpha})")
+        return model
+
+    def promote(self, name: str) -> RLModel:
+        """Make `name` the primary; the old primary keeps running as a candidate."""
+        if name not in self.models:
+            raise KeyError(name)
+        print(f"[Shadow] Promoting {name!r} (was {self.primary!r})")
+        self.primary = name
+        return self.model
+
+    # ── Round hooks ───────────────────────────────────────────────────────
+    def predict(self, X: np.ndarray, mask: np.ndarray, round_summaries: list[dict]) -> str:
+        """Every model predicts on the same window; returns the primary's prediction."""
+        logits: dict[int, np.ndarray] = {}          # id(HMNNForward) → logits
+        for name, model in self.models.items():
+            key = id(model.hmnn)
+            if key not in logits:
+                logits[key] = (model.hmnn.forward_batch(X[:, -T:], mask[:, -T:])[0]
+                               if X.shape[1] >= T else np.zeros(2))
+            self.predictions[name] = model.predict_from_logits(logits[key], round_summaries)
+        return self.predictions[self.primary]
+
+    def update(self, actual_winner: str) -> dict:
+        """Update every model on the outcome; returns the primary's metrics."""
+        metrics = {}
+        for name, model in self.models.items():
+            m = model.update(actual_winner)
+            if name == self.primary:
+                metrics = m
+        return metrics
+
+    # ── Persistence (round snapshot) ──────────────────────────────────────
+    def to_doc(self) -> dict:
+        return {"primary": self.primary,
+                "models":  {name: model.to_doc() for name, model in self.models.items()}}
+
+    def restore(self, doc: dict):
+        """
+        Load each model's persisted state (unless ours is newer) and bring back
+        the persisted primary, re-registering it if it is no longer configured.
+        """
+        primary = doc.get("primary", self.primary)
+        for name, state in doc.get("models", {}).items():
+            model = self.models.get(name)
+            if model is None:
+                if name != primary:
+                    continue                    # candidate no longer configured
+                model = self.register(name, state.get("hmnnPath"), state.get("alpha", ALPHA))
+            if not same_hmnn(model.pkl_path, state.get("hmnnPath")) \
+                    or model.alpha != state.get("alpha"):
+                print(f"[Shadow] {name!r} was {state.get('hmnnPath')} alpha={state.get('alpha')}, "
+                      f"now {model.pkl_path} alpha={model.alpha}: not restoring its state")
+                continue
+            if state.get("updates", 0) < model.rl.updates:
+                continue                        # e.g. a newer local checkpoint
+            try:
+                model.load_doc(state)
+            except (KeyError, ValueError) as e:
+                print(f"[Shadow] {name!r}: unreadable persisted state ({e})")
+        if primary in self.models and primary != self.primary:
+            self.promote(primary)
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "name":       name,
+                "primary":    name == self.primary,
+                "hmnn_path":  model.pkl_path,
+                "alpha":      model.alpha,
+                "prediction": self.predictions.get(name),
+                **model.stats(),
+            }
+            for name, model in self.models.items()
+        ]
@@ -0,0 +1,105 @@
+"""
+simulate.py
+Load / soak-test harness: runs the real RoundManager pipeline (agent voting,
+prediction, tally, RL update, close-out writes) against an in-memory store
+on a virtual or accelerated clock.
+
+  python simulate.py --rounds 1000                    # virtual clock, max speed
+  python simulate.py --rounds 200 --clock scaled --speed 120
+  python simulate.py --rounds 500 --humans 4 --seed 7 --verbose
+
+Human voters are simulated by writing `--humans` random votes into each round
+before it starts (they land in the 0-20s window). RL weights are never
+written to rl_weights.npz unless --rl-path is given.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import time
+
+from clock import ScaledClock, VirtualClock
+from llm import EMOTION_OPTIONS, INFLUENCE_OPTIONS
+from round_manager import ROUND_DURATION, RoundManager
+from storage import MemoryStore
+
+
+def human_votes(rng: random.Random, round_num: int, n: int, ts_ms: int) -> dict:
+    votes = {}
+    for i in range(n):
+        uid = f"sim_human_{i:03d}"
+        votes[uid] = {
+            "userId":           uid,
+            "color":            rng.choice(["RED", "GREEN"]),
+            "emotionFeel":      rng.choice(EMOTION_OPTIONS),
+            "influenceHistory": rng.choice(INFLUENCE_OPTIONS),
+            "isAgent":          False,
+            "votedAt":          ts_ms,
+        }
+    return votes
+
+
+async def simulate(args) -> dict:
+    rng   = random.Random(args.seed)
+    random.seed(args.seed)            # agent pool sampling
+    clock = VirtualClock() if args.clock == "virtual" else ScaledClock(args.speed)
+    store = MemoryStore()
+    await store.set_game_state({"round": 1, "startedAt": int(clock.time() * 1000)})
+
+    manager = RoundManager(
+        store=store, clock=clock, hmnn_path=args.hmnn,
+        rl_path=args.rl_path, use_llm=args.llm, agent_seed=args.seed,
+    )
+
+    t0 = time.perf_counter()
+    for rnum in range(1, args.rounds + 1):
+        if args.humans:
+            await store.write_votes(
+                rnum, human_votes(rng, rnum, args.humans, int(clock.time() * 1000))
+            )
+        await manager.run_round(rnum)
+    await manager.drain()
+    wall = time.perf_counter() - t0
+    if manager.checkpoint:
+        await manager.checkpoint.flush()
+        manager.checkpoint.close()
+
+    metrics = (await store.list_metrics(1) or [{}])[-1]
+    return {
+        "rounds":            args.rounds,
+        "wall_s":            round(wall, 3),
+        "rounds_per_minute": round(args.rounds / max(wall, 1e-9) * 60, 1),
+        "simulated_s":       args.rounds * ROUND_DURATION,
+        "accuracy":          metrics.get("accuracy"),
+        "final_state":       await store.get_game_state(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RoundManager simulation harness")
+    parser.add_argument("--rounds",  type=int,   default=1000)
+    parser.add_argument("--humans",  type=int,   default=0, help="simulated human votes per round")
+    parser.add_argument("--clock",   choices=["virtual", "scaled"], default="virtual")
+    parser.add_argument("--speed",   type=float, default=60.0, help="scaled clock speed-up")
+    parser.add_argument("--seed",    type=int,   default=None)
+    parser.add_argument("--hmnn",    default="HMNN.pkl")
+    parser.add_argument("--rl-path", default=None, help="checkpoint RL weights here (.npz)")
+    parser.add_argument("--llm",     action="store_true",
+                        help="let agents call OpenAI (default: local persona policies)")
+    parser.add_argument("--verbose", action="store_true", help="keep per-round logs")
+    args = parser.parse_args()
+
+    if args.verbose:
+        report = asyncio.run(simulate(args))
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = asyncio.run(simulate(args))
+
+    for k, v in report.items():
+        print(f"[Simulate] {k:18s} {v}")
+
+
+if __name__ == "__main__":
+    main()
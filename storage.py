@@ -0,0 +1,609 @@
+"""
+storage.py
+Async data-access layer shared by round_manager.py, main.py and agent_voter.py.
+
+Store defines the operations the app needs on its collections; two backends
+implement it:
+
+  FirestoreStore : production. firebase_admin's client is synchronous, so
+                   each call runs on a small, bounded thread pool and is
+                   awaited, keeping Firestore round trips off the event loop.
+  MemoryStore    : process-local dicts, optionally persisted to SQLite, so
+                   the API and round loop run (and can be benchmarked) on a
+                   laptop or in CI without network or credentials.
+
+make_store() picks the backend from STORE_BACKEND (firestore | memory |
+sqlite) and STORE_PATH. A MemoryStore is not shared between processes; a
+SQLite file only carries state across restarts of one process.
+
+Collections used:
+  gameState/currentRound      { round, startedAt }
+  gameState/snapshot          RoundManager's rolling state, for fast restarts
+  gameState/promotion         { model, status, requestedAt, ... } a requested
+                              primary switch, applied by the round leader
+  rounds/{n}/votes/{userId}   one doc per human / agent vote
+  roundResults/{n}            prediction, then final tally
+  metrics/{n}                 per-round training metrics
+  leases/{name}               { holder, expiresAt, epoch } (lease.py)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    _HAS_FIREBASE = True
+except ImportError:
+    _HAS_FIREBASE = False
+
+STORE_BACKEND        = os.getenv("STORE_BACKEND", "firestore")
+STORE_PATH           = os.getenv("STORE_PATH", "projectnn.db")
+FIREBASE_CRED        = os.getenv("FIREBASE_CREDENTIALS_PATH", "serviceAccount.json")
+FIRESTORE_IO_WORKERS = int(os.getenv("FIRESTORE_IO_WORKERS", "8"))
+BATCH_LIMIT          = 500   # Firestore's max writes per batch / transaction
+
+
+class LeaseLost(Exception):
+    """A fenced write was refused: the caller no longer holds the lease."""
+
+
+# ─── Firebase ─────────────────────────────────────────────────────────────────
+def init_firebase():
+    if not _HAS_FIREBASE:
+        raise RuntimeError("firebase-admin is not installed; use STORE_BACKEND=memory")
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(FIREBASE_CRED)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+# ─── Interface ───────────────────────────────────────────────────────────────
+class Store:
+    """
+    Operations used by the app. Reads/writes are coroutines; watch_* register
+    a listener (possibly called from another thread) and return an
+    unsubscribe function.
+    """
+
+    def close(self):
+        pass
+
+    # gameState
+    async def get_game_state(self) -> dict | None:
+        raise NotImplementedError
+
+    async def set_game_state(self, state: dict):
+        raise NotImplementedError
+
+    def watch_game_state(self, on_change):
+        raise NotImplementedError
+
+    # rounds/{n}/votes
+    async def read_votes(self, round_num: int) -> list[dict]:
+        raise NotImplementedError
+
+    def watch_votes(self, round_num: int, on_changes):
+        raise NotImplementedError
+
+    async def write_votes(self, round_num: int, votes: dict):
+        raise NotImplementedError
+
+    # create-only: returns the userIds that already had a vote (not written)
+    async def create_votes(self, round_num: int, votes: dict) -> set[str]:
+        raise NotImplementedError
+
+    # roundResults
+    async def get_result(self, round_num: int) -> dict | None:
+        raise NotImplementedError
+
+    async def write_result(self, round_num: int, data: dict, merge: bool = False):
+        raise NotImplementedError
+
+    async def get_snapshot(self) -> dict | None:
+        raise NotImplementedError
+
+    # gameState/promotion: written by any API worker, applied by the leader
+    async def get_promotion(self) -> dict | None:
+        raise NotImplementedError
+
+    async def set_promotion(self, doc: dict):
+        raise NotImplementedError
+
+    # result + metrics + gameState advance (+ snapshot), atomically; with
+    # fence=(lease name, holder) only while that holder owns the lease
+    async def close_round(self, round_num: int, result: dict, metrics: dict,
+                          started_at: int, snapshot: dict = None,
+                          fence: tuple[str, str] = None):
+        raise NotImplementedError
+
+    # newest `limit` docs, oldest → newest
+    async def list_results(self, limit: int) -> list[dict]:
+        raise NotImplementedError
+
+    # ... among rounds < before when given (pages older metrics in)
+    async def list_metrics(self, limit: int, before: int | None = None) -> list[dict]:
+        raise NotImplementedError
+
+    # leases/{name}: take or extend for ttl_ms if free, expired or ours;
+    # returns the lease epoch (bumped on every change of holder) or None
+    async def acquire_lease(self, name: str, holder: str, ttl_ms: int) -> int | None:
+        raise NotImplementedError
+
+    async def release_lease(self, name: str, holder: str):
+        raise NotImplementedError
+
+
+def _lease_grant(current: dict | None, holder: str, now_ms: int, ttl_ms: int) -> dict | None:
+    """The lease doc after `holder` asks for it, or None if someone else holds it."""
+    epoch = 0
+    if current is not None:
+        epoch = current.get("epoch", 0)
+        if current.get("holder") == holder:
+            return {**current, "expiresAt": now_ms + ttl_ms}
+        if current.get("expiresAt", 0) > now_ms:
+            return None
+    return {"holder": holder, "expiresAt": now_ms + ttl_ms, "epoch": epoch + 1}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+# ─── Firestore-backed store ──────────────────────────────────────────────────
+class FirestoreStore(Store):
+    """
+    Awaitable wrappers around the synchronous Firestore client.
+    At most FIRESTORE_IO_WORKERS calls are in flight at once; extra calls
+    queue in the executor instead of spawning threads without bound.
+    """
+
+    def __init__(self, db=None, max_workers: int = FIRESTORE_IO_WORKERS):
+        self.db        = db if db is not None else init_firebase()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="firestore-io"
+        )
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    # ── Refs ──────────────────────────────────────────────────────────────
+    def _state_ref(self):
+        return self.db.collection("gameState").document("currentRound")
+
+    def _snapshot_ref(self):
+        return self.db.collection("gameState").document("snapshot")
+
+    def _promotion_ref(self):
+        return self.db.collection("gameState").document("promotion")
+
+    def _votes_ref(self, round_num: int):
+        return self.db.collection("rounds").document(str(round_num)).collection("votes")
+
+    def _lease_ref(self, name: str):
+        return self.db.collection("leases").document(name)
+
+    # ── gameState ─────────────────────────────────────────────────────────
+    def _get_game_state(self):
+        snap = self._state_ref().get()
+        return snap.to_dict() if snap.exists else None
+
+    async def get_game_state(self) -> dict | None:
+        return await self._run(self._get_game_state)
+
+    async def set_game_state(self, state: dict):
+        await self._run(self._state_ref().set, state)
+
+    async def get_snapshot(self) -> dict | None:
+        snap = await self._run(self._snapshot_ref().get)
+        return snap.to_dict() if snap.exists else None
+
+    async def get_promotion(self) -> dict | None:
+        snap = await self._run(self._promotion_ref().get)
+        return snap.to_dict() if snap.exists else None
+
+    async def set_promotion(self, doc: dict):
+        await self._run(self._promotion_ref().set, doc)
+
+    def watch_game_state(self, on_change):
+        """
+        Call on_change(state-or-None) whenever gameState/currentRound changes.
+        Runs on the listener's background thread. Returns an unsubscribe fn.
+        """
+        def _cb(docs, changes, read_time):
+            for doc in docs:
+                on_change(doc.to_dict() if doc.exists else None)
+
+        return self._state_ref().on_snapshot(_cb).unsubscribe
+
+    # ── Votes ─────────────────────────────────────────────────────────────
+    def _read_votes(self, round_num: int):
+        return [d.to_dict() for d in self._votes_ref(round_num).get()]
+
+    async def read_votes(self, round_num: int) -> list[dict]:
+        return await self._run(self._read_votes, round_num)
+
+    def watch_votes(self, round_num: int, on_changes):
+        """
+        Stream rounds/{n}/votes as incremental changes: on_changes receives a
+        list of (userId, vote-or-None) per snapshot, starting with every
+        existing vote. Only changed docs are delivered (and billed) after
+        that. Returns an unsubscribe fn.
+        """
+        def _cb(docs, changes, read_time):
+            on_changes([
+                (ch.document.id,
+                 None if ch.type.name == "REMOVED" else ch.document.to_dict())
+                for ch in changes
+            ])
+
+        return self._votes_ref(round_num).on_snapshot(_cb).unsubscribe
+
+    def _write_votes(self, round_num: int, votes: dict):
+        items = list(votes.items())
+        for i in range(0, len(items), BATCH_LIMIT):
+            batch = self.db.batch()
+            for user_id, data in items[i:i + BATCH_LIMIT]:
+                batch.set(self._votes_ref(round_num).document(user_id), data)
+            batch.commit()
+
+    async def write_votes(self, round_num: int, votes: dict):
+        """votes: {userId: vote doc}; committed as one WriteBatch per 500 docs."""
+        if votes:
+            await self._run(self._write_votes, round_num, votes)
+
+    def _create_votes(self, round_num: int, votes: dict) -> set[str]:
+        existing = set()
+        items    = list(votes.items())
+        for i in range(0, len(items), BATCH_LIMIT):
+            chunk = {uid: self._votes_ref(round_num).document(uid)
+                     for uid, _ in items[i:i + BATCH_LIMIT]}
+
+            @firestore.transactional
+            def _txn(txn):
+                found = {s.id for s in txn.get_all(list(chunk.values())) if s.exists}
+                for uid, ref in chunk.items():
+                    if uid not in found:
+                        txn.create(ref, votes[uid])
+                return found
+
+            existing |= _txn(self.db.transaction())
+        return existing
+
+    async def create_votes(self, round_num: int, votes: dict) -> set[str]:
+        """
+        Conditional batch insert: each vote is created only if that user has
+        no vote yet this round (one transaction per 500 docs). Returns the
+        userIds that were skipped as duplicates.
+        """
+        if not votes:
+            return set()
+        return await self._run(self._create_votes, round_num, votes)
+
+    # ── roundResults ──────────────────────────────────────────────────────
+    async def get_result(self, round_num: int) -> dict | None:
+        ref  = self.db.collection("roundResults").document(str(round_num))
+        snap = await self._run(ref.get)
+        return snap.to_dict() if snap.exists else None
+
+    async def write_result(self, round_num: int, data: dict, merge: bool = False):
+        ref = self.db.collection("roundResults").document(str(round_num))
+        await self._run(ref.set, data, merge=merge)
+
+    # ── Round close-out (single transaction) ──────────────────────────────
+    def _close_round(self, round_num: int, result: dict, metrics: dict,
+                     started_at: int, snapshot: dict = None, fence: tuple[str, str] = None):
+        state_ref   = self._state_ref()
+        result_ref  = self.db.collection("roundResults").document(str(round_num))
+        metrics_ref = self.db.collection("metrics").document(str(round_num))
+
+        @firestore.transactional
+        def _txn(txn):
+            snap = state_ref.get(transaction=txn)
+            if fence is not None:
+                lease = self._lease_ref(fence[0]).get(transaction=txn)
+                if not lease.exists or lease.to_dict().get("holder") != fence[1]:
+                    raise LeaseLost(fence[0])
+            txn.set(result_ref, result)
+            txn.set(metrics_ref, metrics)
+            if snapshot is not None:
+                txn.set(self._snapshot_ref(), snapshot)
+            if snap.exists and snap.to_dict().get("round") == round_num:
+                txn.set(state_ref, {"round": round_num + 1, "startedAt": started_at})
+
+        _txn(self.db.transaction())
+
+    async def close_round(self, round_num: int, result: dict, metrics: dict,
+                          started_at: int, snapshot: dict = None,
+                          fence: tuple[str, str] = None):
+        """
+        Commit the final result, the metrics doc, the rolling snapshot and the
+        gameState advance together, so readers never see a finished round
+        without its metrics or a new round before the previous result exists.
+        With `fence`, the transaction also reads the lease and raises
+        LeaseLost instead of committing if another process has taken it.
+        """
+        await self._run(self._close_round, round_num, result, metrics, started_at,
+                        snapshot, fence)
+
+    # ── Range reads (newest `limit` docs, returned oldest → newest) ──────
+    def _latest(self, collection: str, limit: int, before: int | None = None):
+        query = self.db.collection(collection)
+        if before is not None:
+            query = query.where("round", "<", before)
+        docs = (
+            query.order_by("round", direction=firestore.Query.DESCENDING)
+                 .limit(limit)
+                 .stream()
+        )
+        return sorted((d.to_dict() for d in docs), key=lambda x: x["round"])
+
+    async def list_results(self, limit: int) -> list[dict]:
+        return await self._run(self._latest, "roundResults", limit)
+
+    async def list_metrics(self, limit: int, before: int | None = None) -> list[dict]:
+        return await self._run(self._latest, "metrics", limit, before)
+
+    # ── Leases ────────────────────────────────────────────────────────────
+    def _acquire_lease(self, name: str, holder: str, ttl_ms: int) -> int | None:
+        ref = self._lease_ref(name)
+
+        @firestore.transactional
+        def _txn(txn):
+            snap  = ref.get(transaction=txn)
+            grant = _lease_grant(snap.to_dict() if snap.exists else None,
+                                 holder, _now_ms(), ttl_ms)
+            if grant is None:
+                return None
+            txn.set(ref, grant)
+            return grant["epoch"]
+
+        return _txn(self.db.transaction())
+
+    async def acquire_lease(self, name: str, holder: str, ttl_ms: int) -> int | None:
+        return await self._run(self._acquire_lease, name, holder, ttl_ms)
+
+    def _release_lease(self, name: str, holder: str):
+        ref = self._lease_ref(name)
+
+        @firestore.transactional
+        def _txn(txn):
+            snap = ref.get(transaction=txn)
+            if snap.exists and snap.to_dict().get("holder") == holder:
+                txn.update(ref, {"expiresAt": 0})
+
+        _txn(self.db.transaction())
+
+    async def release_lease(self, name: str, holder: str):
+        """Expire the lease now (if still ours) so a standby takes over at once."""
+        await self._run(self._release_lease, name, holder)
+
+
+# ─── In-memory store ─────────────────────────────────────────────────────────
+class MemoryStore(Store):
+    """
+    Process-local implementation of Store over plain dicts. With `path`, every
+    write is also upserted into a SQLite file and the dicts are reloaded from
+    it on start. Listeners fire synchronously on the writing thread.
+    """
+
+    def __init__(self, path: str | None = None):
+        self._lock    = threading.Lock()
+        self._state   = None
+        self._snapshot = None
+        self._promotion = None
+        self._votes:   dict[int, dict[str, dict]] = {}
+        self._results: dict[int, dict] = {}
+        self._metrics: dict[int, dict] = {}
+        self._leases:  dict[str, dict] = {}
+        self._state_watchers = []
+        self._vote_watchers: dict[int, list] = {}
+
+        self._sql = None
+        if path:
+            self._sql = sqlite3.connect(path, check_same_thread=False)
+            self._sql.execute("PRAGMA journal_mode=WAL")
+            self._sql.execute("PRAGMA synchronous=NORMAL")
+            self._sql.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                " collection TEXT, key TEXT, data TEXT,"
+                " PRIMARY KEY (collection, key))"
+            )
+            self._load()
+
+    def close(self):
+        if self._sql is not None:
+            self._sql.close()
+            self._sql = None
+
+    # ── SQLite persistence ────────────────────────────────────────────────
+    def _load(self):
+        for coll, key, data in self._sql.execute("SELECT collection, key, data FROM docs"):
+            doc = json.loads(data)
+            if coll == "gameState" and key == "snapshot":
+                self._snapshot = doc
+            elif coll == "gameState" and key == "promotion":
+                self._promotion = doc
+            elif coll == "gameState":
+                self._state = doc
+            elif coll == "roundResults":
+                self._results[int(key)] = doc
+            elif coll == "metrics":
+                self._metrics[int(key)] = doc
+            elif coll == "leases":
+                self._leases[key] = doc
+            elif coll.startswith("rounds/"):
+                self._votes.setdefault(int(coll.split("/")[1]), {})[key] = doc
+
+    def _persist(self, rows: list[tuple[str, str, dict]]):
+        """Upsert (collection, key, doc) rows in one SQLite transaction."""
+        if self._sql is None:
+            return
+        with self._sql:
+            self._sql.executemany(
+                "INSERT OR REPLACE INTO docs (collection, key, data) VALUES (?, ?, ?)",
+                [(c, str(k), json.dumps(d)) for c, k, d in rows],
+            )
+
+    # ── gameState ─────────────────────────────────────────────────────────
+    async def get_game_state(self) -> dict | None:
+        return dict(self._state) if self._state is not None else None
+
+    async def set_game_state(self, state: dict):
+        self._set_state(dict(state))
+
+    def _set_state(self, state):
+        with self._lock:
+            self._state = state
+            self._persist([("gameState", "currentRound", state)])
+            watchers    = list(self._state_watchers)
+        for cb in watchers:
+            cb(dict(state))
+
+    async def get_snapshot(self) -> dict | None:
+        return dict(self._snapshot) if self._snapshot is not None else None
+
+    async def get_promotion(self) -> dict | None:
+        return dict(self._promotion) if self._promotion is not None else None
+
+    async def set_promotion(self, doc: dict):
+        with self._lock:
+            self._promotion = dict(doc)
+            self._persist([("gameState", "promotion", doc)])
+
+    def watch_game_state(self, on_change):
+        with self._lock:
+            self._state_watchers.append(on_change)
+            state = self._state
+        on_change(dict(state) if state is not None else None)
+        return lambda: self._state_watchers.remove(on_change)
+
+    # ── Votes ─────────────────────────────────────────────────────────────
+    async def read_votes(self, round_num: int) -> list[dict]:
+        with self._lock:
+            return [dict(v) for v in self._votes.get(round_num, {}).values()]
+
+    def watch_votes(self, round_num: int, on_changes):
+        with self._lock:
+            self._vote_watchers.setdefault(round_num, []).append(on_changes)
+            existing = list(self._votes.get(round_num, {}).items())
+        on_changes([(uid, dict(v)) for uid, v in existing])
+
+        def _unsubscribe():
+            with self._lock:
+                watchers = self._vote_watchers.get(round_num, [])
+                if on_changes in watchers:
+                    watchers.remove(on_changes)
+                if not watchers:
+                    self._vote_watchers.pop(round_num, None)
+
+        return _unsubscribe
+
+    def _put_votes(self, round_num: int, votes: dict, create_only: bool) -> set[str]:
+        coll = f"rounds/{round_num}/votes"
+        with self._lock:
+            current  = self._votes.setdefault(round_num, {})
+            existing = {uid for uid in votes if uid in current} if create_only else set()
+            fresh    = {uid: dict(v) for uid, v in votes.items() if uid not in existing}
+            current.update(fresh)
+            self._persist([(coll, uid, v) for uid, v in fresh.items()])
+            watchers = list(self._vote_watchers.get(round_num, []))
+        changes = [(uid, dict(v)) for uid, v in fresh.items()]
+        for cb in watchers:
+            cb(changes)
+        return existing
+
+    async def write_votes(self, round_num: int, votes: dict):
+        self._put_votes(round_num, votes, create_only=False)
+
+    async def create_votes(self, round_num: int, votes: dict) -> set[str]:
+        return self._put_votes(round_num, votes, create_only=True)
+
+    # ── roundResults ──────────────────────────────────────────────────────
+    async def get_result(self, round_num: int) -> dict | None:
+        d = self._results.get(round_num)
+        return dict(d) if d is not None else None
+
+    async def write_result(self, round_num: int, data: dict, merge: bool = False):
+        with self._lock:
+            if merge:
+                self._results.setdefault(round_num, {}).update(data)
+            else:
+                self._results[round_num] = dict(data)
+            self._persist([("roundResults", round_num, self._results[round_num])])
+
+    # ── Round close-out ───────────────────────────────────────────────────
+    async def close_round(self, round_num: int, result: dict, metrics: dict,
+                          started_at: int, snapshot: dict = None,
+                          fence: tuple[str, str] = None):
+        with self._lock:
+            if fence is not None and self._leases.get(fence[0], {}).get("holder") != fence[1]:
+                raise LeaseLost(fence[0])
+            self._results[round_num] = dict(result)
+            self._metrics[round_num] = dict(metrics)
+            rows = [("roundResults", round_num, result), ("metrics", round_num, metrics)]
+            if snapshot is not None:
+                self._snapshot = dict(snapshot)
+                rows.append(("gameState", "snapshot", snapshot))
+            advance = self._state is not None and self._state.get("round") == round_num
+            if advance:
+                self._state = {"round": round_num + 1, "startedAt": started_at}
+                rows.append(("gameState", "currentRound", self._state))
+            self._persist(rows)
+            state    = dict(self._state) if self._state is not None else None
+            watchers = list(self._state_watchers) if advance else []
+        for cb in watchers:
+            cb(dict(state))
+
+    # ── Range reads ───────────────────────────────────────────────────────
+    @staticmethod
+    def _latest(docs: dict, limit: int, before: int | None = None) -> list[dict]:
+        keys = sorted(k for k in docs if before is None or k < before)
+        return [dict(docs[k]) for k in keys[-limit:]] if limit > 0 else []
+
+    async def list_results(self, limit: int) -> list[dict]:
+        with self._lock:
+            return self._latest(self._results, limit)
+
+    async def list_metrics(self, limit: int, before: int | None = None) -> list[dict]:
+        with self._lock:
+            return self._latest(self._metrics, limit, before)
+
+    # ── Leases ────────────────────────────────────────────────────────────
+    async def acquire_lease(self, name: str, holder: str, ttl_ms: int) -> int | None:
+        with self._lock:
+            grant = _lease_grant(self._leases.get(name), holder, _now_ms(), ttl_ms)
+            if grant is None:
+                return None
+            self._leases[name] = grant
+            self._persist([("leases", name, grant)])
+            return grant["epoch"]
+
+    async def release_lease(self, name: str, holder: str):
+        with self._lock:
+            lease = self._leases.get(name)
+            if lease is not None and lease.get("holder") == holder:
+                lease["expiresAt"] = 0
+                self._persist([("leases", name, lease)])
+
+
+# ─── Factory ─────────────────────────────────────────────────────────────────
+def make_store(backend: str = None, path: str = None) -> Store:
+    """firestore (default) | memory | sqlite, from STORE_BACKEND / STORE_PATH."""
+    backend = backend or STORE_BACKEND
+    if backend == "firestore":
+        return FirestoreStore()
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return MemoryStore(path or STORE_PATH)
+    raise ValueError(f"Unknown STORE_BACKEND: {backend!r}")
@@ -0,0 +1,112 @@
+"""
+tally.py
+Incremental, in-memory vote tally for one round.
+
+The tally is fed by a Firestore snapshot listener on rounds/{n}/votes
+(see FirestoreStore.watch_votes): each change adds, replaces or removes one
+vote, so RED/GREEN/human counts and the encoded voter matrix are always
+current without re-reading the subcollection. Votes are encoded straight
+into a compact (n, 3) float32 array (one row per voter, kept dense by
+swap-removing), which is what VoterWindow and HMNN consume. Listener
+callbacks arrive on a background thread, hence the lock; on_change (if set)
+is called on that same thread after each applied batch.
+"""
+
+import threading
+
+import numpy as np
+
+from rl_model import N_VOTERS, encode_vote_into
+
+
+class VoteTally:
+
+    def __init__(self, round_num: int):
+        self.round_num = round_num
+        self.synced    = threading.Event()   # set once the first snapshot landed
+        self._lock     = threading.Lock()
+        self._votes:   dict[str, dict] = {}  # userId → vote doc
+        self._slot:    dict[str, int]  = {}  # userId → row in _rows
+        self._users:   list[str]       = []  # row → userId
+        self._rows     = np.zeros((N_VOTERS, 3), dtype=np.float32)
+        self.red    = 0
+        self.green  = 0
+        self.humans = 0
+        self.on_change = None                # called after each applied batch
+
+    # ── Mutation ──────────────────────────────────────────────────────────
+    def _count(self, vote: dict, sign: int):
+        if vote.get("color") == "RED":
+            self.red += sign
+        elif vote.get("color") == "GREEN":
+            self.green += sign
+        if not vote.get("isAgent", False):
+            self.humans += sign
+
+    def _remove_row(self, user_id: str):
+        slot = self._slot.pop(user_id)
+        last = len(self._users) - 1
+        if slot != last:                      # move the last row into the gap
+            moved = self._users[last]
+            self._rows[slot]   = self._rows[last]
+            self._users[slot]  = moved
+            self._slot[moved]  = slot
+        self._users.pop()
+
+    def _encode_row(self, user_id: str, vote: dict):
+        slot = self._slot.get(user_id)
+        if slot is None:
+            slot = len(self._users)
+            if slot == len(self._rows):
+                self._rows = np.concatenate([self._rows, np.zeros_like(self._rows)])
+            self._slot[user_id] = slot
+            self._users.append(user_id)
+        encode_vote_into(self._rows[slot], vote.get("color"),
+                         vote.get("emotionFeel"), vote.get("influenceHistory"))
+
+    def _apply(self, user_id: str, vote: dict | None):
+        old = self._votes.get(user_id)
+        if old == vote:                       # echo of a write already applied
+            return
+        if old is not None:
+            del self._votes[user_id]
+            self._count(old, -1)
+        if vote is not None:
+            self._votes[user_id] = vote
+            self._encode_row(user_id, vote)
+            self._count(vote, +1)
+        elif old is not None:
+            self._remove_row(user_id)
+
+    def apply_many(self, changes):
+        """Apply (userId, vote-or-None) pairs under one lock acquisition."""
+        with self._lock:
+            for user_id, vote in changes:
+                self._apply(user_id, vote)
+        if self.on_change is not None:
+            self.on_change()
+
+    def apply_changes(self, changes: list[tuple[str, dict | None]]):
+        """Listener entry point: a batch of (userId, vote-or-None) changes."""
+        self.apply_many(changes)
+        self.synced.set()
+
+    # ── Reads (O(1) counts, O(n) copies) ──────────────────────────────────
+    def counts(self) -> tuple[int, int]:
+        with self._lock:
+            return self.red, self.green
+
+    @property
+    def human_count(self) -> int:
+        with self._lock:
+            return self.humans
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {"red": self.red, "green": self.green,
+                    "humans": self.humans, "total": len(self._votes)}
+
+    def matrix(self) -> np.ndarray:
+        """Encoded votes as an (n, 3) float32 copy, one row per voter."""
+        with self._lock:
+            return self._rows[:len(self._users)].copy()
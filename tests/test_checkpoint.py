@@ -0,0 +1,87 @@
+"""RL checkpoints: generations, fallback, guards and retries."""
+
+import asyncio
+import contextlib
+import io
+import os
+
+from checkpoint import Checkpointer
+from clock import VirtualClock
+from rl_model import RLModel
+
+
+def _train(model: RLModel, rounds: int):
+    summaries = [{"green": 5, "red": 7, "winner": "RED"}] * 5
+    for _ in range(rounds):
+        model.predict([], summaries)
+        model.update("RED")
+
+
+def test_generations_rotate_and_load_falls_back(tmp_path):
+    path = str(tmp_path / "rl_weights.npz")
+
+    async def main():
+        model = RLModel("HMNN.pkl")
+        ckpt  = Checkpointer(model, path, keep=3)
+        for _ in range(4):
+            _train(model, 1)
+            await ckpt.flush()
+        ckpt.close()
+        return ckpt
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ckpt = asyncio.run(main())
+        assert [os.path.exists(ckpt.generation(i)) for i in range(4)] == [True, True, True, False]
+
+        with open(path, "wb") as f:
+            f.write(b"torn write")
+        fresh = RLModel("HMNN.pkl")
+        assert Checkpointer(fresh, path, keep=3).load()
+    assert fresh.rl.updates == 3                      # the newest readable generation
+
+
+def test_refuses_other_models_and_stale_weights(tmp_path):
+    path = str(tmp_path / "rl_weights.npz")
+
+    async def main():
+        model = RLModel("HMNN.pkl", alpha=0.2)
+        _train(model, 2)
+        ckpt = Checkpointer(model, path, keep=1)
+        await ckpt.flush()
+        ckpt.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(main())
+
+        other = RLModel("HMNN.pkl", alpha=0.05)      # not the model that was saved
+        assert not Checkpointer(other, path, keep=1).load()
+        assert other.rl.updates == 0
+
+        stale = Checkpointer(RLModel("HMNN.pkl", alpha=0.2), path, keep=1)
+        stale.min_version = 2                        # the store is ahead of us
+        assert stale.save() is None
+        stale.close()
+        assert RLModel("HMNN.pkl", alpha=0.2).load_rl(path)   # not clobbered
+
+
+def test_failed_save_is_retried_next_round(tmp_path):
+    path = str(tmp_path / "missing" / "rl_weights.npz")
+
+    async def main():
+        model = RLModel("HMNN.pkl")
+        ckpt  = Checkpointer(model, path, clock=VirtualClock(), every_rounds=10, keep=1)
+        _train(model, 1)
+        failed = ckpt.save()
+        await asyncio.gather(failed, return_exceptions=True)       # directory missing
+        assert ckpt.saved_version is None
+        os.makedirs(os.path.dirname(path))
+        ckpt.note_round()                            # not ten rounds: retried anyway
+        assert ckpt._inflight is not failed
+        await ckpt._inflight
+        ckpt.close()
+        return ckpt
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ckpt = asyncio.run(main())
+    assert ckpt.saved_version == 1
+    assert os.path.exists(path)
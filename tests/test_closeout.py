@@ -0,0 +1,53 @@
+"""Background close-out: the RL checkpoint never runs ahead of the committed snapshot."""
+
+import asyncio
+import contextlib
+import io
+import os
+
+import pytest
+from clock import ScaledClock
+from rl_model import RLModel
+from round_manager import RoundManager
+from storage import LeaseLost, MemoryStore
+
+
+class FailingStore(MemoryStore):
+    """Refuses to commit rounds from fail_from on, as after losing the lease."""
+
+    def __init__(self, fail_from: int):
+        super().__init__()
+        self.fail_from = fail_from
+
+    async def close_round(self, round_num, *args, **kwargs):
+        if round_num >= self.fail_from:
+            raise LeaseLost(f"round {round_num} not committed")
+        return await super().close_round(round_num, *args, **kwargs)
+
+
+def test_failed_close_out_keeps_checkpoint_at_committed_version(tmp_path):
+    path  = str(tmp_path / "rl_weights.npz")
+    store = FailingStore(fail_from=2)
+
+    async def main():
+        manager = RoundManager(store=store, clock=ScaledClock(100), rl_path=path,
+                               use_llm=False, agent_mode="local")
+        manager.checkpoint.every_rounds = 1
+        try:
+            # Round 2's close-out fails in the background; run_round 3 raises it
+            with pytest.raises(LeaseLost):
+                await manager.run(total_rounds=3)
+        finally:
+            manager.checkpoint.close()
+        return manager
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = asyncio.run(main())
+        snap = asyncio.run(store.get_snapshot())
+        saved = RLModel("HMNN.pkl")
+        assert saved.load_rl(path)
+
+    assert manager.model.rl.updates > snap["rlVersion"]   # later rounds trained, uncommitted
+    assert snap["rlVersion"] == 1
+    assert saved.rl.updates == snap["rlVersion"]
+    assert not os.path.exists(manager.checkpoint.generation(1))
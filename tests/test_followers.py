@@ -0,0 +1,77 @@
+"""Workers that do not run the round loop: /stream relay and promotion requests."""
+
+import asyncio
+import contextlib
+import io
+import json
+
+from clock import ScaledClock
+from round_manager import RoundManager
+from storage import MemoryStore
+
+
+def _managers(n: int = 2, speed: float = 100):
+    store, clock = MemoryStore(), ScaledClock(speed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        managers = [RoundManager(store=store, clock=clock, rl_path=None,
+                                 use_llm=False, agent_mode="local") for _ in range(n)]
+        for m in managers:
+            m.models.register("lr20", "HMNN.pkl", 0.2)
+    return store, managers
+
+
+def _events(frames: list[bytes]) -> list[tuple[str, dict]]:
+    out = []
+    for frame in frames:
+        head, data = frame.decode().strip().split("\n")
+        out.append((head.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return out
+
+
+def test_non_leader_relays_round_events():
+    async def main():
+        store, (leader, follower) = _managers()
+        follower.start_relay()
+        frames = []
+        with follower.events.subscribe() as queue, contextlib.redirect_stdout(io.StringIO()):
+            run = asyncio.create_task(leader.run(total_rounds=2))
+
+            async def collect():
+                while True:
+                    frames.append(await queue.get())
+            reader = asyncio.create_task(collect())
+            await run
+            await asyncio.sleep(0.2)            # let the last close-out relay
+            reader.cancel()
+        follower.stop_relay()
+        return _events(frames)
+
+    events = asyncio.run(main())
+    kinds  = {kind for kind, _ in events}
+    assert {"phase", "tally", "prediction", "result", "metrics"} <= kinds
+    phases = [(d["round"], d["phase"]) for kind, d in events if kind == "phase"]
+    assert (1, "agents") in phases and (1, "predicting") in phases
+    results = [d["round"] for kind, d in events if kind == "result"]
+    assert results == [1, 2]
+    assert all(d["round"] in (1, 2) for kind, d in events if kind == "metrics")
+
+
+def test_promotion_requested_on_any_worker():
+    async def main():
+        store, (leader, follower) = _managers()
+        await follower.request_promotion("lr20")
+        assert follower.pending_promotion == "lr20"
+        with contextlib.redirect_stdout(io.StringIO()):
+            await leader.run(total_rounds=1)
+            await leader.drain()
+        assert leader.models.primary == "lr20"
+        assert (await store.get_promotion())["status"] == "scheduled"
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = await follower.model_status()
+        return status
+
+    status = asyncio.run(main())
+    primary = [m for m in status["models"] if m["primary"]]
+    assert [m["name"] for m in primary] == ["lr20"]
+    assert primary[0]["n_rounds"] == 1                  # the leader's stats, not ours
+    assert status["pending_promotion"] is None
@@ -0,0 +1,85 @@
+"""POST /vote ingestion: round checks and per-round dedup."""
+
+import asyncio
+
+import pytest
+
+from ingest import INGEST_KEEP_ROUNDS, VoteIngest, WrongRound
+from storage import MemoryStore
+
+
+def _vote(user_id: str, color: str = "GREEN") -> dict:
+    return {"userId": user_id, "color": color, "emotionFeel": "neutral",
+            "influenceHistory": "yes", "isAgent": False}
+
+
+def test_rejects_rounds_away_from_the_current_one():
+    ingest = VoteIngest(MemoryStore())
+    assert ingest.submit(10, "u1", _vote("u1"), current_round=10)
+    assert ingest.submit(9, "u1", _vote("u1"), current_round=10)     # cache lag
+    assert ingest.submit(11, "u1", _vote("u1"), current_round=10)
+    for round_num in (8, 12, 10**9, -1):
+        with pytest.raises(WrongRound):
+            ingest.submit(round_num, "u2", _vote("u2"), current_round=10)
+    assert ingest.accepted == 3 and ingest.pending == 3
+
+
+def test_far_future_round_does_not_prune_dedup():
+    ingest = VoteIngest(MemoryStore())
+    assert ingest.submit(10, "u1", _vote("u1"), current_round=10)
+    with pytest.raises(WrongRound):
+        ingest.submit(10**9, "u1", _vote("u1"), current_round=10)
+    assert not ingest.submit(10, "u1", _vote("u1", "RED"), current_round=10)
+
+    # Old rounds go as the current round advances, not before
+    current = 10 + INGEST_KEEP_ROUNDS
+    assert ingest.submit(current, "u2", _vote("u2"), current_round=current)
+    assert 10 not in ingest._seen
+
+
+def test_queued_votes_reach_the_store():
+    async def main():
+        store  = MemoryStore()
+        ingest = VoteIngest(store, flush_ms=0)
+        ingest.start()
+        ingest.submit(4, "u1", _vote("u1"), current_round=4)
+        ingest.submit(4, "u2", _vote("u2"), current_round=4)
+        await ingest.close()
+        return ingest, await store.read_votes(4)
+
+    ingest, votes = asyncio.run(main())
+    assert ingest.written == 2
+    assert {v["userId"] for v in votes} == {"u1", "u2"}
+
+
+def test_create_votes_is_create_only():
+    async def main():
+        store = MemoryStore()
+        assert await store.create_votes(1, {"u1": _vote("u1"), "u2": _vote("u2")}) == set()
+        existing = await store.create_votes(1, {"u2": _vote("u2", "RED"), "u3": _vote("u3")})
+        return existing, {v["userId"]: v for v in await store.read_votes(1)}
+
+    existing, votes = asyncio.run(main())
+    assert existing == {"u2"}
+    assert set(votes) == {"u1", "u2", "u3"}
+    assert votes["u2"]["color"] == "GREEN"           # not overwritten
+
+
+def test_two_replicas_write_each_voter_once():
+    async def main():
+        # Each replica dedups in-process, the store catches the rest
+        store  = MemoryStore()
+        r1, r2 = VoteIngest(store, flush_ms=0), VoteIngest(store, flush_ms=0)
+        r1.start(), r2.start()
+        assert r1.submit(2, "v1", _vote("v1"), current_round=2)
+        assert not r1.submit(2, "v1", _vote("v1"), current_round=2)
+        assert r2.submit(2, "v1", _vote("v1", "RED"), current_round=2)
+        assert r2.submit(2, "v2", _vote("v2"), current_round=2)
+        await r1.close()
+        await r2.close()
+        return r1, r2, await store.read_votes(2)
+
+    r1, r2, votes = asyncio.run(main())
+    assert r1.written + r2.written == 2
+    assert r1.duplicates + r2.duplicates == 2
+    assert {v["userId"] for v in votes} == {"v1", "v2"}
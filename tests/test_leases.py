@@ -0,0 +1,93 @@
+"""Round-loop leadership: store and file leases, fencing, step-down."""
+
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+from lease import FileLease, Leadership, StoreLease
+from storage import LeaseLost, MemoryStore
+
+
+def _close_args(round_num: int) -> tuple:
+    return (round_num, {"round": round_num, "status": "done"}, {"round": round_num},
+            round_num * 30_000)
+
+
+def test_expired_lease_is_taken_over():
+    async def main():
+        store = MemoryStore()
+        a, b  = StoreLease(store, "roundLoop", ttl=0.2), StoreLease(store, "roundLoop", ttl=0.2)
+        assert await a.acquire() and a.epoch == 1
+        assert not await b.acquire()                  # live lease
+        assert await a.acquire() and a.epoch == 1     # renewal keeps the epoch
+        await asyncio.sleep(0.3)                      # a stops renewing
+        assert await b.acquire() and b.epoch == 2
+        assert not await a.acquire()                  # lost, cannot renew
+        await b.release()
+        assert await a.acquire() and a.epoch == 3
+
+    asyncio.run(main())
+
+
+def test_stale_fence_cannot_close_a_round():
+    async def main():
+        store = MemoryStore()
+        await store.set_game_state({"round": 1, "startedAt": 0})
+        a, b  = StoreLease(store, "roundLoop", ttl=0.1), StoreLease(store, "roundLoop", ttl=0.1)
+        assert await a.acquire()
+        await store.close_round(*_close_args(1), fence=a.fence)
+        await asyncio.sleep(0.15)
+        assert await b.acquire()
+        with pytest.raises(LeaseLost):
+            await store.close_round(*_close_args(2), fence=a.fence)
+        assert await store.get_result(2) is None
+        assert (await store.get_game_state())["round"] == 2
+        await store.close_round(*_close_args(2), fence=b.fence)
+        assert (await store.get_game_state())["round"] == 3
+
+    asyncio.run(main())
+
+
+def test_leadership_steps_down_when_the_lease_is_taken():
+    async def main():
+        store   = MemoryStore()
+        lease   = StoreLease(store, "roundLoop", ttl=0.3)
+        stopped = asyncio.Event()
+
+        async def loop_fn():
+            try:
+                await asyncio.Event().wait()
+            finally:
+                stopped.set()
+
+        leader = Leadership(lease)
+        task   = asyncio.create_task(leader.run(loop_fn))
+        await asyncio.sleep(0.05)
+        assert leader.is_leader
+        # Another process takes the lease (e.g. after a long pause here)
+        await store.release_lease("roundLoop", lease.holder)
+        assert await StoreLease(store, "roundLoop", ttl=5).acquire()
+        await asyncio.wait_for(stopped.wait(), timeout=2)
+        assert not leader.is_leader
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(main())
+
+
+def test_file_lease_excludes_a_second_holder(tmp_path):
+    async def main():
+        path = str(tmp_path / "{name}.lock")
+        a, b = FileLease("roundLoop", path), FileLease("roundLoop", path)
+        assert await a.acquire()
+        assert not await b.acquire()
+        assert await a.acquire()                      # holder keeps its own lock
+        await a.release()
+        assert await b.acquire()
+        await b.release()
+
+    asyncio.run(main())
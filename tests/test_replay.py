@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+
+import pytest
+
+import replay
+from rl_model import RLModel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HMNN = os.path.join(ROOT, "HMNN.pkl")
+
+
+def _dump(tmp_path, n_rounds: int = 12):
+    votes, results = tmp_path / "votes.jsonl", tmp_path / "results.jsonl"
+    with open(votes, "w") as fv, open(results, "w") as fr:
+        for r in range(1, n_rounds + 1):
+            winner = "GREEN" if r % 3 else "RED"
+            for i in range(4):
+                fv.write(json.dumps({"round": r, "userId": f"u{i}",
+                                     "color": "GREEN" if (r + i) % 2 else "RED",
+                                     "emotionFeel": "neutral", "influenceHistory": "yes"}) + "\n")
+            fr.write(json.dumps({"round": r, "winner": winner,
+                                 "greenVotes": 2, "redVotes": 2}) + "\n")
+    return str(votes), str(results)
+
+
+def _weights(tmp_path, alpha: float = 0.05, hmnn: str = HMNN) -> str:
+    model = RLModel(hmnn, alpha=alpha)
+    model.rl.updates = 7
+    path = str(tmp_path / "w.npz")
+    model.save_rl(path)
+    return path
+
+
+def test_alpha_sweep_over_one_weight_file(tmp_path):
+    votes, results = _dump(tmp_path)
+    # Saved as an absolute path, replayed with another spelling of it
+    weights = _weights(tmp_path, alpha=0.05)
+    args = argparse.Namespace(votes=votes, results=results,
+                              hmnn=os.path.join(ROOT, ".", "HMNN.pkl"),
+                              rl_weights=weights, alpha=[0.01, 0.05, 0.2],
+                              every=5, report=None)
+    reports = replay.run(args)
+    assert [r["alpha"] for r in reports] == [0.01, 0.05, 0.2]
+    assert all(r["rounds"] == 12 for r in reports)
+
+
+def test_strict_load_requires_same_alpha(tmp_path):
+    weights = _weights(tmp_path, alpha=0.05)
+    other   = RLModel(HMNN, alpha=0.01)
+    assert other.load_rl(weights)                      # explicit comparison
+    assert other.rl.updates == 7
+    with pytest.raises(ValueError):
+        RLModel(HMNN, alpha=0.01).load_rl(weights, strict=True)   # live checkpoint
+
+
+def test_load_refuses_another_base_model(tmp_path):
+    weights = _weights(tmp_path)
+    with pytest.raises(ValueError):
+        RLModel(str(tmp_path / "HMNN_v2.pkl")).load_rl(weights)
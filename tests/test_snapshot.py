@@ -0,0 +1,49 @@
+"""Manager state restored from the one snapshot document (gameState/snapshot)."""
+
+import asyncio
+import contextlib
+import io
+
+import numpy as np
+
+from clock import ScaledClock
+from rl_model import VOTE_SCALE, pack_votes, unpack_votes
+from round_manager import RoundManager
+from storage import MemoryStore
+
+
+def test_pack_votes_round_trip():
+    rows = np.random.default_rng(0).random((50, 3)).astype(np.float32)
+    packed = pack_votes(rows)
+    assert len(packed) == 4 * len(rows)                   # 3 bytes per voter, base64
+    back = unpack_votes(packed)
+    assert back.shape == rows.shape
+    assert np.abs(back - rows).max() <= 0.5 / VOTE_SCALE + 1e-6
+    assert unpack_votes(pack_votes(np.zeros((0, 3)))).shape == (0, 3)
+
+
+def test_new_manager_resumes_from_snapshot():
+    store, clock = MemoryStore(), ScaledClock(100)
+
+    def manager():
+        return RoundManager(store=store, clock=clock, rl_path=None,
+                            use_llm=False, agent_mode="local")
+
+    async def main():
+        first = manager()
+        await first.run(total_rounds=3)
+        second = manager()
+        await second.bootstrap()
+        return first, second
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        first, second = asyncio.run(main())
+
+    assert second.round_history == first.round_history
+    assert (second.cum_correct, second.cum_total) == (first.cum_correct, first.cum_total)
+    assert second.model.rl.updates == first.model.rl.updates == 3
+    np.testing.assert_allclose(second.model.rl.W, first.model.rl.W)
+    old, new = list(first.window.rounds()), list(second.window.rounds())
+    assert [r for _, r in new] == [r for _, r in old]
+    for (a, _), (b, _) in zip(old, new):
+        assert np.abs(a - b).max() <= 0.5 / VOTE_SCALE + 1e-6